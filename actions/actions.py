@@ -2,8 +2,8 @@
 import os
 from typing import Dict, Text, Any, List
 import logging
+import time
 from dateutil import parser
-import sqlalchemy as sa
 
 from rasa_sdk.interfaces import Action
 from rasa_sdk.events import (
@@ -23,22 +23,19 @@ from actions.parsing import (
     parse_duckling_time,
     get_entity_details,
     parse_duckling_currency,
+    entity_index,
 )
 
-from actions.profile_db import create_database, ProfileDB
+from actions.database.provider import profile_db
+from actions.profile_db import InsufficientFundsError
 from actions.custom_forms import CustomFormValidationAction
+from actions.tracker_summary import TrackerSummary
 
 
 logger = logging.getLogger(__name__)
 
-# The profile database is created/connected to when the actd the first time `ActionSessionStart.run()` is called .
-
-PROFILE_DB_NAME = os.environ.get("PROFILE_DB_NAME", "profile")
-PROFILE_DB_URL = os.environ.get("PROFILE_DB_URL", f"sqlite:///{PROFILE_DB_NAME}.db")
-ENGINE = sa.create_engine(PROFILE_DB_URL)
-create_database(ENGINE, PROFILE_DB_NAME)
-
-profile_db = ProfileDB(ENGINE)
+# The profile database is connected to the first time an action uses `profile_db`.
+# Its tables are created by `python -m actions.database.migrate`.
 
 NEXT_FORM_NAME = {
     "pay_cc": "cc_payment_form",
@@ -89,9 +86,14 @@ class ActionPayCC(Action):
             credit_card = tracker.get_slot("credit_card")
             amount_of_money = float(tracker.get_slot("amount-of-money"))
             amount_transferred = float(tracker.get_slot("amount_transferred"))
-            profile_db.pay_off_credit_card(
-                tracker.sender_id, credit_card, amount_of_money
-            )
+            try:
+                await profile_db.pay_off_credit_card(
+                    tracker.sender_id, credit_card, amount_of_money
+                )
+            except InsufficientFundsError:
+                # another payment or transfer spent the money since validation
+                dispatcher.utter_message(response="utter_insufficient_funds")
+                return [SlotSet(slot, value) for slot, value in slots.items()]
 
             dispatcher.utter_message(response="utter_cc_pay_scheduled")
 
@@ -109,13 +111,13 @@ class ValidatePayCCForm(CustomFormValidationAction):
         """Unique identifier of the action"""
         return "validate_cc_payment_form"
 
-    def amount_from_balance(
+    async def amount_from_balance(
         self, dispatcher, tracker, credit_card_name, balance_type
     ) -> Dict[Text, Any]:
-        amount_balance = profile_db.get_credit_card_balance(
+        amount_balance = await profile_db.get_credit_card_balance(
             tracker.sender_id, credit_card_name, balance_type
         )
-        account_balance = profile_db.get_account_balance(tracker.sender_id)
+        account_balance = await profile_db.get_account_balance(tracker.sender_id)
         if account_balance < float(amount_balance):
             dispatcher.utter_message(response="utter_insufficient_funds")
             return {"amount-of-money": None}
@@ -135,12 +137,12 @@ class ValidatePayCCForm(CustomFormValidationAction):
         if not value:
             return {"amount-of-money": None}
 
-        account_balance = profile_db.get_account_balance(tracker.sender_id)
+        account_balance = await profile_db.get_account_balance(tracker.sender_id)
         # check if user asked to pay the full or the minimum balance
         if type(value) is str:
             credit_card_name = tracker.get_slot("credit_card")
             if credit_card_name:
-                credit_card = profile_db.get_credit_card(
+                credit_card = await profile_db.get_credit_card(
                     tracker.sender_id, credit_card_name
                 )
             else:
@@ -153,7 +155,7 @@ class ValidatePayCCForm(CustomFormValidationAction):
                         f"I see you'd like to pay the {balance_type}."
                     )
                     return {"amount-of-money": balance_type}
-                slots_to_set = self.amount_from_balance(
+                slots_to_set = await self.amount_from_balance(
                     dispatcher, tracker, credit_card_name, balance_type
                 )
                 if float(slots_to_set.get("amount-of-money")) == 0:
@@ -168,10 +170,7 @@ class ValidatePayCCForm(CustomFormValidationAction):
                 return slots_to_set
 
         try:
-            entity = get_entity_details(
-                tracker, "amount-of-money"
-            ) or get_entity_details(tracker, "number")
-            amount_currency = parse_duckling_currency(entity)
+            amount_currency = entity_index(tracker).amount_of_money()
             if not amount_currency:
                 raise TypeError
             if account_balance < float(amount_currency.get("amount-of-money")):
@@ -192,12 +191,14 @@ class ValidatePayCCForm(CustomFormValidationAction):
         domain: Dict[Text, Any],
     ) -> Dict[Text, Any]:
         """Validates value of 'credit_card' slot"""
-        if value and value.lower() in profile_db.list_credit_cards(tracker.sender_id):
+        if value and value.lower() in await profile_db.list_credit_cards(
+            tracker.sender_id
+        ):
             amount = tracker.get_slot("amount-of-money")
             credit_card_slot = {"credit_card": value.title()}
             balance_types = profile_db.list_balance_types()
             if amount and amount.lower() in balance_types:
-                updated_amount = self.amount_from_balance(
+                updated_amount = await self.amount_from_balance(
                     dispatcher, tracker, value.lower(), amount
                 )
                 if float(updated_amount.get("amount-of-money")) == 0:
@@ -209,7 +210,9 @@ class ValidatePayCCForm(CustomFormValidationAction):
                         "credit_card": None,
                         "payment_amount_type": None,
                     }
-                account_balance = profile_db.get_account_balance(tracker.sender_id)
+                account_balance = await profile_db.get_account_balance(
+                    tracker.sender_id
+                )
                 if account_balance < float(updated_amount.get("amount-of-money")):
                     dispatcher.utter_message(
                         response="utter_insufficient_funds_specific", **updated_amount
@@ -230,15 +233,13 @@ class ValidatePayCCForm(CustomFormValidationAction):
     ) -> Dict[Text, Any]:
         """Explains 'credit_card' slot"""
         dispatcher.utter_message("You have the following credits cards:")
-        for credit_card in profile_db.list_credit_cards(tracker.sender_id):
-            current_balance = profile_db.get_credit_card_balance(
-                tracker.sender_id, credit_card
-            )
+        overview = await profile_db.get_credit_card_overview(tracker.sender_id)
+        for credit_card, balances in overview.items():
             dispatcher.utter_message(
                 response="utter_credit_card_balance",
                 **{
                     "credit_card": credit_card.title(),
-                    "amount-of-money": f"{current_balance:.2f}",
+                    "amount-of-money": f"{balances['current_balance']:.2f}",
                 },
             )
         return {}
@@ -251,8 +252,7 @@ class ValidatePayCCForm(CustomFormValidationAction):
         domain: Dict[Text, Any],
     ) -> Dict[Text, Any]:
         """Validates value of 'time' slot"""
-        timeentity = get_entity_details(tracker, "time")
-        parsedtime = timeentity and parse_duckling_time(timeentity)
+        parsedtime = entity_index(tracker).time()
         if not parsedtime:
             dispatcher.utter_message(response="utter_no_transactdate")
             return {"time": None}
@@ -293,19 +293,27 @@ class ActionTransferMoney(Action):
 
         if tracker.get_slot("zz_confirm_form") == "yes":
             amount_of_money = float(tracker.get_slot("amount-of-money"))
-            from_account_number = profile_db.get_account_number(
-                profile_db.get_account_from_session_id(tracker.sender_id)
+            _, from_account_number = await profile_db.get_account_ids(tracker.sender_id)
+            recipient = await profile_db.find_recipient(
+                tracker.sender_id, tracker.get_slot("PERSON")
             )
-            to_account_number = profile_db.get_account_number(
-                profile_db.get_recipient_from_name(
-                    tracker.sender_id, tracker.get_slot("PERSON")
+            if recipient is None:
+                # the recipient was removed since validation
+                dispatcher.utter_message(response="utter_unknown_recipient")
+                return [SlotSet(slot, value) for slot, value in slots.items()]
+            _, to_account_number = recipient
+            try:
+                await profile_db.transact(
+                    from_account_number,
+                    to_account_number,
+                    amount_of_money,
+                    check_balance=True,
+                    durable=True,
                 )
-            )
-            profile_db.transact(
-                from_account_number,
-                to_account_number,
-                amount_of_money,
-            )
+            except InsufficientFundsError:
+                # another payment or transfer spent the money since validation
+                dispatcher.utter_message(response="utter_insufficient_funds")
+                return [SlotSet(slot, value) for slot, value in slots.items()]
 
             dispatcher.utter_message(response="utter_transfer_complete")
 
@@ -337,16 +345,10 @@ class ValidateTransferMoneyForm(CustomFormValidationAction):
         if isinstance(value, list):
             value = value[0]
 
-        name = value.lower() if value else None
-        known_recipients = profile_db.list_known_recipients(tracker.sender_id)
-        first_names = [name.split()[0] for name in known_recipients]
-        if name is not None and name in known_recipients:
-            return {"PERSON": name.title()}
-
-        if name in first_names:
-            index = first_names.index(name)
-            fullname = known_recipients[index]
-            return {"PERSON": fullname.title()}
+        recipient = value and await profile_db.find_recipient(tracker.sender_id, value)
+        if recipient:
+            nickname, _ = recipient
+            return {"PERSON": nickname.title()}
 
         dispatcher.utter_message(response="utter_unknown_recipient", PERSON=value)
         return {"PERSON": None}
@@ -359,7 +361,7 @@ class ValidateTransferMoneyForm(CustomFormValidationAction):
         domain: Dict[Text, Any],
     ) -> Dict[Text, Any]:
         """Explains 'PERSON' slot"""
-        recipients = profile_db.list_known_recipients(tracker.sender_id)
+        recipients = await profile_db.list_known_recipients(tracker.sender_id)
         formatted_recipients = "\n" + "\n".join(
             [f"- {recipient.title()}" for recipient in recipients]
         )
@@ -377,12 +379,9 @@ class ValidateTransferMoneyForm(CustomFormValidationAction):
         domain: Dict[Text, Any],
     ) -> Dict[Text, Any]:
         """Validates value of 'amount-of-money' slot"""
-        account_balance = profile_db.get_account_balance(tracker.sender_id)
+        account_balance = await profile_db.get_account_balance(tracker.sender_id)
         try:
-            entity = get_entity_details(
-                tracker, "amount-of-money"
-            ) or get_entity_details(tracker, "number")
-            amount_currency = parse_duckling_currency(entity)
+            amount_currency = entity_index(tracker).amount_of_money()
             if not amount_currency:
                 raise TypeError
             if account_balance < float(amount_currency.get("amount-of-money")):
@@ -423,34 +422,23 @@ class ActionShowBalance(Action):
         if account_type == "credit":
             # show credit card balance
             credit_card = tracker.get_slot("credit_card")
-            available_cards = profile_db.list_credit_cards(tracker.sender_id)
+            overview = await profile_db.get_credit_card_overview(tracker.sender_id)
 
-            if credit_card and credit_card.lower() in available_cards:
-                current_balance = profile_db.get_credit_card_balance(
-                    tracker.sender_id, credit_card
-                )
+            if credit_card and credit_card.lower() in overview:
+                cards = {credit_card.lower(): overview[credit_card.lower()]}
+            else:
+                cards = overview
+            for name, balances in cards.items():
                 dispatcher.utter_message(
                     response="utter_credit_card_balance",
                     **{
-                        "credit_card": credit_card.title(),
-                        "credit_card_balance": f"{current_balance:.2f}",
+                        "credit_card": name.title(),
+                        "credit_card_balance": f"{balances['current_balance']:.2f}",
                     },
                 )
-            else:
-                for credit_card in profile_db.list_credit_cards(tracker.sender_id):
-                    current_balance = profile_db.get_credit_card_balance(
-                        tracker.sender_id, credit_card
-                    )
-                    dispatcher.utter_message(
-                        response="utter_credit_card_balance",
-                        **{
-                            "credit_card": credit_card.title(),
-                            "credit_card_balance": f"{current_balance:.2f}",
-                        },
-                    )
         else:
             # show bank account balance
-            account_balance = profile_db.get_account_balance(tracker.sender_id)
+            account_balance = await profile_db.get_account_balance(tracker.sender_id)
             amount = tracker.get_slot("amount_transferred")
             if amount:
                 amount = float(tracker.get_slot("amount_transferred"))
@@ -490,7 +478,7 @@ class ActionShowRecipients(Action):
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict
     ) -> List[EventType]:
         """Executes the custom action"""
-        recipients = profile_db.list_known_recipients(tracker.sender_id)
+        recipients = await profile_db.list_known_recipients(tracker.sender_id)
         formatted_recipients = "\n" + "\n".join(
             [f"- {recipient.title()}" for recipient in recipients]
         )
@@ -523,18 +511,16 @@ class ActionSessionStart(Action):
     def _slot_set_events_from_tracker(
         tracker: "Tracker",
     ) -> List["SlotSet"]:
-        """Fetches SlotSet events from tracker and carries over keys and values"""
+        """Carries over the last values of the relevant slots of the tracker"""
 
         # when restarting most slots should be reset
         relevant_slots = ["currency"]
 
+        slots = TrackerSummary(tracker.events).slots
         return [
-            SlotSet(
-                key=event.get("name"),
-                value=event.get("value"),
-            )
-            for event in tracker.events
-            if event.get("event") == "slot" and event.get("name") in relevant_slots
+            SlotSet(key=name, value=slots[name])
+            for name in relevant_slots
+            if name in slots
         ]
 
     async def run(
@@ -544,15 +530,17 @@ class ActionSessionStart(Action):
         domain: Dict[Text, Any],
     ) -> List[EventType]:
         """Executes the custom action"""
+        started = time.perf_counter()
         # the session should begin with a `session_started` event
         events = [SessionStarted()]
 
         events.extend(self._slot_set_events_from_tracker(tracker))
         logger.info(f"Current session_id: {tracker.sender_id}")
 
-        # Create account if it does not exist.
-        account = profile_db.get_account_from_session_id(tracker.sender_id)
-        logger.info(f"Current active account: {account.id}")
+        # Create the account if it does not exist, its history is added in the
+        # background
+        account_id, _ = await profile_db.provisioning.start(tracker.sender_id)
+        logger.info(f"Current active account: {account_id}")
 
         # Initialize slots from mock profile
         events.append(SlotSet("currency", "$"))
@@ -560,6 +548,7 @@ class ActionSessionStart(Action):
         # add `action_listen` at the end
         events.append(ActionExecuted("action_listen"))
 
+        profile_db.provisioning.record_first_turn(time.perf_counter() - started)
         return events
 
 
@@ -2,7 +2,6 @@ import os
 from typing import Dict, Text, Any, List
 import logging
 from dateutil import parser
-import sqlalchemy as sa
 
 from rasa_sdk.interfaces import Action
 from rasa_sdk.events import (
@@ -22,24 +21,19 @@ from actions.parsing import (
     parse_duckling_time,
     get_entity_details,
     parse_duckling_currency,
+    entity_index,
 )
 
-from actions.profile_db import create_database, ProfileDB
+from actions.database.fx import BASE_CURRENCY
+from actions.database.provider import profile_db
 
 from actions.custom_forms import CustomFormValidationAction
 
 
 logger = logging.getLogger(__name__)
 
-# The profile database is created/connected to when the action server starts
-# It is populated the first time `ActionSessionStart.run()` is called .
-
-PROFILE_DB_NAME = os.environ.get("PROFILE_DB_NAME", "profile")
-PROFILE_DB_URL = os.environ.get("PROFILE_DB_URL", f"sqlite:///{PROFILE_DB_NAME}.db")
-ENGINE = sa.create_engine(PROFILE_DB_URL)
-create_database(ENGINE, PROFILE_DB_NAME)
-
-profile_db = ProfileDB(ENGINE)
+# The profile database is shared with the other action modules and connected to
+# the first time an action uses it, see `actions.database.provider`.
 
 
 
@@ -54,7 +48,7 @@ class ActionShowAccounts(Action):
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict
     ) -> List[EventType]:
         """Executes the custom action"""
-        accounts = profile_db.list_credit_cards(tracker.sender_id)
+        accounts = await profile_db.list_credit_cards(tracker.sender_id)
         formatted_accounts = "\n" + "\n".join(
             [f"- {account.title()}" for account in accounts]
         )
@@ -86,9 +80,11 @@ class ActionShowCurrencyAccounts(Action):
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict
     ) -> List[EventType]:
         """Executes the custom action"""
-        curr = profile_db.list_curr_accounts_balances(tracker.sender_id)
+        curr = await profile_db.list_curr_accounts_in_currency(
+            tracker.sender_id, BASE_CURRENCY
+        )
         formatted_curr = "\n" + "\n".join(
-            [f"Card:{cur[0]}, currency: {cur[1]}, balance: {cur[2]}" for cur in curr])
+            [f"Card:{cur[0]}, currency: {cur[1]}, balance: {cur[2]} ({cur[3]:.2f} {BASE_CURRENCY})" for cur in curr])
         dispatcher.utter_message(
             response="utter_curr_accounts",
             formatted_accounts = formatted_curr,
@@ -115,7 +111,7 @@ class ActionShowCurrencies(Action):
     async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict
     ) -> List[EventType]:
-        curr = profile_db.list_curr(tracker.sender_id)
+        curr = await profile_db.list_curr(tracker.sender_id)
         formatted_curr = "\n" + "\n".join(
             [f"{cur} - {curr[cur]}" for cur in curr.keys()]
         )
@@ -151,7 +147,11 @@ class CreateCurrencyAccount(Action):
         domain: Dict[Text, Any],
     ) -> List[Dict]:
         """Executes the action"""
-        profile_db.creat_curr_acc(tracker.sender_id, tracker.get_slot('credit_card'), tracker.get_slot("currency"))
+        await profile_db.creat_curr_acc(
+            tracker.sender_id,
+            tracker.get_slot("credit_card"),
+            tracker.get_slot("currency"),
+        )
 
         dispatcher.utter_message(f"{tracker.get_slot('currency')} for {tracker.get_slot('credit_card')} is added")
         # return [SlotSet("currency", None),SlotSet("credit_card", None)]
@@ -216,7 +216,9 @@ class ValidateCreateCurrencyAccount(CustomFormValidationAction):
         domain: Dict[Text, Any],
     ) -> Dict[Text, Any]:
         """Validates value of 'credit_card' slot"""
-        if value and value.lower() in profile_db.list_credit_cards(tracker.sender_id):
+        if value and value.lower() in await profile_db.list_credit_cards(
+            tracker.sender_id
+        ):
             credit_card_slot = {"credit_card": value.title()}
             return credit_card_slot
         dispatcher.utter_message(response="utter_no_creditcard")
@@ -231,19 +233,16 @@ class ValidateCreateCurrencyAccount(CustomFormValidationAction):
     ) -> Dict[Text, Any]:
         """Validates value of 'currency' slot"""
         curr = ['cny', 'gbp', 'eur', 'usd']
-        list_of_cur = profile_db.list_curr_accounts_balances(tracker.sender_id)
         card_name = tracker.get_slot('credit_card')
-        list_of_curr = [list_of_cur[i][1] for i in range(len(list_of_cur)) if list_of_cur[i][0].lower() == card_name.lower()]
-        entity = get_entity_details(
-            tracker, "currency"
-        )
-        amount_currency = parse_duckling_currency(entity).get('currency')
+        amount_currency = (entity_index(tracker).currency() or {}).get('currency')
         if not amount_currency:
             return {"currency": None}
         if amount_currency.lower() not in curr:
             dispatcher.utter_message("I can't understand currency you entered")
             return {"currency": None}
-        if amount_currency in list_of_curr:
+        if await profile_db.check_curr_account_exists(
+            tracker.sender_id, card_name, amount_currency
+        ):
             dispatcher.utter_message(response="utter_curr_exist")
             return {"currency": None}
         else:
@@ -0,0 +1,285 @@
+"""Non-blocking access to the profile database for the action server.
+
+`AsyncProfileDB` has the same method surface as `ProfileDB`, but every method is a
+coroutine backed by SQLAlchemy's asyncio engine (aiosqlite / asyncpg). The queries
+themselves are the ones in `ProfileDB`; they run through `AsyncSession.run_sync`, so
+the event loop is free while the database driver waits for results.
+
+Sessions are scoped to an action invocation: the action server handles every
+webhook request in its own asyncio task, and all `AsyncProfileDB` calls made from
+that task share one session, which is closed when the task is done. Every method
+call commits (or rolls back) on its own, so a failing call never leaks into
+another conversation.
+
+`run_in_thread` runs CPU heavy work (e.g. seeding the history of new sessions) on a
+worker thread with a synchronous engine instead, since `run_sync` keeps the event
+loop busy while Python code runs between queries.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Text
+
+import sqlalchemy as sa
+from sqlalchemy.engine.base import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from actions.database.cache import AccountCache, FxRateCache, RecipientCache
+from actions.database.pool import PoolMetrics, pool_options
+from actions.database.provisioning import SessionProvisioning
+from actions.database.vendors import VendorRegistry
+from actions.database.write_behind import WRITE_BEHIND, WriteBehindQueue
+from actions.profile_db import ProfileDB
+
+logger = logging.getLogger(__name__)
+
+# async drivers used for the database backends the profile db supports
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+# and the synchronous drivers of the same backends, for `run_in_thread`
+SYNC_DRIVERS = {
+    "sqlite": "sqlite",
+    "postgresql": "postgresql+psycopg2",
+}
+
+
+def get_async_database_url(database_url: Text) -> Text:
+    """Switch the driver of a database URL to the matching asyncio driver"""
+    url = sa.engine.make_url(database_url)
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if not async_driver:
+        raise ValueError(f"No asyncio driver known for '{url.drivername}'")
+    return str(url.set(drivername=async_driver))
+
+
+def get_sync_database_url(database_url: Text) -> Text:
+    """Switch the driver of a database URL to the matching synchronous driver"""
+    url = sa.engine.make_url(database_url)
+    sync_driver = SYNC_DRIVERS.get(url.get_backend_name())
+    if not sync_driver:
+        raise ValueError(f"No synchronous driver known for '{url.drivername}'")
+    return str(url.set(drivername=sync_driver))
+
+
+def _in_session(method_name: Text, provisioned: bool = False) -> Callable:
+    """Build a coroutine that runs `ProfileDB.<method_name>` in the invocation's
+    session. Set `provisioned` for methods that read the history of the session
+    passed as their first argument, they wait for its provisioning first."""
+
+    async def method(self: "AsyncProfileDB", *args: Any, **kwargs: Any) -> Any:
+        if provisioned:
+            await self.provisioning.wait(args[0] if args else kwargs["session_id"])
+        return await self.run_sync(
+            lambda profile_db: getattr(profile_db, method_name)(*args, **kwargs)
+        )
+
+    method.__name__ = method_name
+    method.__doc__ = getattr(ProfileDB, method_name).__doc__
+    return method
+
+
+def _written_behind(
+    method_name: Text,
+    record_method_name: Text,
+    after_commit: Optional[Callable[["AsyncProfileDB"], None]] = None,
+) -> Callable:
+    """Build a coroutine that runs `ProfileDB.<method_name>`, or, with write-behind
+    enabled, queues `ProfileDB.<record_method_name>` (which does not commit) for
+    the next group commit. Pass `durable=True` to return only once it is committed,
+    errors of the write are raised then. `after_commit` is called with the
+    `AsyncProfileDB` once the write is committed, e.g. to invalidate a cache.
+    """
+
+    async def method(self: "AsyncProfileDB", *args: Any, **kwargs: Any) -> Any:
+        durable = kwargs.pop("durable", False)
+        if self.write_behind is None:
+            return await self.run_sync(
+                lambda profile_db: getattr(profile_db, method_name)(*args, **kwargs)
+            )
+        committed = await self.write_behind.submit(
+            lambda profile_db: getattr(profile_db, record_method_name)(*args, **kwargs),
+            after_commit and (lambda: after_commit(self)),
+        )
+        if durable:
+            return await committed
+
+    method.__name__ = method_name
+    method.__doc__ = getattr(ProfileDB, method_name).__doc__
+    return method
+
+
+class AsyncProfileDB:
+    def __init__(self, db_engine: AsyncEngine, write_behind: bool = WRITE_BEHIND):
+        self.engine = db_engine
+        self.session_factory = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            autoflush=True,
+            expire_on_commit=False,
+        )
+        self.sessions: Dict[asyncio.Task, AsyncSession] = {}
+        # created on the first `run_in_thread`
+        self.sync_engine: Optional[Engine] = None
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.pool_metrics = PoolMetrics(self.engine.sync_engine)
+        self.account_cache = AccountCache()
+        self.fx_rate_cache = FxRateCache()
+        self.vendor_registry = VendorRegistry()
+        self.recipient_cache = RecipientCache()
+        self.provisioning = SessionProvisioning(self)
+        self.write_behind = WriteBehindQueue(self) if write_behind else None
+
+    def get_session(self) -> AsyncSession:
+        """Get the session of the current action invocation (asyncio task)"""
+        task = asyncio.current_task()
+        session = self.sessions.get(task)
+        if session is None:
+            session = self.sessions[task] = self.session_factory()
+            task.add_done_callback(self.close_session)
+        return session
+
+    def close_session(self, task: asyncio.Task):
+        """Close the session of a finished action invocation"""
+        session = self.sessions.pop(task, None)
+        if session is not None:
+            asyncio.ensure_future(session.close())
+
+    async def run_sync(self, fn: Callable[[ProfileDB], Any]) -> Any:
+        """Run `fn` with a `ProfileDB` bound to the invocation's session, and commit
+        afterwards. Objects returned by `fn` stay usable after the commit.
+        """
+        session = self.get_session()
+        try:
+            if not session.in_transaction():
+                started = time.perf_counter()
+                await session.connection()
+                self.pool_metrics.record_wait(started)
+            result = await session.run_sync(
+                lambda sync_session: fn(
+                    ProfileDB.from_session(
+                        sync_session,
+                        self.account_cache,
+                        self.fx_rate_cache,
+                        self.vendor_registry,
+                        self.recipient_cache,
+                    )
+                )
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return result
+
+    async def run_in_thread(self, fn: Callable[[ProfileDB], Any]) -> Any:
+        """Run `fn` with a `ProfileDB` bound to a session of its own on the worker
+        thread, and commit afterwards, without blocking the event loop. Calls run
+        one at a time."""
+        if self.executor is None:
+            database_url = self.engine.url.render_as_string(hide_password=False)
+            self.sync_engine = sa.create_engine(
+                get_sync_database_url(database_url), **pool_options(database_url)
+            )
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="profile_db"
+            )
+
+        def run() -> Any:
+            with Session(bind=self.sync_engine, autoflush=True) as session:
+                try:
+                    result = fn(
+                        ProfileDB.from_session(
+                            session,
+                            self.account_cache,
+                            self.fx_rate_cache,
+                            self.vendor_registry,
+                            self.recipient_cache,
+                        )
+                    )
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
+                return result
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    async def create_tables(self):
+        await self.run_sync(lambda profile_db: profile_db.create_tables())
+
+    get_account_number = staticmethod(ProfileDB.get_account_number)
+    list_balance_types = staticmethod(ProfileDB.list_balance_types)
+
+    get_account = _in_session("get_account")
+    get_account_from_session_id = _in_session("get_account_from_session_id")
+    get_account_ids = _in_session("get_account_ids")
+    get_account_from_number = _in_session("get_account_from_number")
+    get_recipient_from_name = _in_session("get_recipient_from_name", provisioned=True)
+    list_known_recipients = _in_session("list_known_recipients", provisioned=True)
+    find_recipient = _in_session("find_recipient", provisioned=True)
+    check_session_id_exists = _in_session("check_session_id_exists")
+    check_session_history_exists = _in_session("check_session_history_exists")
+    get_account_balance = _in_session("get_account_balance", provisioned=True)
+    compute_balances = _in_session("compute_balances")
+    reconcile_balances = _in_session("reconcile_balances")
+    get_currency = _in_session("get_currency")
+    list_credit_cards = _in_session("list_credit_cards", provisioned=True)
+    get_credit_card = _in_session("get_credit_card", provisioned=True)
+    get_credit_card_balance = _in_session("get_credit_card_balance", provisioned=True)
+    get_credit_card_overview = _in_session("get_credit_card_overview", provisioned=True)
+    list_vendors = _in_session("list_vendors")
+    find_vendor = _in_session("find_vendor")
+    pay_off_credit_card = _in_session("pay_off_credit_card", provisioned=True)
+    check_general_accounts_populated = _in_session("check_general_accounts_populated")
+    add_general_accounts = _in_session("add_general_accounts")
+    add_recipients = _in_session("add_recipients")
+    add_transactions = _in_session("add_transactions")
+    add_credit_cards = _in_session("add_credit_cards")
+    add_session_account = _in_session("add_session_account")
+    populate_profile_db = _in_session("populate_profile_db")
+    add_session_history = _in_session("add_session_history")
+    transact = _written_behind("transact", "record_transaction")
+    add_vendor = _written_behind(
+        "add_vendor",
+        "record_vendor",
+        after_commit=lambda self: self.vendor_registry.invalidate(),
+    )
+    add_offline_transaction = _written_behind(
+        "add_offline_transaction", "record_offline_transaction"
+    )
+    add_curr_accounts = _in_session("add_curr_accounts")
+    list_curr = _in_session("list_curr")
+    transact_curr_account = _in_session("transact_curr_account")
+    creat_curr_acc = _in_session("creat_curr_acc")
+    list_curr_accounts_balances = _in_session(
+        "list_curr_accounts_balances", provisioned=True
+    )
+    check_curr_account_exists = _in_session(
+        "check_curr_account_exists", provisioned=True
+    )
+    summarize_transactions = _in_session("summarize_transactions", provisioned=True)
+    get_fx_rates = _in_session("get_fx_rates")
+    convert = _in_session("convert")
+    list_curr_accounts_in_currency = _in_session(
+        "list_curr_accounts_in_currency", provisioned=True
+    )
+    transfer_between_currency_accounts = _in_session(
+        "transfer_between_currency_accounts", provisioned=True
+    )
+
+    async def search_transactions(self, *args: Any, **kwargs: Any):
+        """Find all transactions for an account, see `ProfileDB.search_transactions`.
+        Returns the list of matching rows instead of a query.
+        """
+        await self.provisioning.wait(args[0] if args else kwargs["session_id"])
+        return await self.run_sync(
+            lambda profile_db: profile_db.search_transactions(*args, **kwargs).all()
+        )
+
+    async def get_vendors(self):
+        """List vendor `Account`s"""
+        return await self.run_sync(lambda profile_db: profile_db.get_vendors().all())
@@ -0,0 +1,40 @@
+"""Background worker tasks of long-lived objects.
+
+A worker task, and the queues and futures it shares with its callers, belong to
+the event loop they were created on. The objects that own them live as long as the
+process, and can see more than one event loop (e.g. the tests run one loop per
+test), so they start over with a new worker on every loop they are used from.
+"""
+import asyncio
+from typing import Optional
+
+
+class LoopWorker:
+    """An object with a background worker task (`work`) and state of one event loop,
+    created by `on_new_loop`"""
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.worker: Optional[asyncio.Task] = None
+
+    def bind(self) -> asyncio.AbstractEventLoop:
+        """Start over if the running event loop is not the one of the worker"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.worker = None
+            self.on_new_loop()
+        return loop
+
+    def on_new_loop(self):
+        """Create the state of the worker (queues, futures, ...) for the running
+        event loop"""
+
+    def ensure_worker(self):
+        """Start the worker on the running event loop if it is not running yet"""
+        self.bind()
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.ensure_future(self.work())
+
+    async def work(self):
+        raise NotImplementedError
@@ -0,0 +1,98 @@
+"""The YAML configuration of the actions, loaded once and reloaded when it changes.
+
+Each file is parsed at startup into an object of what the actions need from it,
+e.g. the handoff buttons, so an action call only reads attributes. Every
+`ACTIONS_CONFIG_RELOAD_INTERVAL` seconds (default 5, 0 disables reloading) the
+next call checks the modification time of the file and loads it again if it
+changed, so config changes do not need a restart of the action server. A file that
+fails to load keeps the previous configuration.
+"""
+import logging
+import os
+import pathlib
+import time
+from typing import Any, Callable, Dict, Generic, List, Optional, Text, TypeVar
+
+import ruamel.yaml
+
+logger = logging.getLogger(__name__)
+
+CONFIG_RELOAD_INTERVAL = float(os.environ.get("ACTIONS_CONFIG_RELOAD_INTERVAL", 5))
+
+here = pathlib.Path(__file__).parent.absolute()
+
+T = TypeVar("T")
+
+
+class ConfigFile(Generic[T]):
+    """A YAML file and what `build` makes of its contents"""
+
+    def __init__(
+        self,
+        path: Text,
+        build: Callable[[Dict[Text, Any]], T],
+        reload_interval: float = CONFIG_RELOAD_INTERVAL,
+    ):
+        self.path = path
+        self.build = build
+        self.reload_interval = reload_interval
+        self.mtime: Optional[float] = None
+        self.next_check = 0.0
+        self.reloads = 0
+        self.value: T = build({})
+        self.load()
+
+    def load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "r") as f:
+                self.value = self.build(ruamel.yaml.YAML(typ="safe").load(f) or {})
+        except Exception as e:
+            logger.warning(f"Keeping the previous configuration of {self.path}: {e!r}")
+            return
+        if self.mtime is not None:
+            self.reloads += 1
+            logger.info(f"Reloaded {self.path}")
+        self.mtime = mtime
+
+    def get(self) -> T:
+        if self.reload_interval > 0:
+            now = time.monotonic()
+            if now >= self.next_check:
+                self.next_check = now + self.reload_interval
+                try:
+                    changed = os.stat(self.path).st_mtime != self.mtime
+                except OSError:
+                    changed = False
+                if changed:
+                    self.load()
+        return self.value
+
+
+class CustomFormsConfig:
+    """`custom_forms` of custom_forms_config.yml"""
+
+    def __init__(self, config: Dict[Text, Any]):
+        custom_forms = config.get("custom_forms") or {}
+        self.max_validation_failures: int = custom_forms.get(
+            "max_validation_failures", 2
+        )
+
+
+class HandoffConfig:
+    """`handoff_hosts` of handoff_config.yml, with the buttons offering them"""
+
+    def __init__(self, config: Dict[Text, Any]):
+        self.hosts: Dict[Text, Dict[Text, Any]] = config.get("handoff_hosts") or {}
+        self.enabled = any(host.get("url") for host in self.hosts.values())
+        self.buttons: List[Dict[Text, Text]] = [
+            {
+                "title": host.get("title"),
+                "payload": f'/trigger_handoff{{"handoff_to":"{bot}"}}',
+            }
+            for bot, host in self.hosts.items()
+        ]
+
+
+custom_forms_config = ConfigFile(f"{here}/custom_forms_config.yml", CustomFormsConfig)
+handoff_config = ConfigFile(f"{here}/handoff_config.yml", HandoffConfig)
@@ -1,5 +1,6 @@
 from typing import List, Dict, Text, Any
 import logging
+import math
 
 from rasa_sdk import Action, Tracker
 from rasa_sdk.events import SlotSet
@@ -7,7 +8,7 @@ from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.types import DomainDict
 
 from actions.actions import profile_db
-from actions.parsing import parse_duckling_time
+from actions.parsing import entity_index
 
 logger = logging.getLogger(__name__)
 
@@ -19,23 +20,28 @@ class ActionAddOfflineTransaction(Action):
     async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: DomainDict
     ) -> List[Dict[Text, Any]]:
-        ant = None
+        ant = entity_index(tracker).last("time") or {}
+        slots = [
+            SlotSet("vendor", None),
+            SlotSet("time", None),
+            SlotSet("amount-of-money", None),
+        ]
 
-        for entity in tracker.latest_message.get("entities"):
-            if entity.get("entity") == "time":
-                ant = entity
+        try:
+            amount = float(tracker.get_slot("amount-of-money"))
+        except (TypeError, ValueError):
+            amount = None
+        if amount is None or not (math.isfinite(amount) and amount > 0):
+            dispatcher.utter_message(response="utter_no_payment_amount")
+            return slots
 
-        profile_db.add_offline_transaction(
+        await profile_db.add_offline_transaction(
             rasa_session_id=tracker.sender_id,
-            amount=tracker.get_slot("amount-of-money"),
+            amount=amount,
             time=ant.get("time_formatted"),
             to_account_name=tracker.get_slot("vendor"),
         )
 
         dispatcher.utter_message(f"Transaction was added!")
         #  Add a new transaction to Nike for 321$ that happened yesterday at 7am
-        return [
-            SlotSet("vendor", None),
-            SlotSet("time", None),
-            SlotSet("amount-of-money", None),
-        ]
+        return slots
@@ -1,6 +1,5 @@
 from typing import Dict, Text, Any, List
 from dateutil import parser
-import sqlalchemy as sa
 
 from rasa_sdk.interfaces import Action
 from rasa_sdk.events import (
@@ -44,24 +43,20 @@ class ActionTransactionSearch(Action):
         if tracker.get_slot("zz_confirm_form") == "yes":
             search_type = tracker.get_slot("search_type")
             deposit = search_type == "deposit"
-            vendor = tracker.get_slot("vendor")
-            vendor = f" at {vendor}" if vendor else ""
+            vendor_name = tracker.get_slot("vendor")
+            vendor = f" at {vendor_name}" if vendor_name else ""
             start_time = parser.isoparse(tracker.get_slot("start_time"))
             end_time = parser.isoparse(tracker.get_slot("end_time"))
-            transactions = profile_db.search_transactions(
+            summary = await profile_db.summarize_transactions(
+                tracker.sender_id,
                 start_time=start_time,
                 end_time=end_time,
                 deposit=deposit,
-                vendor=vendor,
+                vendor=vendor_name,
             )
 
-            aliased_transactions = transactions.subquery()
-            total = profile_db.session.query(
-                sa.func.sum(aliased_transactions.c.amount)
-            )[0][0]
-            if not total:
-                total = 0
-            numtransacts = transactions.count()
+            total = summary["total"]
+            numtransacts = summary["count"]
             slotvars = {
                 "total": f"{total:.2f}",
                 "numtransacts": numtransacts,
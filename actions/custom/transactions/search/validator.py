@@ -9,7 +9,7 @@ from rasa_sdk.executor import CollectingDispatcher
 
 from actions.actions import profile_db
 from actions.custom_forms import CustomFormValidationAction
-from actions.parsing import get_entity_details, parse_duckling_time_as_interval
+from actions.parsing import entity_index
 
 
 class ValidateTransactionSearchForm(CustomFormValidationAction):
@@ -58,10 +58,11 @@ class ValidateTransactionSearchForm(CustomFormValidationAction):
     ) -> Dict[Text, Any]:
         """Validates value of 'vendor' slot"""
 
-        available_vendors = [v.name for v in profile_db.get_vendors()]
+        vendor = value and await profile_db.find_vendor(value)
 
-        if value and value in available_vendors:
-            return {"vendor": value}
+        if vendor:
+            vendor_name, _ = vendor
+            return {"vendor": vendor_name}
 
         dispatcher.utter_message(response="utter_no_vendor")
         return {"vendor": None}
@@ -74,8 +75,7 @@ class ValidateTransactionSearchForm(CustomFormValidationAction):
         domain: Dict[Text, Any],
     ) -> Dict[Text, Any]:
         """Validates value of 'time' slot"""
-        timeentity = get_entity_details(tracker, "time")
-        parsedinterval = timeentity and parse_duckling_time_as_interval(timeentity)
+        parsedinterval = entity_index(tracker).time_interval()
         if not parsedinterval:
             dispatcher.utter_message(response="utter_no_transactdate")
             return {"time": None}
@@ -15,7 +15,7 @@ class ActionAddVendor(Action):
     async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: DomainDict
     ) -> List[Dict[Text, Any]]:
-        profile_db.add_vendor(tracker.get_slot("vendor"))
+        await profile_db.add_vendor(tracker.get_slot("vendor"), durable=True)
 
         dispatcher.utter_message(f"{tracker.get_slot('vendor')} is added")
         return [SlotSet("vendor", None)]
@@ -14,9 +14,7 @@ class ActionShowVendors(Action):
     async def run(
         self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: DomainDict
     ) -> List[Dict[Text, Any]]:
-        dispatcher.utter_message(
-            f"Here are available vendors: "
-            f"{[vendor.account_holder_name for vendor in profile_db.get_vendors()]}",
-        )
+        vendors = await profile_db.list_vendors()
+        dispatcher.utter_message(f"Here are available vendors: {vendors}")
 
         return []
@@ -18,10 +18,11 @@ class ValidateVendorForm(FormValidationAction):
         tracker: Tracker,
         domain: DomainDict,
     ) -> Dict[Text, Any]:
-        available_vendors = profile_db.get_vendors()
-        print(available_vendors)
+        available_vendors = await profile_db.list_vendors()
 
-        if vendor_name in available_vendors:
+        if vendor_name and vendor_name.casefold() in (
+            vendor.casefold() for vendor in available_vendors
+        ):
             dispatcher.utter_message(f"Such vendor already exists: {vendor_name}")
             return {"vendor": None}
 
@@ -2,8 +2,6 @@
 import abc
 from typing import Dict, Text, Any, List
 import logging
-import pathlib
-import ruamel.yaml
 from rasa_sdk import utils
 from rasa_sdk.forms import FormValidationAction
 from rasa_sdk.events import (
@@ -15,6 +13,8 @@ from rasa_sdk.events import (
 from rasa_sdk import Tracker
 from rasa_sdk.executor import CollectingDispatcher
 
+from actions.config import custom_forms_config
+
 
 logger = logging.getLogger(__name__)
 
@@ -24,14 +24,6 @@ RVF_SLOT = "repeated_validation_failures"
 CF_SLOT = "AA_CONTINUE_FORM"
 
 
-here = pathlib.Path(__file__).parent.absolute()
-custom_forms_config = (
-    ruamel.yaml.safe_load(open(f"{here}/custom_forms_config.yml", "r")) or {}
-).get("custom_forms", {})
-
-MAX_VALIDATION_FAILURES = custom_forms_config.get("max_validation_failures", 2)
-
-
 class CustomFormValidationAction(FormValidationAction, metaclass=abc.ABCMeta):
     """Validates if slot values are valid and handles repeated validation failures.
 
@@ -120,8 +112,9 @@ class CustomFormValidationAction(FormValidationAction, metaclass=abc.ABCMeta):
         """Validates slots by calling a validation function for each slot.
 
         Calls an explain function for the requested slot when validation fails
-        MAX_VALIDATION_FAILURES in a row, and sets 'AA_CONTINUE_FORM' slot to None, which
-        triggers the bot to utter the 'utter_ask_{form}_AA_CONTINUE_FORM' template.
+        `max_validation_failures` (custom_forms_config.yml) times in a row, and sets
+        'AA_CONTINUE_FORM' slot to None, which triggers the bot to utter the
+        'utter_ask_{form}_AA_CONTINUE_FORM' template.
 
         Args:
             dispatcher: the dispatcher which is used to send messages back to the user.
@@ -163,14 +156,17 @@ class CustomFormValidationAction(FormValidationAction, metaclass=abc.ABCMeta):
         if not requested_slot:
             return rvf_events
 
+        # the slot events of this validation, as (name, value)
+        slot_events = [
+            (event["name"], event["value"])
+            for event in events
+            if event["event"] == "slot"
+        ]
+
         # if the requested slot was not extracted, interupt the form
-        interrupt_form = False
-        if not events:
-            interrupt_form = True
-        else:
-            for event in events:
-                if event["event"] == "slot" and event["name"] == "requested_slot":
-                    interrupt_form = True
+        interrupt_form = not events or any(
+            name == "requested_slot" for name, _ in slot_events
+        )
 
         if interrupt_form:
             # Sending LoopInterrupted will prevent rasa.core from asking for the slot
@@ -183,14 +179,9 @@ class CustomFormValidationAction(FormValidationAction, metaclass=abc.ABCMeta):
             return rvf_events
 
         # Skip if validate_{slot} turned off the form by setting requested_slot to None
-        for event in events:
-            if (
-                event["event"] == "slot"
-                and event["name"] == "requested_slot"
-                and not event["value"]
-            ):
-                rvf_events.append(SlotSet(RVF_SLOT, 0))
-                return rvf_events
+        if any(name == "requested_slot" and not value for name, value in slot_events):
+            rvf_events.append(SlotSet(RVF_SLOT, 0))
+            return rvf_events
 
         rvf = tracker.get_slot(RVF_SLOT)
         if rvf:
@@ -200,15 +191,9 @@ class CustomFormValidationAction(FormValidationAction, metaclass=abc.ABCMeta):
             rvf = 0
 
         # check if validation of the requested_slot failed
-        validation_failed = True
-        for event in events:
-            if (
-                event["event"] == "slot"
-                and event["name"] == requested_slot
-                and event["value"]
-            ):
-                validation_failed = False
-                break
+        validation_failed = not any(
+            name == requested_slot and value for name, value in slot_events
+        )
 
         # keep track of repeated validation failures
         if validation_failed:
@@ -216,7 +201,7 @@ class CustomFormValidationAction(FormValidationAction, metaclass=abc.ABCMeta):
         else:
             rvf = 0
 
-        if rvf >= MAX_VALIDATION_FAILURES:
+        if rvf >= custom_forms_config.get().max_validation_failures:
             rvf_events.extend(
                 await self.explain_requested_slot(dispatcher, tracker, domain)
             )
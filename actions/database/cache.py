@@ -0,0 +1,157 @@
+"""Caches for lookups the profile database repeats on every action invocation.
+
+The caches are sized with environment variables:
+
+    PROFILE_DB_ACCOUNT_CACHE_SIZE   sender ids kept in the cache, 0 disables it (default 10000)
+    PROFILE_DB_ACCOUNT_CACHE_TTL    seconds before an entry is looked up again (default 300)
+    PROFILE_DB_FX_RATE_CACHE_SIZE   exchange rates kept in the cache (default 256)
+    PROFILE_DB_FX_RATE_CACHE_TTL    seconds before a rate is looked up again (default 60)
+    PROFILE_DB_RECIPIENT_CACHE_SIZE senders whose recipients are kept in the cache (default 10000)
+    PROFILE_DB_RECIPIENT_CACHE_TTL  seconds before recipients are looked up again (default 300)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Text, Tuple
+
+ACCOUNT_CACHE_SIZE = int(os.environ.get("PROFILE_DB_ACCOUNT_CACHE_SIZE", 10000))
+ACCOUNT_CACHE_TTL = float(os.environ.get("PROFILE_DB_ACCOUNT_CACHE_TTL", 300))
+# an action invocation looks up the accounts of a few senders at most
+INVOCATION_ACCOUNT_CACHE_SIZE = 64
+FX_RATE_CACHE_SIZE = int(os.environ.get("PROFILE_DB_FX_RATE_CACHE_SIZE", 256))
+FX_RATE_CACHE_TTL = float(os.environ.get("PROFILE_DB_FX_RATE_CACHE_TTL", 60))
+RECIPIENT_CACHE_SIZE = int(os.environ.get("PROFILE_DB_RECIPIENT_CACHE_SIZE", 10000))
+RECIPIENT_CACHE_TTL = float(os.environ.get("PROFILE_DB_RECIPIENT_CACHE_TTL", 300))
+
+
+class LRUCache:
+    """Cache of at most `max_size` entries, the least recently used entry is
+    evicted first. Not locked, for caches used by one thread."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class TTLCache:
+    """LRU cache whose entries expire `ttl` seconds after they were added,
+    the least recently used entry is evicted once `max_size` entries are cached.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[Text, Any]:
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class AccountCache(TTLCache):
+    """Cache of `session_id` -> (`Account.id`, account number)"""
+
+    def __init__(
+        self, max_size: int = ACCOUNT_CACHE_SIZE, ttl: float = ACCOUNT_CACHE_TTL
+    ):
+        super().__init__(max_size, ttl)
+        self.invocation_hits = 0
+
+    def put(self, session_id: Text, account_id: int, account_number: Text):
+        super().put(session_id, (account_id, account_number))
+
+    def record_invocation_hit(self):
+        """Count a lookup answered by the invocation's own cache"""
+        with self.lock:
+            self.invocation_hits += 1
+
+    def stats(self) -> Dict[Text, Any]:
+        stats = super().stats()
+        with self.lock:
+            stats["invocation_hits"] = self.invocation_hits
+        return stats
+
+
+class InvocationAccountCache(TTLCache):
+    """Cache of `session_id` -> (`Account.id`, account number) of one database
+    session. Bounded, as the session of a sync `ProfileDB` lives as long as the
+    process."""
+
+    def __init__(
+        self,
+        max_size: int = INVOCATION_ACCOUNT_CACHE_SIZE,
+        ttl: float = ACCOUNT_CACHE_TTL,
+    ):
+        super().__init__(max_size, ttl)
+
+
+class FxRateCache(TTLCache):
+    """Cache of currency code -> `FxRate.rate`"""
+
+    def __init__(
+        self, max_size: int = FX_RATE_CACHE_SIZE, ttl: float = FX_RATE_CACHE_TTL
+    ):
+        super().__init__(max_size, ttl)
+
+
+class RecipientCache(TTLCache):
+    """Cache of `session_id` -> `RecipientIndex`"""
+
+    def __init__(
+        self, max_size: int = RECIPIENT_CACHE_SIZE, ttl: float = RECIPIENT_CACHE_TTL
+    ):
+        super().__init__(max_size, ttl)
@@ -0,0 +1,91 @@
+"""Exchange rates for converting currency account balances.
+
+Rates live in the `fx_rates` table, as the value of one unit of a currency in
+`BASE_CURRENCY`. New databases are seeded from `data/fx_rates.csv`, which stands in
+for a rates feed. Load newer rates from a CSV file with `currency,rate` columns:
+
+    python -m actions.database.fx [--file rates.csv]
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Text, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from actions.database.tables.fxrate import FxRate
+
+BASE_CURRENCY = "USD"
+FX_RATES_FILE = Path(__file__).parent / "data" / "fx_rates.csv"
+
+# symbols used for `Account.currency` and by duckling
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "CNY"}
+
+
+def normalize_currency(currency: Text) -> Text:
+    """ISO code of a currency code or symbol, e.g. `"$"` -> `"USD"`"""
+    return CURRENCY_SYMBOLS.get(currency, currency.upper())
+
+
+def read_fx_rates(path: Union[Text, Path] = FX_RATES_FILE) -> Dict[Text, float]:
+    """Read `currency,rate` rows from a CSV file"""
+    with open(path, newline="") as rates_file:
+        return {
+            normalize_currency(row["currency"]): float(row["rate"])
+            for row in csv.DictReader(rates_file)
+        }
+
+
+def load_fx_rates(session: Session, rates: Dict[Text, float]):
+    """Insert or update exchange rates, without committing"""
+    for currency, rate in rates.items():
+        session.merge(FxRate(currency=currency, rate=rate))
+    session.flush()
+
+
+def convert_amounts(
+    amounts: Sequence[float],
+    from_currencies: Union[Text, Sequence[Text]],
+    to_currency: Text,
+    rates: Dict[Text, float],
+) -> np.ndarray:
+    """Convert `amounts` from their currencies (one for all, or one per amount) into
+    `to_currency` in one vectorized pass, rounded to cents. `rates` must hold every
+    currency involved, see `ProfileDB.get_fx_rates`."""
+    amounts = np.asarray(amounts, dtype=float)
+    if isinstance(from_currencies, str):
+        from_rates = rates[normalize_currency(from_currencies)]
+    else:
+        currencies, positions = np.unique(
+            [normalize_currency(currency) for currency in from_currencies],
+            return_inverse=True,
+        )
+        from_rates = np.array([rates[currency] for currency in currencies])[positions]
+    return np.round(amounts * from_rates / rates[normalize_currency(to_currency)], 2)
+
+
+def main(args: Optional[List[Text]] = None) -> int:
+    # the provider imports `ProfileDB`, which imports this module
+    from actions.database.provider import migrate
+
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument(
+        "--file",
+        default=str(FX_RATES_FILE),
+        help="CSV file with currency,rate columns",
+    )
+    parsed_args = arg_parser.parse_args(args)
+
+    profile_db = migrate()
+    rates = read_fx_rates(parsed_args.file)
+    load_fx_rates(profile_db.session, rates)
+    profile_db.session.commit()
+    profile_db.fx_rate_cache.clear()
+    print(f"Loaded {len(rates)} exchange rate(s) from {parsed_args.file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Latency statistics shared by the profile database components."""
+import statistics
+import threading
+from collections import deque
+from typing import Any, Dict, Text
+
+LATENCY_SAMPLES = 1000
+
+
+class LatencyStats:
+    """Count, mean, p50/p95 and max of durations in seconds.
+    Percentiles are computed over the last `max_samples` durations."""
+
+    def __init__(self, max_samples: int = LATENCY_SAMPLES):
+        self.samples: "deque[float]" = deque(maxlen=max_samples)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.seconds_total += seconds
+            self.seconds_max = max(self.seconds_max, seconds)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+            seconds_total = self.seconds_total
+            seconds_max = self.seconds_max
+        return {
+            "count": count,
+            "seconds_avg": seconds_total / count if count else 0.0,
+            "seconds_p50": statistics.median(samples) if samples else 0.0,
+            "seconds_p95": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+            "seconds_max": seconds_max,
+        }
@@ -0,0 +1,22 @@
+"""Create the profile database and its tables.
+
+Run this once before starting the action server, and again after upgrades that add
+tables. Run it from the project root:
+
+    python -m actions.database.migrate
+"""
+import logging
+
+from actions.database.provider import migrate, PROFILE_DB_URL
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    migrate()
+    logger.info(f"Profile database at {PROFILE_DB_URL} is up to date.")
+
+
+if __name__ == "__main__":
+    main()
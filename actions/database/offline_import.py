@@ -0,0 +1,235 @@
+"""Bulk import of offline transactions from CSV or JSONL statements.
+
+Every row names the conversation session that paid, the account it paid (a vendor
+or another account holder), the amount and when, e.g. as CSV:
+
+    session_id,vendor,amount,timestamp
+    default,Starbucks,4.50,2021-03-01T08:30:00
+
+or as JSONL, one object with the same keys per line. The file is read in chunks of
+`--batch-size` rows, names are resolved through the vendor registry and a cache
+of the other names seen so far, and every chunk is inserted with one `executemany`
+and committed together with its `account_balances` and `transaction_rollups`
+changes, so memory use does not grow with the file (the cache of names keeps the
+`IMPORT_ACCOUNT_CACHE_SIZE` most recently used ones). Rows that cannot be parsed or
+resolved, or whose amount is not a positive number, are skipped and reported. Run
+it from the project root:
+
+    python -m actions.database.offline_import statement.csv [--session-id default]
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Text
+
+from actions.database.cache import LRUCache
+from actions.database.provider import migrate
+from actions.database.tables.transaction.offline import OfflineTransaction
+from actions.profile_db import ACCOUNT_NUMBER_LENGTH, ProfileDB
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_ACCOUNT_CACHE_SIZE = 10000
+FORMATS = ["csv", "jsonl"]
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+
+def guess_format(path: Text) -> Text:
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return "jsonl" if extension in ["jsonl", "ndjson", "json"] else "csv"
+
+
+def read_rows(
+    path: Text, file_format: Optional[Text] = None
+) -> Iterator[Optional[Dict]]:
+    """Stream the rows of a CSV or JSONL file as dicts, `None` for lines that are
+    not valid JSON"""
+    file_format = file_format or guess_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None
+
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split `rows` into lists of at most `size` rows, reading them lazily"""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class AccountResolver:
+    """Resolves the session ids and account names of imported rows to
+    `Account.id`s, with one query per name not seen recently"""
+
+    def __init__(
+        self, profile_db: ProfileDB, cache_size: int = IMPORT_ACCOUNT_CACHE_SIZE
+    ):
+        self.profile_db = profile_db
+        self.registry = profile_db.get_vendor_registry()
+        # name -> `Account.id`, `None` if there is no account of that name
+        self.account_ids = LRUCache(cache_size)
+
+    def session_account_id(self, session_id: Text) -> Optional[int]:
+        return self.profile_db.find_session_account_id(session_id)
+
+    def account_id(self, name: Text) -> Optional[int]:
+        vendor = self.registry.get(name)
+        if vendor:
+            return int(vendor[1])
+        if name not in self.account_ids:
+            self.account_ids.put(name, self.profile_db.find_account_id(name))
+        return self.account_ids.get(name)
+
+
+def to_offline_transaction(
+    row: Optional[Dict], resolver: AccountResolver, session_id: Optional[Text] = None
+) -> Dict[Text, Any]:
+    """Convert a row of the file to a row of the `offline_transactions` table.
+    Raises `ValueError` if a value is missing or invalid."""
+    if not isinstance(row, dict):
+        raise ValueError("not an object")
+    row_session_id = row.get("session_id") or session_id
+    if not row_session_id:
+        raise ValueError("no session_id")
+    from_account = resolver.session_account_id(row_session_id)
+    if from_account is None:
+        raise ValueError(f"no account for session '{row_session_id}'")
+    vendor = row.get("vendor") or ""
+    to_account = resolver.account_id(vendor.strip())
+    if to_account is None:
+        raise ValueError(f"no account named '{vendor}'")
+    amount = float(row["amount"])
+    if not (math.isfinite(amount) and amount > 0):
+        raise ValueError(f"amount {row['amount']!r} is not a positive number")
+    timestamp = row.get("timestamp")
+    return {
+        "from_account": from_account,
+        "to_account": to_account,
+        "amount": amount,
+        "timestamp": datetime.fromisoformat(timestamp) if timestamp else datetime.now(),
+    }
+
+
+def with_account_numbers(values: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+    """`values` with account numbers instead of `Account.id`s, as in `transactions`"""
+    return [
+        {
+            "from_account_number": f"%0.{ACCOUNT_NUMBER_LENGTH}d"
+            % value["from_account"],
+            "to_account_number": f"%0.{ACCOUNT_NUMBER_LENGTH}d" % value["to_account"],
+            "amount": value["amount"],
+            "timestamp": value["timestamp"],
+        }
+        for value in values
+    ]
+
+
+def balance_deltas(rows: List[Dict[Text, Any]]) -> Dict[Text, float]:
+    """Balance change of every account number involved in `rows`"""
+    deltas: Dict[Text, float] = {}
+    for row in rows:
+        for account_number, amount in [
+            (row["from_account_number"], -row["amount"]),
+            (row["to_account_number"], row["amount"]),
+        ]:
+            deltas[account_number] = deltas.get(account_number, 0) + amount
+    return deltas
+
+
+def import_offline_transactions(
+    profile_db: ProfileDB,
+    rows: Iterable[Optional[Dict]],
+    session_id: Optional[Text] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportReport:
+    """Insert `rows` as offline transactions, committing every `batch_size` rows.
+    `session_id` is used for rows without a `session_id`."""
+    report = ImportReport()
+    resolver = AccountResolver(profile_db)
+    statement = OfflineTransaction.__table__.insert()
+    started = time.perf_counter()
+    line_number = 0
+    for chunk in chunked(rows, batch_size):
+        values = []
+        for row in chunk:
+            line_number += 1
+            try:
+                values.append(to_offline_transaction(row, resolver, session_id))
+            except (KeyError, TypeError, ValueError) as e:
+                report.skipped += 1
+                logger.warning(f"Skipping row {line_number}: {e!r}")
+        if values:
+            profile_db.session.execute(statement, values)
+            transactions = with_account_numbers(values)
+            profile_db.update_balances(balance_deltas(transactions))
+            profile_db.update_rollups(transactions)
+            profile_db.session.commit()
+            report.imported += len(values)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main(args: Optional[List[Text]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("file", help="CSV or JSONL file of offline transactions")
+    arg_parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        help="format of the file, guessed from its extension by default",
+    )
+    arg_parser.add_argument(
+        "--session-id", help="session id of rows without a session_id"
+    )
+    arg_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=IMPORT_BATCH_SIZE,
+        help="rows per insert and commit",
+    )
+    parsed_args = arg_parser.parse_args(args)
+
+    profile_db = migrate()
+    report = import_offline_transactions(
+        profile_db,
+        read_rows(parsed_args.file, parsed_args.format),
+        session_id=parsed_args.session_id,
+        batch_size=parsed_args.batch_size,
+    )
+    print(
+        f"Imported {report.imported} offline transaction(s) from {parsed_args.file} "
+        f"in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/sec), "
+        f"skipped {report.skipped}"
+    )
+    return 1 if report.skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
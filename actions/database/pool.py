@@ -0,0 +1,96 @@
+"""Connection pool settings and metrics for the profile database engines.
+
+The pool is tuned with environment variables:
+
+    PROFILE_DB_POOL_SIZE      connections kept open in the pool (default 10)
+    PROFILE_DB_MAX_OVERFLOW   extra connections opened under load (default 20)
+    PROFILE_DB_POOL_TIMEOUT   seconds to wait for a free connection (default 30)
+    PROFILE_DB_POOL_RECYCLE   seconds after which connections are replaced (default 1800)
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Text
+
+import sqlalchemy as sa
+from sqlalchemy.engine.base import Engine
+
+
+def pool_options(database_url: Text) -> Dict[Text, Any]:
+    """Keyword arguments for `create_engine` / `create_async_engine`.
+    sqlite keeps SQLAlchemy's default pool: opening the file is cheap, and pooled
+    aiosqlite connections keep their worker threads alive until the engine is
+    disposed.
+    """
+    url = sa.engine.make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": int(os.environ.get("PROFILE_DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("PROFILE_DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": float(os.environ.get("PROFILE_DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("PROFILE_DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": True,
+    }
+
+
+class PoolMetrics:
+    """Counts connection pool checkouts and how long callers waited for a connection.
+    `engine` is a synchronous engine, use `AsyncEngine.sync_engine` for async ones.
+    """
+
+    def __init__(self, engine: Engine):
+        self.pool = engine.pool
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        sa.event.listen(engine, "connect", self.on_connect)
+        sa.event.listen(engine, "checkout", self.on_checkout)
+        sa.event.listen(engine, "checkin", self.on_checkin)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.checkins += 1
+            self.checked_out -= 1
+
+    def record_wait(self, started: float):
+        """Record the wait for a connection that was requested at `started`
+        (a `time.perf_counter()` value)"""
+        waited = time.perf_counter() - started
+        with self.lock:
+            self.waits += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        """Current counters, plus the pool's own status line"""
+        with self.lock:
+            return {
+                "pool": self.pool.status(),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "waits": self.waits,
+                "wait_seconds_avg": self.wait_seconds_total / self.waits
+                if self.waits
+                else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
@@ -0,0 +1,59 @@
+"""Process-wide access to the profile database.
+
+All action modules share one `AsyncProfileDB`, and with it one engine and one
+connection pool. It is created on first use rather than at import time, and no DDL
+runs on that path: create the database and its tables with the explicit migrate
+step before starting the action server (the action server image runs it before
+every start):
+
+    python -m actions.database.migrate
+"""
+import os
+import threading
+from typing import Any, Optional, Text
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from actions.async_profile_db import AsyncProfileDB, get_async_database_url
+from actions.database.pool import pool_options
+from actions.profile_db import create_database, ProfileDB
+
+PROFILE_DB_NAME = os.environ.get("PROFILE_DB_NAME", "profile")
+PROFILE_DB_URL = os.environ.get("PROFILE_DB_URL", f"sqlite:///{PROFILE_DB_NAME}.db")
+
+_profile_db: Optional[AsyncProfileDB] = None
+_profile_db_lock = threading.Lock()
+
+
+def get_profile_db() -> AsyncProfileDB:
+    """Get the process-wide `AsyncProfileDB`, creating it on first use"""
+    global _profile_db
+    if _profile_db is None:
+        with _profile_db_lock:
+            if _profile_db is None:
+                engine = create_async_engine(
+                    get_async_database_url(PROFILE_DB_URL),
+                    **pool_options(PROFILE_DB_URL),
+                )
+                _profile_db = AsyncProfileDB(engine)
+    return _profile_db
+
+
+class LazyProfileDB:
+    """Stands in for the process-wide `AsyncProfileDB` until it is first used"""
+
+    def __getattr__(self, name: Text) -> Any:
+        return getattr(get_profile_db(), name)
+
+
+profile_db = LazyProfileDB()
+
+
+def migrate(
+    database_url: Text = PROFILE_DB_URL, database_name: Text = PROFILE_DB_NAME
+) -> ProfileDB:
+    """Create the profile database and its tables if they do not exist yet"""
+    engine = sa.create_engine(database_url)
+    create_database(engine, database_name)
+    return ProfileDB(engine)
@@ -0,0 +1,124 @@
+"""Provisioning of new conversation sessions in the background.
+
+`action_session_start` only creates the account of a new sender, which is a single
+insert. The sample history (recipients, transactions and credit cards) is added by
+a background worker, one session at a time, so the first turn does not wait for
+it. Seeding is mostly Python code, so the worker runs it on a thread of its own
+(`AsyncProfileDB.run_in_thread`) and the event loop keeps serving other
+conversations meanwhile. `AsyncProfileDB` methods that read the history wait until it is there, for at
+most `PROFILE_DB_PROVISIONING_WAIT` seconds (default 5). After that they run
+anyway and see whatever has been committed so far.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Text, Tuple
+
+from actions.background import LoopWorker
+from actions.database.metrics import LatencyStats
+from actions.instrumentation import detach
+
+if TYPE_CHECKING:
+    from actions.async_profile_db import AsyncProfileDB
+
+logger = logging.getLogger(__name__)
+
+PROVISIONING_WAIT = float(os.environ.get("PROFILE_DB_PROVISIONING_WAIT", 5))
+
+
+class SessionProvisioning(LoopWorker):
+    """Adds the sample history of new sessions in a background worker task"""
+
+    def __init__(
+        self, profile_db: "AsyncProfileDB", wait_timeout: float = PROVISIONING_WAIT
+    ):
+        super().__init__()
+        self.profile_db = profile_db
+        self.wait_timeout = wait_timeout
+        self.queue: "Optional[asyncio.Queue[Text]]" = None
+        self.pending: Dict[Text, asyncio.Future] = {}
+        self.provisioned = 0
+        self.failed = 0
+        self.wait_timeouts = 0
+        self.first_turn = LatencyStats()
+        self.provisioning = LatencyStats()
+
+    async def start(self, session_id: Text) -> Tuple[int, Text]:
+        """Create the account of `session_id` if needed, and queue its history if it
+        has none yet. Returns the `Account.id` and account number."""
+        account_ids, history_exists = await self.profile_db.run_sync(
+            lambda profile_db: (
+                profile_db.get_account_ids(session_id),
+                profile_db.check_session_history_exists(session_id),
+            )
+        )
+        if not history_exists and session_id not in self.pending:
+            self.enqueue(session_id)
+        return account_ids
+
+    def on_new_loop(self):
+        self.queue = asyncio.Queue()
+        self.pending = {}
+
+    def enqueue(self, session_id: Text):
+        self.ensure_worker()
+        self.pending[session_id] = self.loop.create_future()
+        self.queue.put_nowait(session_id)
+
+    async def work(self):
+        """Provision queued sessions one at a time"""
+        # the queries are not the ones of the action that started the worker
+        detach()
+        queue = self.queue
+        while True:
+            session_id = await queue.get()
+            started = time.perf_counter()
+            try:
+                await self.profile_db.run_in_thread(
+                    lambda profile_db: profile_db.check_session_history_exists(
+                        session_id
+                    )
+                    or profile_db.add_session_history(session_id)
+                )
+                self.provisioned += 1
+                self.provisioning.record(time.perf_counter() - started)
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Provisioning session '{session_id}' failed")
+            finally:
+                future = self.pending.pop(session_id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+                queue.task_done()
+
+    async def wait(self, session_id: Text) -> bool:
+        """Wait for the history of `session_id` if it is being provisioned.
+        Returns `False` if it is still missing after `wait_timeout` seconds."""
+        future = self.pending.get(session_id)
+        if future is None or future.done():
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.wait_timeouts += 1
+            logger.warning(
+                f"History of session '{session_id}' is not provisioned yet, "
+                f"continuing without it"
+            )
+            return False
+
+    def record_first_turn(self, seconds: float):
+        """Record how long the first turn (`action_session_start`) of a session took"""
+        self.first_turn.record(seconds)
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            "pending": len(self.pending),
+            "provisioned": self.provisioned,
+            "failed": self.failed,
+            "wait_timeouts": self.wait_timeouts,
+            "first_turn": self.first_turn.snapshot(),
+            "provisioning": self.provisioning.snapshot(),
+        }
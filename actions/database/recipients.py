@@ -0,0 +1,66 @@
+"""Per-sender index of known recipients, for resolving the names users type.
+
+A `RecipientIndex` is built from one query when a sender's recipients are first
+needed and kept in the `RecipientCache`. It matches full names and first names
+ignoring case, and misspelled names through shared trigrams and edit distance.
+"""
+import difflib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Text, Tuple
+
+FUZZY_MATCH_CUTOFF = 0.75
+
+
+def trigrams(text: Text) -> Set[Text]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class RecipientIndex:
+    """Recipient nickname -> account number of one sender"""
+
+    def __init__(self, recipients: Iterable[Tuple[Text, Text]]):
+        self.recipients: Dict[Text, Tuple[Text, Text]] = {}
+        for nickname, account_number in recipients:
+            # like `ProfileDB.get_recipient_from_name`, the first one wins
+            self.recipients.setdefault(nickname.casefold(), (nickname, account_number))
+        self.first_names: Dict[Text, List[Text]] = defaultdict(list)
+        self.trigrams: Dict[Text, Set[Text]] = defaultdict(set)
+        for key in self.recipients:
+            self.first_names[key.split()[0]].append(key)
+            for trigram in trigrams(key):
+                self.trigrams[trigram].add(key)
+
+    def __len__(self) -> int:
+        return len(self.recipients)
+
+    def names(self) -> List[Text]:
+        return [nickname for nickname, _ in self.recipients.values()]
+
+    def get(self, name: Text) -> Optional[Tuple[Text, Text]]:
+        """(nickname, account number) of the recipient called `name`, ignoring case"""
+        return self.recipients.get(name.casefold())
+
+    def find(self, name: Text) -> Optional[Tuple[Text, Text]]:
+        """Resolve what a user typed: a full name or a first name ignoring case,
+        or else the closest full or first name"""
+        if not name or not name.strip():
+            return None
+        key = name.casefold().strip()
+        if key in self.recipients:
+            return self.recipients[key]
+        if key in self.first_names:
+            return self.recipients[self.first_names[key][0]]
+
+        candidates = {
+            candidate
+            for trigram in trigrams(key)
+            for candidate in self.trigrams.get(trigram, ())
+        }
+        best, best_ratio = None, FUZZY_MATCH_CUTOFF
+        for candidate in sorted(candidates):
+            for candidate_name in [candidate, candidate.split()[0]]:
+                ratio = difflib.SequenceMatcher(None, key, candidate_name).ratio()
+                if ratio > best_ratio:
+                    best, best_ratio = candidate, ratio
+        return self.recipients[best] if best else None
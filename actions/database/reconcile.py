@@ -0,0 +1,49 @@
+"""Rebuild the `account_balances` ledger from the `transactions` table.
+
+Reports every account whose ledger balance drifted from the sum of its
+transactions. With `--rollups`, the daily `transaction_rollups` are rebuilt too.
+Run it from the project root:
+
+    python -m actions.database.reconcile [--check] [--rollups]
+"""
+import argparse
+import logging
+import sys
+from typing import List, Optional, Text
+
+from actions.database.provider import migrate
+
+logger = logging.getLogger(__name__)
+
+
+def main(args: Optional[List[Text]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only report drift, do not rebuild the ledger",
+    )
+    arg_parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="also rebuild the daily transaction rollups",
+    )
+    parsed_args = arg_parser.parse_args(args)
+
+    profile_db = migrate()
+
+    drift = profile_db.reconcile_balances(fix=not parsed_args.check)
+    for account_number, (ledger, actual) in sorted(drift.items()):
+        print(f"{account_number}: ledger {ledger:.2f}, transactions {actual:.2f}")
+    print(
+        f"{len(drift)} account(s) drifted"
+        + ("" if parsed_args.check else ", ledger rebuilt")
+    )
+    if parsed_args.rollups:
+        profile_db.rebuild_rollups()
+        print("Transaction rollups rebuilt")
+    return 1 if drift and parsed_args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Sample transaction history for new conversation sessions.
+
+Amounts and dates are drawn in bulk with NumPy from a `numpy.random.Generator`,
+so a seeded generator reproduces the same history, and the rows are inserted with
+Core `executemany` batches instead of one ORM object per transaction.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from actions.database.tables.transaction.online import Transaction
+
+HISTORY_START = datetime(2019, 1, 1)
+TRANSACTION_INSERT_BATCH_SIZE = 1000
+
+# (lowest amount, highest amount, days per transaction)
+VENDOR_SPEND = (5, 50, 2)
+INTEREST_DEPOSIT = (5, 20, 30)
+SALARY_DEPOSIT = (1000, 2000, 14)
+
+
+def random_amounts(
+    rng: np.random.Generator, low: float, high: float, size: int
+) -> np.ndarray:
+    """`size` distinct amounts in whole cents from `low` up to `high`"""
+    cents = int(round((high - low) * 100))
+    return np.round(low + rng.choice(cents, size=size, replace=size > cents) / 100, 2)
+
+
+def random_dates(
+    rng: np.random.Generator, start_date: datetime, number_of_days: int, size: int
+) -> List[datetime]:
+    """`size` dates in the `number_of_days` days from `start_date`"""
+    days = rng.integers(number_of_days, size=size).astype("timedelta64[D]")
+    return (np.datetime64(start_date, "D") + days).astype("datetime64[us]").tolist()
+
+
+def generate_transactions(
+    rng: np.random.Generator,
+    account_number: Text,
+    vendor_account_numbers: List[Text],
+    depositor_account_numbers: Dict[Text, Text],
+    end_date: Optional[datetime] = None,
+) -> Tuple[List[Dict[Text, Any]], Dict[Text, float]]:
+    """Spend at every vendor and deposits from every depositor (account number ->
+    account holder name) since `HISTORY_START`.
+    Returns the transaction rows and the balance change of every account involved.
+    """
+    number_of_days = ((end_date or datetime.now()) - HISTORY_START).days
+    counterparties = [
+        (vendor_account_number, VENDOR_SPEND, True)
+        for vendor_account_number in vendor_account_numbers
+    ] + [
+        (
+            depositor_account_number,
+            INTEREST_DEPOSIT if name == "interest" else SALARY_DEPOSIT,
+            False,
+        )
+        for depositor_account_number, name in depositor_account_numbers.items()
+    ]
+
+    rows: List[Dict[Text, Any]] = []
+    balance_deltas: Dict[Text, float] = {account_number: 0.0}
+    for counterparty, (low, high, days_per_transaction), spend in counterparties:
+        size = number_of_days // days_per_transaction
+        amounts = random_amounts(rng, low, high, size)
+        dates = random_dates(rng, HISTORY_START, number_of_days, size)
+        from_account_number, to_account_number = (
+            (account_number, counterparty) if spend else (counterparty, account_number)
+        )
+        rows.extend(
+            {
+                "from_account_number": from_account_number,
+                "to_account_number": to_account_number,
+                "amount": amount,
+                "timestamp": date,
+            }
+            for amount, date in zip(amounts.tolist(), dates)
+        )
+        total = float(amounts.sum())
+        balance_deltas[from_account_number] = (
+            balance_deltas.get(from_account_number, 0) - total
+        )
+        balance_deltas[to_account_number] = (
+            balance_deltas.get(to_account_number, 0) + total
+        )
+    return rows, balance_deltas
+
+
+def insert_transactions(
+    session: Session,
+    rows: List[Dict[Text, Any]],
+    batch_size: int = TRANSACTION_INSERT_BATCH_SIZE,
+):
+    """Insert transaction rows in `executemany` batches of `batch_size`"""
+    statement = Transaction.__table__.insert()
+    for start in range(0, len(rows), batch_size):
+        session.execute(statement, rows[start : start + batch_size])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -13,8 +13,16 @@ class Account(Base):
     """
 
     __tablename__ = "account"
+    # vendors are looked up by name among the `is_vendor` accounts
+    __table_args__ = (
+        Index(
+            "ix_account_is_vendor_account_holder_name",
+            "is_vendor",
+            "account_holder_name",
+        ),
+    )
     id = Column(Integer, primary_key=True)
-    session_id = Column(String(255))
-    account_holder_name = Column(String(255))
+    session_id = Column(String(255), index=True)
+    account_holder_name = Column(String(255), index=True)
     currency = Column(String(255))
     is_vendor = Column(Boolean(), default=False)
@@ -10,6 +10,6 @@ class RecipientRelationship(Base):
 
     __tablename__ = "recipient_relationships"
     id = Column(Integer, primary_key=True)
-    account_id = Column(Integer, ForeignKey(Account.id))
+    account_id = Column(Integer, ForeignKey(Account.id), index=True)
     recipient_account_id = Column(Integer, ForeignKey(Account.id))
     recipient_nickname = Column(String(255))
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, REAL
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class AccountBalance(Base):
+    """Account balances table, kept up to date together with `transactions`.
+    `account_number` is a bank or credit card account number, as used in
+    `Transaction.from_account_number` and `Transaction.to_account_number`.
+    """
+
+    __tablename__ = "account_balances"
+    account_number = Column(String(255), primary_key=True)
+    balance = Column(REAL(), default=0)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class CacheVersion(Base):
+    """Cache versions table. `version` is incremented whenever the data behind the
+    in-process cache `name` changes, so every action server worker can tell that
+    its copy is stale."""
+
+    __tablename__ = "cache_versions"
+    name = Column(String(255), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -12,4 +12,4 @@ class CreditCard(Base):
     credit_card_name = Column(String(255))
     minimum_balance = Column(REAL)
     current_balance = Column(REAL)
-    account_id = Column(Integer)
+    account_id = Column(Integer, index=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime, REAL, func
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class FxRate(Base):
+    """Exchange rates table. `rate` is the value of one unit of `currency` in
+    `actions.database.fx.BASE_CURRENCY`"""
+
+    __tablename__ = "fx_rates"
+    currency = Column(String(3), primary_key=True)
+    rate = Column(REAL(), nullable=False)
+    updated_at = Column(DateTime(), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, REAL, Column, ForeignKey, DateTime, func
+from sqlalchemy import Integer, REAL, Column, ForeignKey, DateTime, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 
 from actions.database.tables.account import Account
@@ -7,7 +7,20 @@ Base = declarative_base()
 
 
 class OfflineTransaction(Base):
+    """Offline transactions table. `to/from` are `Account.id`s"""
+
     __tablename__ = "offline_transactions"
+    # like `transactions`, searches filter on one side and a time range
+    __table_args__ = (
+        Index(
+            "ix_offline_transactions_from_account_timestamp",
+            "from_account",
+            "timestamp",
+        ),
+        Index(
+            "ix_offline_transactions_to_account_timestamp", "to_account", "timestamp"
+        ),
+    )
     id = Column(Integer(), primary_key=True)
     amount = Column(REAL())
     from_account = Column(Integer(), ForeignKey(Account.id))
@@ -1,17 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, REAL, ForeignKey, func
+from sqlalchemy import Column, Integer, String, DateTime, REAL, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 
-from actions.database.tables.account import Account
-
 Base = declarative_base()
 
 
 class Transaction(Base):
-    """Transactions table. `to/from` are `Account.id`"""
+    """Transactions table. `to/from` are bank or credit card account numbers,
+    see `ProfileDB.get_account_number`"""
 
     __tablename__ = "transactions"
+    # searches filter on one side of the transaction and a time range
+    __table_args__ = (
+        Index(
+            "ix_transactions_from_account_timestamp", "from_account_number", "timestamp"
+        ),
+        Index("ix_transactions_to_account_timestamp", "to_account_number", "timestamp"),
+    )
     id = Column(Integer(), primary_key=True)
     amount = Column(REAL())
-    from_account = Column(Integer(), ForeignKey(Account.id))
-    to_account = Column(Integer(), ForeignKey(Account.id))
+    from_account_number = Column(String(255))
+    to_account_number = Column(String(255))
     timestamp = Column(DateTime(), server_default=func.now())
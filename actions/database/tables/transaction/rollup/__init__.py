@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Date, Index, Integer, REAL, String
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class TransactionRollup(Base):
+    """Daily rollups of the online and offline transactions, one row per (from
+    account number, to account number, day). Kept up to date together with the
+    transactions, see `ProfileDB.update_rollups`."""
+
+    __tablename__ = "transaction_rollups"
+    # spend searches filter on `from_account_number` (and the vendor in the
+    # primary key), deposit searches on `to_account_number`, both on a day range
+    __table_args__ = (
+        Index("ix_transaction_rollups_from_account_day", "from_account_number", "day"),
+        Index("ix_transaction_rollups_to_account_day", "to_account_number", "day"),
+    )
+    from_account_number = Column(String(255), primary_key=True)
+    to_account_number = Column(String(255), primary_key=True)
+    day = Column(Date(), primary_key=True)
+    total = Column(REAL(), nullable=False, default=0)
+    count = Column(Integer(), nullable=False, default=0)
+    smallest = Column(REAL())
+    largest = Column(REAL())
@@ -0,0 +1,95 @@
+"""In-process registry of vendors, for validating and resolving vendor names.
+
+The registry maps vendor names to account numbers. It is loaded with one query
+over the `is_vendor` accounts and kept until the `vendors` row of the
+`cache_versions` table changes, which `ProfileDB.add_vendor` does. Every action
+server worker compares its copy with that version at most once every
+`PROFILE_DB_VENDOR_REGISTRY_CHECK` seconds (default 5).
+"""
+import bisect
+import difflib
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Text, Tuple
+
+VENDOR_REGISTRY_CHECK = float(os.environ.get("PROFILE_DB_VENDOR_REGISTRY_CHECK", 5))
+VENDOR_CACHE_NAME = "vendors"
+FUZZY_MATCH_CUTOFF = 0.8
+
+
+class VendorRegistry:
+    """Vendor name -> account number, with case-insensitive, prefix and fuzzy
+    lookups"""
+
+    def __init__(self, check_interval: float = VENDOR_REGISTRY_CHECK):
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.checked_at = 0.0
+        self.vendors: Dict[Text, Tuple[Text, Text]] = {}
+        self.keys: List[Text] = []
+        self.loads = 0
+
+    def needs_check(self) -> bool:
+        """Whether the version should be compared with the database again"""
+        return (
+            self.version is None
+            or time.monotonic() - self.checked_at >= self.check_interval
+        )
+
+    def mark_checked(self):
+        self.checked_at = time.monotonic()
+
+    def load(self, version: int, vendors: Iterable[Tuple[Text, Text]]):
+        """Replace the registry with (name, account number) pairs of `version`"""
+        loaded = {}
+        for name, account_number in vendors:
+            # like the other lookups by name, the first account wins
+            loaded.setdefault(name.casefold(), (name, account_number))
+        with self.lock:
+            self.vendors = loaded
+            self.keys = sorted(loaded)
+            self.version = version
+            self.checked_at = time.monotonic()
+            self.loads += 1
+
+    def invalidate(self):
+        """Reload on next use"""
+        with self.lock:
+            self.version = None
+
+    def names(self) -> List[Text]:
+        return [name for name, _ in self.vendors.values()]
+
+    def get(self, name: Text) -> Optional[Tuple[Text, Text]]:
+        """(name, account number) of the vendor called `name`, ignoring case"""
+        return self.vendors.get(name.casefold())
+
+    def match_prefix(self, prefix: Text) -> List[Tuple[Text, Text]]:
+        """(name, account number) of every vendor whose name starts with `prefix`"""
+        prefix = prefix.casefold()
+        keys = self.keys
+        start = bisect.bisect_left(keys, prefix)
+        matches = []
+        for key in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            matches.append(self.vendors[key])
+        return matches
+
+    def find(self, name: Text) -> Optional[Tuple[Text, Text]]:
+        """Resolve what a user typed: an exact name ignoring case, the only name
+        starting with it, or else the closest name"""
+        if not name:
+            return None
+        vendor = self.get(name)
+        if vendor:
+            return vendor
+        matches = self.match_prefix(name)
+        if len(matches) == 1:
+            return matches[0]
+        close = difflib.get_close_matches(
+            name.casefold(), self.keys, n=1, cutoff=FUZZY_MATCH_CUTOFF
+        )
+        return self.vendors[close[0]] if close else None
@@ -0,0 +1,161 @@
+"""Write-behind batching of profile database inserts.
+
+With write-behind enabled (`PROFILE_DB_WRITE_BEHIND=1`), `AsyncProfileDB.transact`,
+`add_offline_transaction` and `add_vendor` put their writes into a bounded queue
+and return. A background task writes queued writes in group commits, once
+`PROFILE_DB_WRITE_BEHIND_BATCH` writes (default 100) are queued or the oldest has
+waited `PROFILE_DB_WRITE_BEHIND_DELAY` seconds (default 0.05). Callers that need
+the write to be durable pass `durable=True` and are answered after its commit.
+The queue holds at most `PROFILE_DB_WRITE_BEHIND_QUEUE` writes (default 10000),
+callers wait for room beyond that.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Text, Tuple
+
+from actions.background import LoopWorker
+from actions.database.metrics import LatencyStats
+from actions.instrumentation import detach
+
+if TYPE_CHECKING:
+    from actions.async_profile_db import AsyncProfileDB
+    from actions.profile_db import ProfileDB
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = os.environ.get("PROFILE_DB_WRITE_BEHIND", "0").lower() in [
+    "1",
+    "true",
+    "yes",
+]
+WRITE_BEHIND_BATCH = int(os.environ.get("PROFILE_DB_WRITE_BEHIND_BATCH", 100))
+WRITE_BEHIND_DELAY = float(os.environ.get("PROFILE_DB_WRITE_BEHIND_DELAY", 0.05))
+WRITE_BEHIND_QUEUE = int(os.environ.get("PROFILE_DB_WRITE_BEHIND_QUEUE", 10000))
+
+# a write, and what to run once it is committed
+Write = Tuple[
+    Callable[["ProfileDB"], Any], Optional[Callable[[], None]], asyncio.Future
+]
+
+
+class WriteBehindQueue(LoopWorker):
+    """Queues writes (functions of a `ProfileDB` that do not commit) and commits
+    them in batches from a background task"""
+
+    def __init__(
+        self,
+        profile_db: "AsyncProfileDB",
+        max_batch: int = WRITE_BEHIND_BATCH,
+        max_delay: float = WRITE_BEHIND_DELAY,
+        max_queued: int = WRITE_BEHIND_QUEUE,
+    ):
+        super().__init__()
+        self.profile_db = profile_db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queued = max_queued
+        self.queue: "Optional[asyncio.Queue[Write]]" = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.max_batch_size = 0
+        self.flush_latency = LatencyStats()
+
+    def on_new_loop(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queued)
+
+    async def submit(
+        self,
+        write: Callable[["ProfileDB"], Any],
+        after_commit: Optional[Callable[[], None]] = None,
+    ) -> asyncio.Future:
+        """Queue `write`, waiting for room if the queue is full. Returns a future
+        with the result of `write`, set once it is committed."""
+        self.ensure_worker()
+        queue = self.queue
+        committed = asyncio.get_running_loop().create_future()
+        await queue.put((write, after_commit, committed))
+        with self.lock:
+            self.max_depth = max(self.max_depth, queue.qsize())
+        return committed
+
+    async def work(self):
+        # the queries are not the ones of the action that started the worker
+        detach()
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self.commit(batch)
+            for _ in batch:
+                queue.task_done()
+
+    async def commit(self, batch: List[Write]):
+        """Commit `batch` in one transaction. If that fails, commit every write on
+        its own, so one failing write does not fail the others."""
+        started = time.perf_counter()
+        try:
+            results = await self.profile_db.run_sync(
+                lambda profile_db: [write(profile_db) for write, _, _ in batch]
+            )
+            outcomes: List[Tuple[Any, Optional[BaseException]]] = [
+                (result, None) for result in results
+            ]
+        except Exception:
+            outcomes = []
+            for write, _, _ in batch:
+                try:
+                    outcomes.append((await self.profile_db.run_sync(write), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+
+        with self.lock:
+            self.batches += 1
+            self.writes += len(batch)
+            self.failed += sum(1 for _, error in outcomes if error)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+        self.flush_latency.record(time.perf_counter() - started)
+
+        for (_, after_commit, committed), (result, error) in zip(batch, outcomes):
+            if error is None and after_commit:
+                after_commit()
+            if committed.done():
+                continue
+            if error is None:
+                committed.set_result(result)
+            else:
+                logger.error(f"Write-behind write failed: {error!r}")
+                committed.set_exception(error)
+                # nobody might await the write, which is fine: it was logged
+                committed.exception()
+
+    async def flush(self):
+        """Wait until every queued write is committed"""
+        if self.queue is not None and self.loop is asyncio.get_running_loop():
+            await self.queue.join()
+
+    def snapshot(self) -> Dict[Text, Any]:
+        with self.lock:
+            return {
+                "depth": self.queue.qsize() if self.queue else 0,
+                "max_depth": self.max_depth,
+                "batches": self.batches,
+                "writes": self.writes,
+                "failed": self.failed,
+                "batch_size_avg": self.writes / self.batches if self.batches else 0.0,
+                "batch_size_max": self.max_batch_size,
+                "flush_latency": self.flush_latency.snapshot(),
+            }
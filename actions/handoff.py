@@ -1,15 +1,11 @@
 from rasa_sdk import Tracker, Action
 from rasa_sdk.executor import CollectingDispatcher
 
-import ruamel.yaml
-import pathlib
 from typing import Dict, Text, Any, List
 from rasa_sdk.events import EventType
 
-here = pathlib.Path(__file__).parent.absolute()
-handoff_config = (
-    ruamel.yaml.safe_load(open(f"{here}/handoff_config.yml", "r")) or {}
-).get("handoff_hosts", {})
+from actions.config import handoff_config
+from actions.handoff_health import handoff_health
 
 
 class ActionHandoffOptions(Action):
@@ -23,16 +19,18 @@ class ActionHandoffOptions(Action):
         domain: Dict[Text, Any],
     ) -> List[EventType]:
 
-        if not any([config.get("url") for bot, config in handoff_config.items()]):
+        # started with the action server, unless it runs without its plugins
+        handoff_health.start()
+        config = handoff_config.get()
+        # only the hosts that answered their last health check
+        buttons = [
+            button
+            for bot, button in zip(config.hosts, config.buttons)
+            if handoff_health.is_up(bot)
+        ]
+        if not config.enabled or not buttons:
             dispatcher.utter_message(template="utter_no_handoff")
         else:
-            buttons = [
-                {
-                    "title": config.get("title"),
-                    "payload": f'/trigger_handoff{{"handoff_to":"{bot}"}}',
-                }
-                for bot, config in handoff_config.items()
-            ]
             dispatcher.utter_message(
                 text=(
                     "I can't transfer you to a human, "
@@ -57,10 +55,10 @@ class ActionHandoff(Action):
         dispatcher.utter_message(template="utter_handoff")
         handoff_to = tracker.get_slot("handoff_to")
 
-        handoff_bot = handoff_config.get(handoff_to, {})
+        handoff_bot = handoff_config.get().hosts.get(handoff_to, {})
         url = handoff_bot.get("url")
 
-        if url:
+        if url and handoff_health.is_up(handoff_to):
             if tracker.get_latest_input_channel() == "rest":
                 dispatcher.utter_message(
                     json_message={
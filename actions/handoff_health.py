@@ -0,0 +1,152 @@
+"""Health checks of the handoff hosts in the background.
+
+A worker task requests every host in handoff_config.yml (its `health_url`, its
+`url` by default) every `HANDOFF_HEALTH_INTERVAL` seconds (default 30, 0 disables
+the checks). It uses one keep-alive HTTP session, checks at most
+`HANDOFF_HEALTH_CONCURRENCY` hosts at a time (default 4) and gives up on a host after
+`HANDOFF_HEALTH_TIMEOUT` seconds (default 2). A host is up if it answers with a
+status below 500. The handoff actions only read the last status of the hosts, so
+they never wait for a host. The action server starts the worker when it starts
+(see the `rasa_sdk_plugins` package), and hosts that were not checked yet count as
+down, unless the checks are disabled.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Text
+
+import aiohttp
+
+from actions.background import LoopWorker
+from actions.config import ConfigFile, HandoffConfig, handoff_config
+from actions.database.metrics import LatencyStats
+from actions.instrumentation import detach
+
+logger = logging.getLogger(__name__)
+
+HANDOFF_HEALTH_INTERVAL = float(os.environ.get("HANDOFF_HEALTH_INTERVAL", 30))
+HANDOFF_HEALTH_TIMEOUT = float(os.environ.get("HANDOFF_HEALTH_TIMEOUT", 2))
+HANDOFF_HEALTH_CONCURRENCY = int(os.environ.get("HANDOFF_HEALTH_CONCURRENCY", 4))
+
+
+class HostStatus:
+    def __init__(self, url: Text, up: bool, error: Optional[Text] = None):
+        self.url = url
+        self.up = up
+        self.error = error
+        self.checked_at = time.time()
+
+
+class HandoffHealthChecker(LoopWorker):
+    """Checks the handoff hosts of `config_file` in a background worker task"""
+
+    def __init__(
+        self,
+        config_file: "ConfigFile[HandoffConfig]" = handoff_config,
+        interval: float = HANDOFF_HEALTH_INTERVAL,
+        timeout: float = HANDOFF_HEALTH_TIMEOUT,
+        concurrency: int = HANDOFF_HEALTH_CONCURRENCY,
+    ):
+        super().__init__()
+        self.config_file = config_file
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.http: Optional[aiohttp.ClientSession] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.statuses: Dict[Text, HostStatus] = {}
+        self.checks = 0
+        self.failures = 0
+        self.latency = LatencyStats()
+
+    def start(self):
+        """Start the worker on the running event loop if it is not running yet"""
+        if self.interval <= 0:
+            return
+        self.ensure_worker()
+
+    def on_new_loop(self):
+        self.http = None
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    def is_up(self, bot: Text) -> bool:
+        status = self.statuses.get(bot)
+        if status is None:
+            # not checked yet, or never with the checks disabled
+            return self.interval <= 0
+        return status.up
+
+    async def work(self):
+        detach()
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.exception(f"Checking the handoff hosts failed: {e!r}")
+            await asyncio.sleep(self.interval)
+
+    async def check_all(self):
+        """Check every host of the handoff config once"""
+        self.bind()
+        if self.http is None or self.http.closed:
+            self.http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        hosts = self.config_file.get().hosts
+        await asyncio.gather(
+            *[
+                self.check(bot, host.get("health_url") or host.get("url"))
+                for bot, host in hosts.items()
+                if host.get("url")
+            ]
+        )
+        # hosts removed from the config
+        for bot in set(self.statuses) - set(hosts):
+            del self.statuses[bot]
+
+    async def check(self, bot: Text, url: Text):
+        async with self.semaphore:
+            started = time.perf_counter()
+            try:
+                async with self.http.get(url) as response:
+                    await response.read()
+                    up = response.status < 500
+                    error = None if up else f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                up = False
+                error = repr(e)
+            self.latency.record(time.perf_counter() - started)
+        self.checks += 1
+        if not up:
+            self.failures += 1
+            if self.is_up(bot):
+                logger.warning(f"Handoff host '{bot}' at {url} is down: {error}")
+        self.statuses[bot] = HostStatus(url, up, error)
+
+    async def close(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+
+    def snapshot(self) -> Dict[Text, Any]:
+        return {
+            "hosts": {
+                bot: {
+                    "up": status.up,
+                    "error": status.error,
+                    "checked_at": status.checked_at,
+                }
+                for bot, status in self.statuses.items()
+            },
+            "checks": self.checks,
+            "failures": self.failures,
+            "latency": self.latency.snapshot(),
+        }
+
+
+handoff_health = HandoffHealthChecker()
@@ -0,0 +1,286 @@
+"""Latency, error and database query metrics of the actions, in the Prometheus
+text format.
+
+Every action call is timed per action name (`method="run"`) by the action server,
+see the `rasa_sdk_plugins` package, and `instrument_actions` wraps the
+`validate_{slot}` / `explain_{slot}` methods of the form validation actions of the
+`actions` package for the slots of the domain. Every call records its latency in
+a histogram, and whether it failed. SQLAlchemy cursor events count the queries of
+the calls that run them, and how long they took, through a context variable that
+asyncio tasks and the greenlets of `AsyncSession.run_sync` inherit. A query counts for every call it runs
+in, e.g. for `validate_amount_of_money` and for the `run` of its form validation
+action. Background workers call `detach`, so the queries they run later (e.g. the
+group commits of write-behind) do not count for the action that started them.
+
+The action server serves `render_metrics` at `/metrics`, next to `/health`:
+
+    curl http://localhost:5055/metrics
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Text, Tuple
+
+import sqlalchemy as sa
+from rasa_sdk import Action
+from rasa_sdk.forms import FormValidationAction
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INSTRUMENTED_METHOD_PREFIXES = ("validate_", "explain_")
+
+
+class Histogram:
+    """Counts of durations in seconds per upper bound of `buckets`"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # the last count is of the durations above every bucket (`+Inf`)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative_counts(self) -> Iterator[Tuple[Text, int]]:
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+
+class CallStats:
+    """Metrics of the calls of one method of one action"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+class Call:
+    def __init__(
+        self, key: Tuple[Text, Text], stats: CallStats, token: contextvars.Token
+    ):
+        self.key = key
+        self.stats = stats
+        self.token = token
+        self.started = time.perf_counter()
+
+
+# the `CallStats` of the instrumented calls the current code runs in, outermost first
+current_calls: "contextvars.ContextVar[Tuple[CallStats, ...]]" = contextvars.ContextVar(
+    "current_calls", default=()
+)
+
+
+def detach():
+    """Stop counting the queries of the current task for the calls it was started
+    in, for background workers"""
+    current_calls.set(())
+
+
+class ActionMetrics:
+    """`CallStats` per (action name, method name)"""
+
+    def __init__(self):
+        self.calls: Dict[Tuple[Text, Text], CallStats] = {}
+        self.lock = threading.Lock()
+
+    def stats(self, action_name: Text, method_name: Text) -> CallStats:
+        key = (action_name, method_name)
+        stats = self.calls.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.calls.setdefault(key, CallStats())
+        return stats
+
+    def listen(self):
+        """Count the queries of every engine"""
+        if not sa.event.contains(
+            sa.engine.Engine, "before_cursor_execute", on_query_start
+        ):
+            sa.event.listen(sa.engine.Engine, "before_cursor_execute", on_query_start)
+            sa.event.listen(sa.engine.Engine, "after_cursor_execute", on_query_end)
+
+    def begin(self, action_name: Text, method_name: Text) -> "Call":
+        """Start timing a call, the queries from here on count for it"""
+        key = (action_name, method_name)
+        stats = self.stats(*key)
+        return Call(key, stats, current_calls.set(current_calls.get() + (stats,)))
+
+    def end(self, call: "Call", failed: bool = False, discard: bool = False):
+        """Record the call, or with `discard` forget it (and its action if it has no
+        other calls, e.g. for names of actions that do not exist)"""
+        if discard:
+            with self.lock:
+                if not call.stats.latency.count:
+                    self.calls.pop(call.key, None)
+        else:
+            call.stats.latency.observe(time.perf_counter() - call.started)
+            if failed:
+                call.stats.errors += 1
+        try:
+            current_calls.reset(call.token)
+        except ValueError:
+            # ended in another context than it began in
+            current_calls.set(())
+
+    def instrumented(self, method_name: Text, method: Callable) -> Callable:
+        """`method` of an action, recording its calls in the stats of the action"""
+
+        @functools.wraps(method)
+        async def wrapper(action: Action, *args, **kwargs):
+            call = self.begin(action.name(), method_name)
+            failed = True
+            try:
+                result = method(action, *args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                failed = False
+                return result
+            finally:
+                self.end(call, failed)
+
+        wrapper.instrumented = True
+        return wrapper
+
+    def instrument(self, action_class: type, slot_names: Iterable[Text]):
+        """Wrap the `validate_{slot}` and `explain_{slot}` methods of a form
+        validation action for the slots `slot_names`, including the ones it inherits.
+        Other methods with these prefixes (e.g. `explain_requested_slot`) are helpers
+        called from within a slot's methods, and are not wrapped. `run` is timed per
+        request by the action server instead, its executor keeps the bound `run` of
+        every action."""
+        if not issubclass(action_class, FormValidationAction):
+            return
+        for slot_name in slot_names:
+            for prefix in INSTRUMENTED_METHOD_PREFIXES:
+                # as `FormValidationAction` names them
+                name = f"{prefix}{slot_name.replace('-', '_')}"
+                method = getattr(action_class, name, None)
+                if callable(method) and not getattr(method, "instrumented", False):
+                    setattr(action_class, name, self.instrumented(name, method))
+
+    def render(self) -> List[Text]:
+        lines = [
+            "# HELP action_duration_seconds Latency of action methods.",
+            "# TYPE action_duration_seconds histogram",
+        ]
+        with self.lock:
+            calls = sorted(self.calls.items())
+        for (action_name, method_name), stats in calls:
+            labels = f'action="{action_name}",method="{method_name}"'
+            for bound, count in stats.latency.cumulative_counts():
+                lines.append(
+                    f'action_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(f"action_duration_seconds_sum{{{labels}}} {stats.latency.sum}")
+            lines.append(
+                f"action_duration_seconds_count{{{labels}}} {stats.latency.count}"
+            )
+        for name, kind, help_text, value in [
+            ("action_errors_total", "counter", "Action calls that raised.", "errors"),
+            (
+                "action_db_queries_total",
+                "counter",
+                "Database queries run by action calls.",
+                "queries",
+            ),
+            (
+                "action_db_query_seconds_total",
+                "counter",
+                "Time spent in the database queries of action calls.",
+                "query_seconds",
+            ),
+        ]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (action_name, method_name), stats in calls:
+                lines.append(
+                    f'{name}{{action="{action_name}",method="{method_name}"}} '
+                    f"{getattr(stats, value)}"
+                )
+        return lines
+
+
+action_metrics = ActionMetrics()
+
+
+def on_query_start(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_calls.get():
+        context.action_query_started = time.perf_counter()
+
+
+def on_query_end(conn, cursor, statement, parameters, context, executemany):
+    calls = current_calls.get()
+    started = getattr(context, "action_query_started", None)
+    if calls and started is not None:
+        seconds = time.perf_counter() - started
+        for stats in calls:
+            stats.queries += 1
+            stats.query_seconds += seconds
+
+
+def action_classes(action_class: type = Action) -> Iterator[type]:
+    for subclass in action_class.__subclasses__():
+        yield subclass
+        yield from action_classes(subclass)
+
+
+def instrument_actions(slot_names: Iterable[Text], package: Text = "actions"):
+    """Instrument the slot methods of the form validation actions of the imported
+    modules of `package` (all of them, once the action server registered the
+    package) for the slots `slot_names` of the domain"""
+    for action_class in set(action_classes()):
+        if action_class.__module__.startswith(f"{package}."):
+            action_metrics.instrument(action_class, slot_names)
+
+
+def gauge_lines(prefix: Text, snapshot: Dict[Text, Any]) -> List[Text]:
+    """The numbers of `snapshot` (nested dicts are flattened) as gauges"""
+    lines = []
+    for key, value in snapshot.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            lines.extend(gauge_lines(name, value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return lines
+
+
+def render_metrics(
+    profile_db: Optional[Any] = None, handoff_health: Any = None
+) -> Text:
+    """The action metrics, and the snapshots of the profile database components and
+    the handoff health checks"""
+    lines = action_metrics.render()
+    if profile_db is not None:
+        for prefix, snapshot in [
+            ("profile_db_pool", profile_db.pool_metrics.snapshot()),
+            ("profile_db_provisioning", profile_db.provisioning.snapshot()),
+            ("profile_db_account_cache", profile_db.account_cache.stats()),
+            ("profile_db_fx_rate_cache", profile_db.fx_rate_cache.stats()),
+            ("profile_db_recipient_cache", profile_db.recipient_cache.stats()),
+        ]:
+            lines.extend(gauge_lines(prefix, snapshot))
+        if profile_db.write_behind:
+            lines.extend(
+                gauge_lines(
+                    "profile_db_write_behind", profile_db.write_behind.snapshot()
+                )
+            )
+    if handoff_health is not None:
+        snapshot = handoff_health.snapshot()
+        lines.append("# TYPE handoff_host_up gauge")
+        for bot, status in snapshot.pop("hosts").items():
+            lines.append(f'handoff_host_up{{host="{bot}"}} {int(status["up"])}')
+        lines.extend(gauge_lines("handoff_health", snapshot))
+    return "\n".join(lines) + "\n"
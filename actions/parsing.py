@@ -1,4 +1,6 @@
 import logging
+from datetime import datetime
+from functools import lru_cache
 
 from dateutil import relativedelta, parser
 from typing import Dict, Text, Any, Optional
@@ -6,6 +8,30 @@ from rasa_sdk import Tracker
 
 logger = logging.getLogger(__name__)
 
+# timestamps (and their formatting) kept parsed, conversations repeat a few times
+PARSE_CACHE_SIZE = 1024
+
+GRAIN_FORMATS = {
+    "second": "%I:%M:%S%p, %A %b %d, %Y",
+    "day": "%A %b %d, %Y",
+    "week": "%A %b %d, %Y",
+    "month": "%b %Y",
+    "year": "%Y",
+}
+DEFAULT_TIME_FORMAT = "%I:%M%p, %A %b %d, %Y"
+
+# one of every Duckling grain, `relativedelta` has no quarters
+GRAIN_DELTAS = {
+    "second": relativedelta.relativedelta(seconds=1),
+    "minute": relativedelta.relativedelta(minutes=1),
+    "hour": relativedelta.relativedelta(hours=1),
+    "day": relativedelta.relativedelta(days=1),
+    "week": relativedelta.relativedelta(weeks=1),
+    "month": relativedelta.relativedelta(months=1),
+    "quarter": relativedelta.relativedelta(months=3),
+    "year": relativedelta.relativedelta(years=1),
+}
+
 
 def close_interval_duckling_time(
     timeinfo: Dict[Text, Any]
@@ -14,16 +40,10 @@ def close_interval_duckling_time(
     start = timeinfo.get("from", {}).get("value")
     end = timeinfo.get("to", {}).get("value")
     if (start or end) and not (start and end):
-        deltaargs = {f"{grain}s": 1}
-        delta = relativedelta.relativedelta(**deltaargs)
         if start:
-            parsedstart = parser.isoparse(start)
-            parsedend = parsedstart + delta
-            end = parsedend.isoformat()
+            end = shift_isotime(start, grain)
         elif end:
-            parsedend = parser.isoparse(end)
-            parsedstart = parsedend - delta
-            start = parsedstart.isoformat()
+            start = shift_isotime(end, grain, -1)
     return {
         "start_time": start,
         "start_time_formatted": format_isotime_by_grain(start, grain),
@@ -38,11 +58,7 @@ def make_interval_from_value_duckling_time(
 ) -> Dict[Text, Any]:
     grain = timeinfo.get("grain")
     start = timeinfo.get("value")
-    parsedstart = parser.isoparse(start)
-    deltaargs = {f"{grain}s": 1}
-    delta = relativedelta.relativedelta(**deltaargs)
-    parsedend = parsedstart + delta
-    end = parsedend.isoformat()
+    end = shift_isotime(start, grain)
     return {
         "start_time": start,
         "start_time_formatted": format_isotime_by_grain(start, grain),
@@ -62,16 +78,27 @@ def parse_duckling_time_as_interval(
         return make_interval_from_value_duckling_time(timeinfo)
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def shift_isotime(isotime: Text, grain: Text, grains: int = 1) -> Text:
+    """`isotime` moved by `grains` of `grain` (e.g. `"month"`), as ISO 8601"""
+    delta = GRAIN_DELTAS.get(grain) or relativedelta.relativedelta(**{f"{grain}s": 1})
+    return (parse_isotime(isotime) + grains * delta).isoformat()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_isotime(isotime: Text) -> datetime:
+    """Parse an ISO 8601 timestamp as Duckling sends it"""
+    try:
+        return datetime.fromisoformat(isotime)
+    except ValueError:
+        # e.g. a "Z" offset before Python 3.11
+        return parser.isoparse(isotime)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def format_isotime_by_grain(isotime, grain=None):
-    value = parser.isoparse(isotime)
-    grain_format = {
-        "second": "%I:%M:%S%p, %A %b %d, %Y",
-        "day": "%A %b %d, %Y",
-        "week": "%A %b %d, %Y",
-        "month": "%b %Y",
-        "year": "%Y",
-    }
-    timeformat = grain_format.get(grain, "%I:%M%p, %A %b %d, %Y")
+    value = parse_isotime(isotime)
+    timeformat = GRAIN_FORMATS.get(grain, DEFAULT_TIME_FORMAT)
     time_formatted = value.strftime(timeformat)
     return time_formatted
 
@@ -92,19 +119,87 @@ def parse_duckling_time(timeentity: Dict[Text, Any]) -> Optional[Dict[Text, Any]
         return parsedtime
 
 
+class EntityIndex:
+    """The entities of a message by entity type, in message order. The Duckling
+    `additional_info` of the entities is parsed on first use and kept, so the
+    validators of a form share one parse per message."""
+
+    # amounts are taken from a "number" if there is no "amount-of-money"
+    AMOUNT_ENTITY_TYPES = ["amount-of-money", "number"]
+
+    def __init__(self, message: Dict[Text, Any]):
+        self.message = message
+        self.by_type = {}
+        for entity in message.get("entities") or []:
+            self.by_type.setdefault(entity.get("entity"), []).append(entity)
+        # (kind of parse, entity type) -> parsed entity
+        self.parsed = {}
+
+    def first(self, *entity_types: Text) -> Optional[Dict[Text, Any]]:
+        """The first entity of the first of `entity_types` in the message"""
+        for entity_type in entity_types:
+            entities = self.by_type.get(entity_type)
+            if entities:
+                return entities[0]
+
+    def last(self, entity_type: Text) -> Optional[Dict[Text, Any]]:
+        entities = self.by_type.get(entity_type)
+        if entities:
+            return entities[-1]
+
+    def _parse(
+        self, kind: Text, entity: Optional[Dict[Text, Any]], parse
+    ) -> Optional[Dict[Text, Any]]:
+        if entity is None:
+            return None
+        key = (kind, entity.get("entity"))
+        if key not in self.parsed:
+            self.parsed[key] = parse(entity)
+        return self.parsed[key]
+
+    def time(self) -> Optional[Dict[Text, Any]]:
+        """The first time entity as `parse_duckling_time` parses it"""
+        return self._parse("time", self.first("time"), parse_duckling_time)
+
+    def time_interval(self) -> Optional[Dict[Text, Any]]:
+        """The first time entity as `parse_duckling_time_as_interval` parses it"""
+        return self._parse(
+            "interval", self.first("time"), parse_duckling_time_as_interval
+        )
+
+    def amount_of_money(self) -> Optional[Dict[Text, Any]]:
+        """The first amount of money (or number) as `parse_duckling_currency`
+        parses it"""
+        return self._parse(
+            "currency",
+            self.first(*self.AMOUNT_ENTITY_TYPES),
+            parse_duckling_currency,
+        )
+
+    def currency(self) -> Optional[Dict[Text, Any]]:
+        """The first currency entity as `parse_duckling_currency` parses it"""
+        return self._parse("currency", self.first("currency"), parse_duckling_currency)
+
+
+def entity_index(tracker: Tracker) -> EntityIndex:
+    """The `EntityIndex` of `tracker.latest_message`, built once per tracker (the
+    SDK makes a new tracker for every action call)"""
+    index = getattr(tracker, "_entity_index", None)
+    if index is None or index.message is not tracker.latest_message:
+        index = EntityIndex(tracker.latest_message)
+        tracker._entity_index = index
+    return index
+
 
 def get_entity_details(
     tracker: Tracker, entity_type: Text
 ) -> Optional[Dict[Text, Any]]:
-    all_entities = tracker.latest_message.get("entities", [])
-    entities = [e for e in all_entities if e.get("entity") == entity_type]
-    if entities:
-        return entities[0]
+    return entity_index(tracker).first(entity_type)
 
 
 def parse_duckling_currency(entity: Dict[Text, Any]) -> Optional[Dict[Text, Any]]:
 
-    if entity.get("entity") == 'currency':
+    if entity.get("entity") == "currency":
         currency = entity.get("value")
         return {"currency": currency}
     if entity.get("entity") == "amount-of-money":
@@ -1,22 +1,45 @@
+import itertools
 import logging
+import math
 
 import sqlalchemy as sa
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import Column, Integer, String, REAL
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 from sqlalchemy.engine.base import Engine
-from typing import Dict, Text, List, Union, Optional
+from typing import Any, Dict, Iterable, Text, List, Union, Optional, Sequence, Tuple
 
-from random import choice, sample
+import numpy as np
 
-from datetime import datetime
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
 import pytz
 
+from actions.database.cache import (
+    AccountCache,
+    FxRateCache,
+    InvocationAccountCache,
+    RecipientCache,
+)
+from actions.database.fx import (
+    convert_amounts,
+    load_fx_rates,
+    normalize_currency,
+    read_fx_rates,
+)
 from actions.database.populate import populate, create_missing_user_account
+from actions.database.recipients import RecipientIndex
+from actions.database.synthetic import generate_transactions, insert_transactions
+from actions.database.vendors import VENDOR_CACHE_NAME, VendorRegistry
 from actions.database.tables.account import Account
 from actions.database.tables.accountrelationship import RecipientRelationship
+from actions.database.tables.balance import AccountBalance
+from actions.database.tables.cacheversion import CacheVersion
 from actions.database.tables.creditcard import CreditCard
+from actions.database.tables.fxrate import FxRate
 from actions.database.tables.transaction.offline import OfflineTransaction
 from actions.database.tables.transaction.online import Transaction
-from action.database.tables.creditcard import CreditCard
+from actions.database.tables.transaction.rollup import TransactionRollup
 
 utc = pytz.UTC
 logger = logging.getLogger(__name__)
@@ -39,17 +62,72 @@ GENERAL_ACCOUNTS = {
 ACCOUNT_NUMBER_LENGTH = 12
 CREDIT_CARD_NUMBER_LENGTH = 14
 
+# balances are stored as REAL, so sums are compared with a small tolerance
+BALANCE_DRIFT_TOLERANCE = 0.005
+
+# strftime formats for the start of a duckling time grain on sqlite,
+# other databases use `date_trunc`
+SQLITE_GRAIN_FORMATS = {
+    "second": "%Y-%m-%d %H:%M:%S",
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m-01",
+    "year": "%Y-01-01",
+}
+
+# breakdowns that can be computed from daily rollups, `None` is no breakdown
+ROLLUP_GRAINS = [None, "day", "week", "month", "quarter", "year"]
+
+Base = declarative_base()
+
+
+def grain_start(timestamp: sa.sql.ColumnElement, grain: Text, dialect_name: Text):
+    """SQL expression for the start of the `grain` (e.g. `"month"`) that `timestamp`
+    falls in"""
+    if dialect_name != "sqlite":
+        return sa.func.date_trunc(grain, timestamp)
+    if grain == "week":
+        return sa.func.date(timestamp, "weekday 0", "-6 days")
+    if grain == "quarter":
+        month = sa.cast(sa.func.strftime("%m", timestamp), Integer)
+        return sa.func.printf(
+            "%s-%02d-01",
+            sa.func.strftime("%Y", timestamp),
+            (month - 1) / 3 * 3 + 1,
+        )
+    return sa.func.strftime(SQLITE_GRAIN_FORMATS[grain], timestamp)
+
+
+def day_sql(timestamp: sa.sql.ColumnElement, dialect_name: Text):
+    """SQL expression for the day of `timestamp`, as stored in a `Date` column"""
+    if dialect_name == "sqlite":
+        return sa.func.date(timestamp)
+    return sa.cast(timestamp, sa.Date)
+
+
+def account_number_sql(account_id: sa.sql.ColumnElement, dialect_name: Text):
+    """SQL expression for the account number of an `Account.id`, see
+    `ProfileDB.get_account_number`"""
+    if dialect_name == "sqlite":
+        return sa.func.printf(f"%0{ACCOUNT_NUMBER_LENGTH}d", account_id)
+    return sa.func.lpad(sa.cast(account_id, String), ACCOUNT_NUMBER_LENGTH, "0")
+
 
 class CurrencyAccount(Base):
     """Currency accounts table. `card_id` is an `creditcards.id`"""
 
     __tablename__ = "currency_account"
     id = Column(Integer, primary_key=True)
-    card_id = Column(Integer)
+    card_id = Column(Integer, index=True)
     balance = Column(REAL)
     currency = Column(String(255))
 
 
+class InsufficientFundsError(ValueError):
+    """The balance of the account to debit does not cover the amount"""
+
+
 def create_database(database_engine: Engine, database_name: Text):
     """Try to connect to the database. Create it if it does not exist"""
     try:
@@ -64,13 +142,46 @@ def create_database(database_engine: Engine, database_name: Text):
 
 
 class ProfileDB:
-    def __init__(self, db_engine: Engine):
+    def __init__(
+        self,
+        db_engine: Engine,
+        account_cache: Optional[AccountCache] = None,
+        fx_rate_cache: Optional[FxRateCache] = None,
+        vendor_registry: Optional[VendorRegistry] = None,
+        recipient_cache: Optional[RecipientCache] = None,
+    ):
         self.engine = db_engine
-        self.create_tables()
         self.session = self.get_session()
+        self.account_cache = account_cache or AccountCache()
+        self.fx_rate_cache = fx_rate_cache or FxRateCache()
+        self.vendor_registry = vendor_registry or VendorRegistry()
+        self.recipient_cache = recipient_cache or RecipientCache()
+        self.create_tables()
 
-    def get_session(self) -> Session:
-        return sessionmaker(bind=self.engine, autoflush=True)()
+    @classmethod
+    def from_session(
+        cls,
+        session: Session,
+        account_cache: Optional[AccountCache] = None,
+        fx_rate_cache: Optional[FxRateCache] = None,
+        vendor_registry: Optional[VendorRegistry] = None,
+        recipient_cache: Optional[RecipientCache] = None,
+    ) -> "ProfileDB":
+        """Get a `ProfileDB` that works on an existing `session`.
+        Tables are not created, the caller is responsible for that.
+        """
+        profile_db = cls.__new__(cls)
+        profile_db.engine = session.get_bind()
+        profile_db.session = session
+        profile_db.account_cache = account_cache or AccountCache()
+        profile_db.fx_rate_cache = fx_rate_cache or FxRateCache()
+        profile_db.vendor_registry = vendor_registry or VendorRegistry()
+        profile_db.recipient_cache = recipient_cache or RecipientCache()
+        return profile_db
+
+    def get_session(self) -> scoped_session:
+        """Get a thread-local session, so threads never share a connection"""
+        return scoped_session(sessionmaker(bind=self.engine, autoflush=True))
 
     def create_tables(self):
         logger.info("Creating database tables...")
@@ -84,9 +195,64 @@ class ProfileDB:
         logger.info("Offline Transaction created...")
         RecipientRelationship.__table__.create(self.engine, checkfirst=True)
         logger.info("RecipientRelationship created...")
+        ledger_exists = sa.inspect(self.engine).has_table(AccountBalance.__tablename__)
+        AccountBalance.__table__.create(self.engine, checkfirst=True)
+        logger.info("AccountBalance created...")
         logger.info("Tables created!")
         CurrencyAccount.__table__.create(self.engine, checkfirst=True)
         Account.__table__.create(self.engine, checkfirst=True)
+        fx_rates_exist = sa.inspect(self.engine).has_table(FxRate.__tablename__)
+        rollups_exist = sa.inspect(self.engine).has_table(
+            TransactionRollup.__tablename__
+        )
+        TransactionRollup.__table__.create(self.engine, checkfirst=True)
+        FxRate.__table__.create(self.engine, checkfirst=True)
+        CacheVersion.__table__.create(self.engine, checkfirst=True)
+        self.create_indexes()
+        self.flag_general_vendors()
+        if not ledger_exists or self.ledger_missing():
+            # existing databases have transactions but no ledger yet
+            self.reconcile_balances()
+        if not rollups_exist:
+            self.rebuild_rollups()
+        if not fx_rates_exist:
+            load_fx_rates(self.session, read_fx_rates())
+            self.session.commit()
+
+    def ledger_missing(self) -> bool:
+        """Whether `account_balances` is empty while there are transactions"""
+        return self.session.query(AccountBalance.account_number).first() is None and (
+            self.session.query(Transaction.id).first() is not None
+            or self.session.query(OfflineTransaction.id).first() is not None
+        )
+
+    def create_indexes(self):
+        """Add indexes that were declared after a table was created, `create` only
+        adds them together with a new table"""
+        for table in [
+            Account.__table__,
+            CreditCard.__table__,
+            CurrencyAccount.__table__,
+            OfflineTransaction.__table__,
+            RecipientRelationship.__table__,
+            Transaction.__table__,
+            TransactionRollup.__table__,
+        ]:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+        logger.info("Indexes created...")
+
+    def flag_general_vendors(self):
+        """Set `is_vendor` on general vendor accounts added before they were flagged"""
+        flagged = (
+            self.session.query(Account)
+            .filter(Account.session_id.startswith("vendor_"))
+            .filter(sa.or_(Account.is_vendor.is_(False), Account.is_vendor.is_(None)))
+            .update({Account.is_vendor: True}, synchronize_session=False)
+        )
+        if flagged:
+            self.bump_cache_version(VENDOR_CACHE_NAME)
+        self.session.commit()
 
     def get_account(self, id: int):
         """Get an `Account` object based on an `Account.id`"""
@@ -97,14 +263,51 @@ class ProfileDB:
         # if the action server restarts in the middle of a conversation,
         # the db will need to be repopulated outside the action_session_start
 
-        if not self.check_session_id_exists(session_id):
-            logger.info(f"Creating account with {session_id}...")
-            create_missing_user_account(self.session, session_id)
+        account_id, _ = self.get_account_ids(session_id)
+        return self.get_account(account_id)
 
-        account = (
-            self.session.query(Account).filter(Account.session_id == session_id).first()
-        )
-        return account
+    def get_account_ids(self, session_id: Text) -> Tuple[int, Text]:
+        """Get the `Account.id` and account number for a `session_id`,
+        creating the account if it does not exist yet.
+        Looks in the cache of the current session (i.e. action invocation) first,
+        then in the shared `account_cache`.
+        """
+        invocation_cache = self.invocation_account_cache()
+        account_ids = invocation_cache.get(session_id)
+        if account_ids:
+            self.account_cache.record_invocation_hit()
+            return account_ids
+
+        account_ids = self.account_cache.get(session_id)
+        if not account_ids:
+            account_id = (
+                self.session.query(Account.id)
+                .filter(Account.session_id == session_id)
+                .limit(1)
+                .scalar()
+            )
+            if account_id is None:
+                logger.info(f"Creating account with {session_id}...")
+                create_missing_user_account(self.session, session_id)
+                self.account_cache.invalidate(session_id)
+                account_id = (
+                    self.session.query(Account.id)
+                    .filter(Account.session_id == session_id)
+                    .limit(1)
+                    .scalar()
+                )
+            account_ids = (account_id, f"%0.{ACCOUNT_NUMBER_LENGTH}d" % account_id)
+            self.account_cache.put(session_id, *account_ids)
+
+        invocation_cache.put(session_id, account_ids)
+        return account_ids
+
+    def invocation_account_cache(self) -> InvocationAccountCache:
+        """The account ids cache of the current session (i.e. action invocation)"""
+        cache = self.session.info.get("account_ids")
+        if cache is None:
+            cache = self.session.info["account_ids"] = InvocationAccountCache()
+        return cache
 
     @staticmethod
     def get_account_number(account: Union[CreditCard, Account]):
@@ -134,10 +337,10 @@ class ProfileDB:
         """Get a recipient based on the nickname.
         Take the first one if there are multiple that match.
         """
-        account = self.get_account_from_session_id(session_id)
+        account_id, _ = self.get_account_ids(session_id)
         recipient = (
             self.session.query(RecipientRelationship)
-            .filter(RecipientRelationship.account_id == account.id)
+            .filter(RecipientRelationship.account_id == account_id)
             .filter(RecipientRelationship.recipient_nickname == recipient_name.lower())
             .first()
         )
@@ -146,18 +349,45 @@ class ProfileDB:
 
     def list_known_recipients(self, session_id: Text):
         """List recipient nicknames available to an account holder"""
-        recipients = (
-            self.session.query(RecipientRelationship.recipient_nickname)
-            .filter(
-                RecipientRelationship.account_id
-                == self.get_account_from_session_id(session_id).id
+        return self.get_recipient_index(session_id).names()
+
+    def find_recipient(
+        self, session_id: Text, recipient_name: Text
+    ) -> Optional[Tuple[Text, Text]]:
+        """Get the nickname and account number of the recipient an account holder
+        means by `recipient_name`, see `RecipientIndex.find`"""
+        return self.get_recipient_index(session_id).find(recipient_name)
+
+    def get_recipient_index(self, session_id: Text) -> RecipientIndex:
+        """Get the `RecipientIndex` of an account holder from the `recipient_cache`,
+        building it with one query if it is not cached"""
+        index = self.recipient_cache.get(session_id)
+        if index is None:
+            recipients = (
+                self.session.query(
+                    RecipientRelationship.recipient_nickname,
+                    RecipientRelationship.recipient_account_id.label("id"),
+                )
+                .filter(
+                    RecipientRelationship.account_id
+                    == self.get_account_ids(session_id)[0]
+                )
+                .order_by(RecipientRelationship.id)
+                .all()
             )
-            .all()
-        )
-        return [recipient.recipient_nickname for recipient in recipients]
+            index = RecipientIndex(
+                (recipient.recipient_nickname, self.get_account_number(recipient))
+                for recipient in recipients
+            )
+            # recipients are still being provisioned if there are none yet
+            if len(index):
+                self.recipient_cache.put(session_id, index)
+        return index
 
     def check_session_id_exists(self, session_id: Text):
         """Check if an account for `session_id` already exists"""
+        if self.invocation_account_cache().get(session_id) is not None:
+            return True
         return self.session.query(
             self.session.query(Account.session_id)
             .filter(Account.session_id == session_id)
@@ -165,21 +395,236 @@ class ProfileDB:
         ).scalar()
 
     def get_account_balance(self, session_id: Text):
-        """Get the account balance for an account"""
-        account_number = self.get_account_number(
-            self.get_account_from_session_id(session_id)
+        """Get the account balance for an account from the `account_balances` ledger"""
+        _, account_number = self.get_account_ids(session_id)
+        balance = (
+            self.session.query(AccountBalance.balance)
+            .filter(AccountBalance.account_number == account_number)
+            .scalar()
+        )
+        return float(balance or 0)
+
+    def update_balances(self, deltas: Dict[Text, float]):
+        """Add `deltas` (account number -> amount) to the `account_balances` ledger.
+        Changes are not committed, so they land in the same DB transaction as the
+        `Transaction` rows they belong to. The rows are updated (and locked) in the
+        order of their account numbers, so concurrent transfers in opposite
+        directions do not deadlock.
+        """
+        for account_number, delta in sorted(deltas.items()):
+            updated = (
+                self.session.query(AccountBalance)
+                .filter(AccountBalance.account_number == account_number)
+                .update(
+                    {AccountBalance.balance: AccountBalance.balance + delta},
+                    synchronize_session=False,
+                )
+            )
+            if not updated:
+                self.session.add(
+                    AccountBalance(account_number=account_number, balance=delta)
+                )
+        self.session.flush()
+
+    def update_rollups(self, rows: Iterable[Dict[Text, Any]]):
+        """Add transaction rows (`from_account_number`, `to_account_number`,
+        `amount`, `timestamp`) to the daily `transaction_rollups`.
+        Like `update_balances`, changes are not committed.
+        """
+        rollups: Dict[Tuple[Text, Text, date], List] = {}
+        for row in rows:
+            key = (
+                row["from_account_number"],
+                row["to_account_number"],
+                row["timestamp"].date(),
+            )
+            amount = row["amount"]
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = [amount, 1, amount, amount]
+            else:
+                rollup[0] += amount
+                rollup[1] += 1
+                rollup[2] = min(rollup[2], amount)
+                rollup[3] = max(rollup[3], amount)
+        if not rollups:
+            return
+
+        days = defaultdict(list)
+        for from_account_number, to_account_number, day in rollups:
+            days[(from_account_number, to_account_number)].append(day)
+        existing = set()
+        for (from_account_number, to_account_number), pair_days in days.items():
+            existing.update(
+                (from_account_number, to_account_number, day)
+                for day, in self.session.query(TransactionRollup.day)
+                .filter(TransactionRollup.from_account_number == from_account_number)
+                .filter(TransactionRollup.to_account_number == to_account_number)
+                .filter(TransactionRollup.day.between(min(pair_days), max(pair_days)))
+            )
+
+        table = TransactionRollup.__table__
+        values = [
+            {
+                "b_from_account_number": from_account_number,
+                "b_to_account_number": to_account_number,
+                "b_day": day,
+                "b_total": total,
+                "b_count": count,
+                "b_smallest": smallest,
+                "b_largest": largest,
+            }
+            for (from_account_number, to_account_number, day), (
+                total,
+                count,
+                smallest,
+                largest,
+            ) in rollups.items()
+        ]
+        updates = [value for key, value in zip(rollups, values) if key in existing]
+        inserts = [
+            {name[2:]: value for name, value in value.items()}
+            for key, value in zip(rollups, values)
+            if key not in existing
+        ]
+        if updates:
+            smallest = sa.bindparam("b_smallest")
+            largest = sa.bindparam("b_largest")
+            self.session.execute(
+                table.update()
+                .where(
+                    table.c.from_account_number == sa.bindparam("b_from_account_number")
+                )
+                .where(table.c.to_account_number == sa.bindparam("b_to_account_number"))
+                .where(table.c.day == sa.bindparam("b_day"))
+                .values(
+                    total=table.c.total + sa.bindparam("b_total"),
+                    count=table.c.count + sa.bindparam("b_count"),
+                    smallest=sa.case(
+                        (table.c.smallest <= smallest, table.c.smallest),
+                        else_=smallest,
+                    ),
+                    largest=sa.case(
+                        (table.c.largest >= largest, table.c.largest), else_=largest
+                    ),
+                ),
+                updates,
+            )
+        if inserts:
+            self.session.execute(table.insert(), inserts)
+
+    def rebuild_rollups(self):
+        """Rebuild the daily `transaction_rollups` from the online and offline
+        transactions. Transactions without a timestamp have no day and are left out.
+        """
+        dialect_name = self.session.get_bind().dialect.name
+        transactions = sa.union_all(
+            sa.select(
+                Transaction.from_account_number,
+                Transaction.to_account_number,
+                Transaction.amount,
+                Transaction.timestamp,
+            ),
+            sa.select(
+                account_number_sql(OfflineTransaction.from_account, dialect_name),
+                account_number_sql(OfflineTransaction.to_account, dialect_name),
+                OfflineTransaction.amount,
+                OfflineTransaction.timestamp,
+            ),
+        ).subquery()
+        day = day_sql(transactions.c.timestamp, dialect_name)
+        rollups = (
+            sa.select(
+                transactions.c.from_account_number,
+                transactions.c.to_account_number,
+                day,
+                sa.func.sum(transactions.c.amount),
+                sa.func.count(),
+                sa.func.min(transactions.c.amount),
+                sa.func.max(transactions.c.amount),
+            )
+            .where(transactions.c.timestamp.isnot(None))
+            .group_by(
+                transactions.c.from_account_number,
+                transactions.c.to_account_number,
+                day,
+            )
+        )
+        self.session.query(TransactionRollup).delete(synchronize_session=False)
+        self.session.execute(
+            TransactionRollup.__table__.insert().from_select(
+                [
+                    "from_account_number",
+                    "to_account_number",
+                    "day",
+                    "total",
+                    "count",
+                    "smallest",
+                    "largest",
+                ],
+                rollups,
+            )
         )
-        spent = float(
-            self.session.query(sa.func.sum(Transaction.amount))
-            .filter(Transaction.from_account_number == account_number)
-            .all()[0][0]
+        self.session.commit()
+
+    def compute_balances(self) -> Dict[Text, float]:
+        """Compute the balance of every account number from the online and offline
+        transactions"""
+        balances: Dict[Text, float] = {}
+        dialect_name = self.session.get_bind().dialect.name
+        earned = self.session.query(
+            Transaction.to_account_number, sa.func.sum(Transaction.amount)
+        ).group_by(Transaction.to_account_number)
+        spent = self.session.query(
+            Transaction.from_account_number, sa.func.sum(Transaction.amount)
+        ).group_by(Transaction.from_account_number)
+        earned_offline = self.session.query(
+            account_number_sql(OfflineTransaction.to_account, dialect_name),
+            sa.func.sum(OfflineTransaction.amount),
+        ).group_by(OfflineTransaction.to_account)
+        spent_offline = self.session.query(
+            account_number_sql(OfflineTransaction.from_account, dialect_name),
+            sa.func.sum(OfflineTransaction.amount),
+        ).group_by(OfflineTransaction.from_account)
+        for account_number, amount in itertools.chain(earned, earned_offline):
+            balances[account_number] = balances.get(account_number, 0) + amount
+        for account_number, amount in itertools.chain(spent, spent_offline):
+            balances[account_number] = balances.get(account_number, 0) - amount
+        return balances
+
+    def reconcile_balances(self, fix: bool = True) -> Dict[Text, Tuple[float, float]]:
+        """Compare the `account_balances` ledger with the online and offline
+        transactions. Returns the drifted accounts as account number -> (ledger,
+        actual) balance. If `fix` is `True`, the ledger is rebuilt from them.
+        """
+        actual = self.compute_balances()
+        ledger = dict(
+            self.session.query(AccountBalance.account_number, AccountBalance.balance)
         )
-        earned = float(
-            self.session.query(sa.func.sum(Transaction.amount))
-            .filter(Transaction.to_account_number == account_number)
-            .all()[0][0]
+        drift = {
+            account_number: (ledger.get(account_number, 0), balance)
+            for account_number, balance in actual.items()
+            if abs(ledger.get(account_number, 0) - balance) > BALANCE_DRIFT_TOLERANCE
+        }
+        drift.update(
+            {
+                account_number: (balance, 0)
+                for account_number, balance in ledger.items()
+                if account_number not in actual
+                and abs(balance) > BALANCE_DRIFT_TOLERANCE
+            }
         )
-        return earned - spent
+        if fix:
+            self.session.query(AccountBalance).delete(synchronize_session=False)
+            self.session.bulk_insert_mappings(
+                AccountBalance,
+                [
+                    {"account_number": account_number, "balance": balance}
+                    for account_number, balance in actual.items()
+                ],
+            )
+            self.session.commit()
+        return drift
 
     def get_currency(self, session_id: Text):
         """Get the currency for an account"""
@@ -189,6 +634,68 @@ class ProfileDB:
             .first()[0]
         )
 
+    def select_all_transactions(
+        self,
+        session_id: Text,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        deposit: bool = False,
+        vendor: Optional[Text] = None,
+    ) -> sa.sql.Subquery:
+        """Online and offline transactions of an account as one `UNION ALL`, with
+        `source`, `id`, `from_account_number`, `to_account_number`, `amount` and
+        `timestamp` columns. Every filter is applied inside both branches, on the
+        (account, timestamp) index of each table, see `search_transactions`.
+        """
+        account_id, account_number = self.get_account_ids(session_id)
+        counterpart_number = None
+        if vendor and not deposit:
+            vendor_account = self.get_vendor_registry().get(vendor)
+            counterpart_number = vendor_account[1] if vendor_account else None
+
+        dialect_name = self.session.get_bind().dialect.name
+        online = sa.select(
+            sa.literal("online").label("source"),
+            Transaction.id,
+            Transaction.from_account_number,
+            Transaction.to_account_number,
+            Transaction.amount,
+            Transaction.timestamp,
+        )
+        offline = sa.select(
+            sa.literal("offline").label("source"),
+            OfflineTransaction.id,
+            account_number_sql(OfflineTransaction.from_account, dialect_name).label(
+                "from_account_number"
+            ),
+            account_number_sql(OfflineTransaction.to_account, dialect_name).label(
+                "to_account_number"
+            ),
+            OfflineTransaction.amount,
+            OfflineTransaction.timestamp,
+        )
+        if deposit:
+            online = online.where(Transaction.to_account_number == account_number)
+            offline = offline.where(OfflineTransaction.to_account == account_id)
+        else:
+            online = online.where(Transaction.from_account_number == account_number)
+            offline = offline.where(OfflineTransaction.from_account == account_id)
+            if vendor:
+                online = online.where(
+                    Transaction.to_account_number == counterpart_number
+                )
+                offline = offline.where(
+                    OfflineTransaction.to_account
+                    == (int(counterpart_number) if counterpart_number else None)
+                )
+        if start_time:
+            online = online.where(Transaction.timestamp >= start_time)
+            offline = offline.where(OfflineTransaction.timestamp >= start_time)
+        if end_time:
+            online = online.where(Transaction.timestamp <= end_time)
+            offline = offline.where(OfflineTransaction.timestamp <= end_time)
+        return sa.union_all(online, offline).subquery("all_transactions")
+
     def search_transactions(
         self,
         session_id: Text,
@@ -197,56 +704,202 @@ class ProfileDB:
         deposit: bool = False,
         vendor: Optional[Text] = None,
     ):
-        """Find all transactions for an account between `start_time` and `end_time`.
+        """Find all online and offline transactions for an account between
+        `start_time` and `end_time`, as rows of `select_all_transactions`.
         Looks for spend transactions by default, set `deposit` to `True` to search earnings.
         Looks for transactions with anybody by default, set `vendor` to search by vendor
         """
-        account = self.get_account_from_session_id(session_id)
-        account_number = self.get_account_number(account)
-        if deposit:
-            transactions = self.session.query(Transaction).filter(
-                Transaction.to_account_number == account_number
+        return self.session.query(
+            self.select_all_transactions(
+                session_id, start_time, end_time, deposit, vendor
             )
-        elif vendor:
-            to_account = (
-                self.session.query(Account.id)
-                .filter(Account.session_id.startswith("vendor_"))
-                .filter(Account.account_holder_name == vendor.lower())
-                .first()
+        )
+
+    def summarize_transactions(
+        self,
+        session_id: Text,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        deposit: bool = False,
+        vendor: Optional[Text] = None,
+        grain: Optional[Text] = None,
+    ) -> Dict[Text, Any]:
+        """Total, count, smallest and largest amount of the transactions
+        `search_transactions` finds, computed by the database in one statement.
+        Set `grain` (e.g. `"day"`) to also get them per day in `"breakdown"`.
+        The whole days of the range are read from the daily `transaction_rollups`,
+        only the partial days at its edges from the transactions themselves.
+        """
+        first_day = start_time and start_time.date()
+        if start_time and start_time.time() != time():
+            first_day += timedelta(days=1)
+        # transactions up to `end_time` on its own day are not a whole day
+        last_day = end_time and end_time.date() - timedelta(days=1)
+        if grain not in ROLLUP_GRAINS or (
+            first_day and last_day and first_day > last_day
+        ):
+            statements = [
+                self.select_transactions_summary(
+                    session_id, start_time, end_time, deposit, vendor, grain
+                )
+            ]
+        else:
+            statements = [
+                self.select_rollups_summary(
+                    session_id, first_day, last_day, deposit, vendor, grain
+                )
+            ]
+            if start_time and first_day > start_time.date():
+                statements.append(
+                    self.select_transactions_summary(
+                        session_id,
+                        start_time,
+                        datetime.combine(first_day, time(), start_time.tzinfo)
+                        - timedelta(microseconds=1),
+                        deposit,
+                        vendor,
+                        grain,
+                    )
+                )
+            if end_time:
+                statements.append(
+                    self.select_transactions_summary(
+                        session_id,
+                        datetime.combine(end_time.date(), time(), end_time.tzinfo),
+                        end_time,
+                        deposit,
+                        vendor,
+                        grain,
+                    )
+                )
+        periods = self.session.execute(
+            sa.union_all(*statements) if len(statements) > 1 else statements[0]
+        )
+
+        merged: Dict[Any, List] = {}
+        for period, total, count, smallest, largest in periods:
+            summary = merged.setdefault(period, [0, 0, None, None])
+            summary[0] += total or 0
+            summary[1] += int(count or 0)
+            if smallest is not None:
+                summary[2] = (
+                    smallest if summary[2] is None else min(summary[2], smallest)
+                )
+            if largest is not None:
+                summary[3] = largest if summary[3] is None else max(summary[3], largest)
+        breakdown = [
+            {
+                "period": period,
+                "total": total,
+                "count": count,
+                "min": smallest,
+                "max": largest,
+            }
+            for period, (total, count, smallest, largest) in sorted(
+                merged.items(), key=lambda item: item[0]
             )
-            to_account_number = self.get_account_number(to_account)
-            transactions = (
-                self.session.query(Transaction)
-                .filter(Transaction.from_account_number == account_number)
-                .filter(Transaction.to_account_number == to_account_number)
+            if count
+        ]
+        return {
+            "total": sum(row["total"] for row in breakdown),
+            "count": sum(row["count"] for row in breakdown),
+            "min": min((row["min"] for row in breakdown), default=None),
+            "max": max((row["max"] for row in breakdown), default=None),
+            "breakdown": breakdown if grain else [],
+        }
+
+    def select_transactions_summary(
+        self,
+        session_id: Text,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        deposit: bool = False,
+        vendor: Optional[Text] = None,
+        grain: Optional[Text] = None,
+    ) -> sa.sql.Select:
+        """Select (period, total, count, smallest, largest) of the transactions per
+        `grain`, or of all of them with period `NULL`"""
+        transactions = self.select_all_transactions(
+            session_id, start_time, end_time, deposit, vendor
+        )
+        aggregates = [
+            sa.func.sum(transactions.c.amount),
+            sa.func.count(transactions.c.id),
+            sa.func.min(transactions.c.amount),
+            sa.func.max(transactions.c.amount),
+        ]
+        if not grain:
+            return sa.select(sa.null().label("period"), *aggregates)
+        period = grain_start(
+            transactions.c.timestamp, grain, self.session.get_bind().dialect.name
+        ).label("period")
+        return sa.select(period, *aggregates).group_by(period)
+
+    def select_rollups_summary(
+        self,
+        session_id: Text,
+        first_day: Optional[date] = None,
+        last_day: Optional[date] = None,
+        deposit: bool = False,
+        vendor: Optional[Text] = None,
+        grain: Optional[Text] = None,
+    ) -> sa.sql.Select:
+        """Like `select_transactions_summary`, from the `transaction_rollups` of
+        the days from `first_day` through `last_day`"""
+        _, account_number = self.get_account_ids(session_id)
+        aggregates = [
+            sa.func.sum(TransactionRollup.total),
+            sa.func.sum(TransactionRollup.count),
+            sa.func.min(TransactionRollup.smallest),
+            sa.func.max(TransactionRollup.largest),
+        ]
+        dialect_name = self.session.get_bind().dialect.name
+        if grain:
+            day = TransactionRollup.day
+            if dialect_name != "sqlite":
+                # like the transactions' timestamps, so periods from both match
+                day = sa.cast(day, sa.DateTime)
+            period = grain_start(day, grain, dialect_name).label("period")
+            rollups = sa.select(period, *aggregates).group_by(period)
+        else:
+            rollups = sa.select(sa.null().label("period"), *aggregates)
+
+        if deposit:
+            rollups = rollups.where(
+                TransactionRollup.to_account_number == account_number
             )
         else:
-            transactions = self.session.query(Transaction).filter(
-                Transaction.from_account_number == account_number
+            rollups = rollups.where(
+                TransactionRollup.from_account_number == account_number
             )
-        if start_time:
-            transactions = transactions.filter(Transaction.timestamp >= start_time)
-        if end_time:
-            transactions = transactions.filter(Transaction.timestamp <= end_time)
-
-        return transactions
+            if vendor:
+                vendor_account = self.get_vendor_registry().get(vendor)
+                rollups = rollups.where(
+                    TransactionRollup.to_account_number
+                    == (vendor_account[1] if vendor_account else None)
+                )
+        if first_day:
+            rollups = rollups.where(TransactionRollup.day >= first_day)
+        if last_day:
+            rollups = rollups.where(TransactionRollup.day <= last_day)
+        return rollups
 
     def list_credit_cards(self, session_id: Text):
         """List valid credit cards for an account"""
-        account = self.get_account_from_session_id(session_id)
+        account_id, _ = self.get_account_ids(session_id)
         cards = (
             self.session.query(CreditCard)
-            .filter(CreditCard.account_id == account.id)
+            .filter(CreditCard.account_id == account_id)
             .all()
         )
         return [card.credit_card_name for card in cards]
 
     def get_credit_card(self, session_id: Text, credit_card_name: Text):
         """Get a `CreditCard` object based on the card's name and the `session_id`"""
-        account = self.get_account_from_session_id(session_id)
+        account_id, _ = self.get_account_ids(session_id)
         return (
             self.session.query(CreditCard)
-            .filter(CreditCard.account_id == account.id)
+            .filter(CreditCard.account_id == account_id)
             .filter(CreditCard.credit_card_name == credit_card_name.lower())
             .first()
         )
@@ -262,6 +915,34 @@ class ProfileDB:
         card = self.get_credit_card(session_id, credit_card_name)
         return getattr(card, balance_type)
 
+    def get_credit_card_overview(
+        self, session_id: Text
+    ) -> Dict[Text, Dict[Text, float]]:
+        """Get the balances of all credit cards of an account in one query, as
+        card name -> {"current_balance": ..., "minimum_balance": ...}"""
+        account_id, _ = self.get_account_ids(session_id)
+        cards = (
+            self.session.query(
+                CreditCard.credit_card_name,
+                CreditCard.current_balance,
+                CreditCard.minimum_balance,
+            )
+            .filter(CreditCard.account_id == account_id)
+            .order_by(CreditCard.id)
+            .all()
+        )
+        overview: Dict[Text, Dict[Text, float]] = {}
+        for name, current_balance, minimum_balance in cards:
+            # like `get_credit_card`, the first card wins if names repeat
+            overview.setdefault(
+                name,
+                {
+                    "current_balance": current_balance,
+                    "minimum_balance": minimum_balance,
+                },
+            )
+        return overview
+
     @staticmethod
     def list_balance_types():
         """List valid balance types for credit cards"""
@@ -273,36 +954,99 @@ class ProfileDB:
 
     def list_vendors(self):
         """List valid vendors"""
-        vendors = (
-            self.session.query(Account.account_holder_name)
-            .filter(Account.session_id.startswith("vendor_"))
-            .all()
+        return self.get_vendor_registry().names()
+
+    def find_vendor(self, name: Text) -> Optional[Tuple[Text, Text]]:
+        """Get the name and account number of the vendor a user means by `name`,
+        see `VendorRegistry.find`"""
+        return self.get_vendor_registry().find(name)
+
+    def get_vendor_registry(self) -> VendorRegistry:
+        """Get the `vendor_registry`, reloaded first if another worker (or this
+        one) changed the vendors since it was loaded"""
+        registry = self.vendor_registry
+        if registry.needs_check():
+            version = self.get_cache_version(VENDOR_CACHE_NAME)
+            if version != registry.version:
+                vendors = (
+                    self.session.query(Account.account_holder_name, Account.id)
+                    .filter(Account.is_vendor.is_(True))
+                    .order_by(Account.id)
+                    .all()
+                )
+                registry.load(
+                    version,
+                    [
+                        (vendor.account_holder_name, self.get_account_number(vendor))
+                        for vendor in vendors
+                    ],
+                )
+            else:
+                registry.mark_checked()
+        return registry
+
+    def get_cache_version(self, name: Text) -> int:
+        """Get the version of the in-process cache `name`, see `CacheVersion`"""
+        version = (
+            self.session.query(CacheVersion.version)
+            .filter(CacheVersion.name == name)
+            .scalar()
         )
-        return [vendor.account_holder_name for vendor in vendors]
+        return version or 0
+
+    def bump_cache_version(self, name: Text):
+        """Mark every worker's copy of the in-process cache `name` as stale"""
+        updated = (
+            self.session.query(CacheVersion)
+            .filter(CacheVersion.name == name)
+            .update({CacheVersion.version: CacheVersion.version + 1})
+        )
+        if not updated:
+            self.session.add(CacheVersion(name=name, version=1))
 
     def pay_off_credit_card(
         self, session_id: Text, credit_card_name: Text, amount: float
     ):
-        """Do a transaction to move the specified amount from an account to a credit card"""
-        account = self.get_account_from_session_id(session_id)
-        account_number = self.get_account_number(account)
+        """Do a transaction to move the specified amount from an account to a credit card.
+        The balance check, the transaction and the card balances are written in one
+        DB transaction, raises `InsufficientFundsError` if the account cannot cover
+        the payment.
+        """
+        account_id, account_number = self.get_account_ids(session_id)
         credit_card = (
             self.session.query(CreditCard)
-            .filter(CreditCard.account_id == account.id)
+            .filter(CreditCard.account_id == account_id)
             .filter(CreditCard.credit_card_name == credit_card_name.lower())
             .first()
         )
-        self.transact(
-            account_number,
-            self.get_account_number(credit_card),
-            amount,
-        )
-        credit_card.current_balance -= amount
-        if amount < credit_card.minimum_balance:
-            credit_card.minimum_balance -= amount
-        else:
-            credit_card.minimum_balance = 0
-        self.session.commit()
+        try:
+            self.record_transaction(
+                account_number,
+                self.get_account_number(credit_card),
+                amount,
+                check_balance=True,
+            )
+            # computed by the database, so concurrent payments do not overwrite
+            # each other's balances
+            self.session.query(CreditCard).filter(
+                CreditCard.id == credit_card.id
+            ).update(
+                {
+                    CreditCard.current_balance: CreditCard.current_balance - amount,
+                    CreditCard.minimum_balance: sa.case(
+                        (
+                            CreditCard.minimum_balance > amount,
+                            CreditCard.minimum_balance - amount,
+                        ),
+                        else_=0,
+                    ),
+                },
+                synchronize_session="fetch",
+            )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
 
     def check_general_accounts_populated(
         self, general_account_names: Dict[Text, List[Text]]
@@ -326,7 +1070,11 @@ class ProfileDB:
     def add_general_accounts(self, general_account_names: Dict[Text, List[Text]]):
         """Populate tables with global values for vendors, recipients, and depositors"""
         general_accounts = [
-            Account(session_id=f"{prefix}_{id}", account_holder_name=name)
+            Account(
+                session_id=f"{prefix}_{id}",
+                account_holder_name=name,
+                is_vendor=prefix == "vendor",
+            )
             for prefix, names in general_account_names.items()
             for id, name in enumerate(names)
         ]
@@ -335,34 +1083,47 @@ class ProfileDB:
             self.session.merge(account)
         self.session.commit()
 
-    def add_recipients(self, session_id: Text):
-        """Populate recipients table"""
-        account = self.get_account_from_session_id(session_id)
+    def add_recipients(
+        self, session_id: Text, rng: Optional[np.random.Generator] = None
+    ):
+        """Populate recipients table.
+        Pass a seeded `rng` to get the same recipients every time.
+        """
+        rng = rng or np.random.default_rng()
+        account_id, _ = self.get_account_ids(session_id)
         recipients = (
             self.session.query(Account.account_holder_name, Account.id)
             .filter(Account.session_id.startswith("recipient_"))
+            .order_by(Account.id)
             .all()
         )
-        session_recipients = sample(recipients, choice(list(range(3, len(recipients)))))
+        session_recipients = [
+            recipients[index]
+            for index in rng.choice(
+                len(recipients), rng.integers(3, len(recipients)), replace=False
+            )
+        ]
         relationships = [
             RecipientRelationship(
-                account_id=account.id,
+                account_id=account_id,
                 recipient_account_id=recipient.id,
                 recipient_nickname=recipient.account_holder_name,
             )
             for recipient in session_recipients
         ]
         self.session.add_all(relationships)
+        self.recipient_cache.invalidate(session_id)
 
-    def add_transactions(self, session_id: Text):
-        """Populate transactions table for a session ID with random transactions"""
-        account_number = self.get_account_number(
-            self.get_account_from_session_id(session_id)
-        )
+    def add_transactions(
+        self, session_id: Text, rng: Optional[np.random.Generator] = None
+    ):
+        """Populate transactions table for a session ID with random transactions.
+        Pass a seeded `rng` to get the same transactions every time.
+        """
+        _, account_number = self.get_account_ids(session_id)
+        # only the general vendors, not the registry vendors of other sessions
         vendors = (
-            self.session.query(Account)
-            .filter(Account.session_id.startswith("vendor_"))
-            .all()
+            self.get_vendors().filter(Account.session_id.startswith("vendor_")).all()
         )
         depositors = (
             self.session.query(Account)
@@ -370,100 +1131,168 @@ class ProfileDB:
             .all()
         )
 
-        start_date = utc.localize(datetime(2019, 1, 1))
-        end_date = utc.localize(datetime.now())
-        number_of_days = (end_date - start_date).days
+        rows, balance_deltas = generate_transactions(
+            rng or np.random.default_rng(),
+            account_number,
+            [self.get_account_number(vendor) for vendor in vendors],
+            {
+                self.get_account_number(depositor): depositor.account_holder_name
+                for depositor in depositors
+            },
+        )
+        insert_transactions(self.session, rows)
+        self.update_balances(balance_deltas)
+        self.update_rollups(rows)
 
-        for vendor in vendors:
-            rand_spend_amounts = sample(
-                [round(amount, 2) for amount in list(arange(5, 50, 0.01))],
-                number_of_days // 2,
+    def add_credit_cards(
+        self, session_id: Text, rng: Optional[np.random.Generator] = None
+    ):
+        """Populate the creditcard table for a given session_id.
+        Pass a seeded `rng` to get the same balances every time.
+        """
+        rng = rng or np.random.default_rng()
+        credit_card_names = ["iron bank", "credit all", "emblem", "justice bank"]
+        account_id, _ = self.get_account_ids(session_id)
+        credit_cards = [
+            CreditCard(
+                credit_card_name=cardname,
+                minimum_balance=int(rng.choice([20, 30, 40])),
+                current_balance=round(float(rng.uniform(20, 500)), 2),
+                account_id=account_id,
             )
+            for cardname in credit_card_names
+        ]
+        self.session.add_all(credit_cards)
 
-            rand_dates = [
-                (start_date + timedelta(days=randrange(number_of_days)))
-                for x in range(0, len(rand_spend_amounts))
-            ]
-
-            spend_transactions = [
-                Transaction(
-                    from_account_number=account_number,
-                    to_account_number=self.get_account_number(vendor),
-                    amount=amount,
-                    timestamp=date,
-                )
-                for amount, date in zip(rand_spend_amounts, rand_dates)
-            ]
-
-            self.session.add_all(spend_transactions)
-
-        for depositor in depositors:
-            if depositor.account_holder_name == "interest":
-                rand_deposit_amounts = sample(
-                    [round(amount, 2) for amount in list(arange(5, 20, 0.01))],
-                    number_of_days // 30,
-                )
-            else:
-                rand_deposit_amounts = sample(
-                    [round(amount, 2) for amount in list(arange(1000, 2000, 0.01))],
-                    number_of_days // 14,
-                )
-
-            rand_dates = [
-                (start_date + timedelta(days=randrange(number_of_days)))
-                for x in range(0, len(rand_deposit_amounts))
-            ]
-
-            deposit_transactions = [
-                Transaction(
-                    from_account_number=self.get_account_number(depositor),
-                    to_account_number=account_number,
-                    amount=amount,
-                    timestamp=date,
-                )
-                for amount, date in zip(rand_deposit_amounts, rand_dates)
-            ]
-
-            self.session.add_all(deposit_transactions)
+    def add_session_account(self, session_id: Text, name: Optional[Text] = ""):
+        """Add a new account for a new session_id. Assumes no such account exists yet."""
+        self.session.add(
+            Account(session_id=session_id, account_holder_name=name, currency="$")
+        )
+        self.invocation_account_cache().invalidate(session_id)
+        self.account_cache.invalidate(session_id)
 
-    def populate_profile_db(self, session_id: Text):
+    def populate_profile_db(
+        self, session_id: Text, rng: Optional[np.random.Generator] = None
+    ):
         """Initialize the database for a conversation session.
         Will populate all tables with sample values.
         If general accounts have already been populated, it will only
         add account-holder-specific values to tables.
+        `rng` seeds the sample recipients, transactions and credit cards.
         """
-        if not self.check_general_accounts_populated(GENERAL_ACCOUNTS):
-            self.add_general_accounts(GENERAL_ACCOUNTS)
         if not self.check_session_id_exists(session_id):
             self.add_session_account(session_id)
-            self.add_recipients(session_id)
-            self.add_transactions(session_id)
-            self.add_credit_cards(session_id)
+            self.add_session_history(session_id, rng)
+        elif not self.check_general_accounts_populated(GENERAL_ACCOUNTS):
+            self.add_general_accounts(GENERAL_ACCOUNTS)
 
         self.session.commit()
 
+    def add_session_history(
+        self, session_id: Text, rng: Optional[np.random.Generator] = None
+    ):
+        """Add sample recipients, transactions and credit cards to the account of
+        `session_id`, and the general accounts they refer to if they are missing"""
+        rng = rng or np.random.default_rng()
+        if not self.check_general_accounts_populated(GENERAL_ACCOUNTS):
+            self.add_general_accounts(GENERAL_ACCOUNTS)
+        self.add_recipients(session_id, rng)
+        self.add_transactions(session_id, rng)
+        # credit cards come last, see `check_session_history_exists`
+        self.add_credit_cards(session_id, rng)
+
+    def check_session_history_exists(self, session_id: Text):
+        """Check if the sample history of `session_id` was added. The credit cards
+        are added last, in the same commit as the rest of the history."""
+        account_id, _ = self.get_account_ids(session_id)
+        return self.session.query(
+            self.session.query(CreditCard.id)
+            .filter(CreditCard.account_id == account_id)
+            .exists()
+        ).scalar()
+
     def transact(
-        self, from_account_number: Text, to_account_number: Text, amount: float
+        self,
+        from_account_number: Text,
+        to_account_number: Text,
+        amount: float,
+        check_balance: bool = False,
     ):
-        """Add a transation to the transaction table"""
-        timestamp = datetime.now()
-        transaction = Transaction(
-            from_account_number=from_account_number,
-            to_account_number=to_account_number,
-            amount=amount,
-            timestamp=timestamp,
-        )
-        self.session.add(transaction)
-        self.session.commit()
+        """Add a transation to the transaction table.
+        Set `check_balance` to only move the money if the balance of
+        `from_account_number` covers it, see `record_transaction`.
+        """
+        try:
+            self.record_transaction(
+                from_account_number, to_account_number, amount, check_balance
+            )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def record_transaction(
+        self,
+        from_account_number: Text,
+        to_account_number: Text,
+        amount: float,
+        check_balance: bool = False,
+    ):
+        """Add a transaction and its ledger changes without committing.
+        With `check_balance`, the debit is a single `UPDATE ... WHERE balance >=
+        amount`: the database checks and writes the balance under the row's lock,
+        so concurrent transfers cannot overdraw the account. Raises
+        `InsufficientFundsError` if the balance does not cover `amount`, and
+        `ValueError` if `amount` is not a positive number. As in `update_balances`,
+        the two balances are updated in the order of their account numbers.
+        """
+        if not (math.isfinite(amount) and amount > 0):
+            raise ValueError(f"Cannot transfer an amount of {amount!r}")
+        # the debit comes first for a transfer to the same account
+        for account_number, delta in sorted(
+            [(from_account_number, -amount), (to_account_number, amount)]
+        ):
+            if check_balance and delta < 0:
+                debited = (
+                    self.session.query(AccountBalance)
+                    .filter(AccountBalance.account_number == account_number)
+                    .filter(AccountBalance.balance >= amount)
+                    .update(
+                        {AccountBalance.balance: AccountBalance.balance - amount},
+                        synchronize_session=False,
+                    )
+                )
+                if not debited:
+                    raise InsufficientFundsError(
+                        f"Balance of {account_number} does not cover {amount:.2f}"
+                    )
+            else:
+                self.update_balances({account_number: delta})
+        row = {
+            "from_account_number": from_account_number,
+            "to_account_number": to_account_number,
+            "amount": amount,
+            "timestamp": datetime.now(),
+        }
+        self.session.add(Transaction(**row))
+        self.update_rollups([row])
+        self.session.flush()
 
     def add_vendor(self, vendor_name: Text):
+        self.record_vendor(vendor_name)
+        self.session.commit()
+        self.vendor_registry.invalidate()
+
+    def record_vendor(self, vendor_name: Text):
+        """Add a vendor account and its credit card without committing"""
         vendor = Account(
             session_id=f"{vendor_name}_vendor",
             account_holder_name=vendor_name,
             is_vendor=True,
         )
         self.session.add(vendor)
-        self.session.commit()
+        self.session.flush()
 
         credit_card = CreditCard(
             credit_card_name="credit all",
@@ -473,43 +1302,105 @@ class ProfileDB:
         )
 
         self.session.add(credit_card)
-        self.session.commit()
+        self.bump_cache_version(VENDOR_CACHE_NAME)
 
     def get_vendors(self):
-        return self.session.query(Account).filter(Account.is_vendor == True)
+        """Query the vendor `Account`s"""
+        return self.session.query(Account).filter(Account.is_vendor.is_(True))
 
     def add_offline_transaction(
-        self, rasa_session_id: Text, to_account_name: Text, time: datetime, amount: int
+        self,
+        rasa_session_id: Text,
+        to_account_name: Text,
+        time: datetime,
+        amount: Union[float, Text],
+    ):
+        self.record_offline_transaction(rasa_session_id, to_account_name, time, amount)
+        self.session.commit()
+
+    def record_offline_transaction(
+        self,
+        rasa_session_id: Text,
+        to_account_name: Text,
+        time: datetime,
+        amount: Union[float, Text],
     ):
+        """Add an offline transaction and its ledger changes without committing.
+        Raises `ValueError` if `amount` is not a positive number."""
         logger.info(f"Incoming time: {time}")
-        from_account = (
-            self.session.query(Account)
-            .filter(Account.session_id == rasa_session_id)
-            .first()
-        )
-        to_account = (
-            self.session.query(Account)
-            .filter(Account.account_holder_name == to_account_name)
-            .first()
-        )
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            raise ValueError(f"Amount {amount!r} is not a number")
+        if not (math.isfinite(amount) and amount > 0):
+            raise ValueError(f"Cannot add a transaction of {amount!r}")
+        time = time or datetime.now()
+        from_account_id = self.find_session_account_id(rasa_session_id)
+        if from_account_id is None:
+            raise ValueError(f"No account for session '{rasa_session_id}'")
+        to_account_id = self.find_account_id(to_account_name)
+        if to_account_id is None:
+            raise ValueError(f"No account named '{to_account_name}'")
 
         transac = OfflineTransaction(
             amount=amount,
-            from_account=from_account.id,
-            to_account=to_account.id,
+            from_account=from_account_id,
+            to_account=to_account_id,
             timestamp=time,
         )
 
         self.session.add(transac)
-        self.session.commit()
+        from_account_number = f"%0.{ACCOUNT_NUMBER_LENGTH}d" % from_account_id
+        to_account_number = f"%0.{ACCOUNT_NUMBER_LENGTH}d" % to_account_id
+        self.update_balances({from_account_number: -amount, to_account_number: amount})
+        self.update_rollups(
+            [
+                {
+                    "from_account_number": from_account_number,
+                    "to_account_number": to_account_number,
+                    "amount": amount,
+                    "timestamp": time,
+                }
+            ]
+        )
+
+    def find_session_account_id(self, session_id: Text) -> Optional[int]:
+        """Get the `Account.id` of `session_id` through the `account_cache`, without
+        creating the account if it does not exist"""
+        account_ids = self.account_cache.get(session_id)
+        if account_ids:
+            return account_ids[0]
+        account_id = (
+            self.session.query(Account.id)
+            .filter(Account.session_id == session_id)
+            .limit(1)
+            .scalar()
+        )
+        if account_id is not None:
+            self.account_cache.put(
+                session_id, account_id, f"%0.{ACCOUNT_NUMBER_LENGTH}d" % account_id
+            )
+        return account_id
+
+    def find_account_id(self, account_holder_name: Text) -> Optional[int]:
+        """Get the `Account.id` of the vendor called `account_holder_name` from the
+        vendor registry, or else of the first account with that holder name"""
+        vendor = self.get_vendor_registry().get(account_holder_name)
+        if vendor:
+            return int(vendor[1])
+        return (
+            self.session.query(Account.id)
+            .filter(Account.account_holder_name == account_holder_name)
+            .order_by(Account.id)
+            .limit(1)
+            .scalar()
+        )
 
     def add_curr_accounts(self, session_id: Text):
         """Populate currency_account table"""
         cards = (
             self.session.query(CreditCard)
-            .filter(
-                CreditCard.account_id == self.get_account_from_session_id(session_id).id
-            )
+            .filter(CreditCard.account_id == self.get_account_ids(session_id)[0])
             .all()
         )
         curr_accounts = [
@@ -541,10 +1432,10 @@ class ProfileDB:
         self.session.commit()
 
     def creat_curr_acc(self, session_id: Text, card_name: Text, currency: Text):
-        account_id = self.get_account_from_session_id(session_id)
+        account_id, _ = self.get_account_ids(session_id)
         card_id = (
             self.session.query(CreditCard)
-            .filter(account_id.id == CreditCard.account_id)
+            .filter(account_id == CreditCard.account_id)
             .filter(card_name.lower() == CreditCard.credit_card_name)
             .all()
         )
@@ -553,20 +1444,158 @@ class ProfileDB:
             currency,
         )
         self.session.commit()
-        
+
     def list_curr_accounts_balances(self, session_id: Text):
-        """List valid currency accounts"""
-        acc_id = self.get_account_from_session_id(session_id).id
-        cards_ids = (
-            self.session.query(CreditCard).filter(CreditCard.account_id == acc_id).all()
-        )
-        accounts = []
-        for idd in cards_ids:
-            acc = (
+        """List valid currency accounts as (card name, currency, balance) rows"""
+        account_id, _ = self.get_account_ids(session_id)
+        rows = (
+            self.session.query(
+                CreditCard.credit_card_name,
+                CurrencyAccount.currency,
+                CurrencyAccount.balance,
+            )
+            .join(CurrencyAccount, CurrencyAccount.card_id == CreditCard.id)
+            .filter(CreditCard.account_id == account_id)
+            .order_by(CreditCard.id, CurrencyAccount.id)
+            .all()
+        )
+        return [tuple(row) for row in rows]
+
+    def check_curr_account_exists(
+        self, session_id: Text, card_name: Text, currency: Text
+    ):
+        """Check if the credit card `card_name` already has a `currency` account"""
+        account_id, _ = self.get_account_ids(session_id)
+        return self.session.query(
+            self.session.query(CurrencyAccount.id)
+            .join(CreditCard, CurrencyAccount.card_id == CreditCard.id)
+            .filter(CreditCard.account_id == account_id)
+            .filter(CreditCard.credit_card_name == card_name.lower())
+            .filter(CurrencyAccount.currency == currency)
+            .exists()
+        ).scalar()
+
+    def get_fx_rates(self, currencies: Iterable[Text]) -> Dict[Text, float]:
+        """Get the exchange rates (see `FxRate`) of currency codes or symbols, from
+        the `fx_rate_cache` or with one query for all that are not cached"""
+        rates = {
+            currency: self.fx_rate_cache.get(currency)
+            for currency in {normalize_currency(currency) for currency in currencies}
+        }
+        missing = [currency for currency, rate in rates.items() if rate is None]
+        if missing:
+            for currency, rate in self.session.query(
+                FxRate.currency, FxRate.rate
+            ).filter(FxRate.currency.in_(missing)):
+                rates[currency] = rate
+                self.fx_rate_cache.put(currency, rate)
+        unknown = sorted(currency for currency, rate in rates.items() if rate is None)
+        if unknown:
+            raise ValueError(f"No exchange rate for {', '.join(unknown)}")
+        return rates
+
+    def convert(
+        self,
+        amounts: Sequence[float],
+        from_currencies: Union[Text, Sequence[Text]],
+        to_currency: Text,
+    ) -> np.ndarray:
+        """Convert `amounts` from their currencies (one for all, or one per amount)
+        into `to_currency`, see `actions.database.fx.convert_amounts`"""
+        currencies = (
+            [from_currencies] if isinstance(from_currencies, str) else from_currencies
+        )
+        rates = self.get_fx_rates([*currencies, to_currency])
+        return convert_amounts(amounts, from_currencies, to_currency, rates)
+
+    def list_curr_accounts_in_currency(
+        self, session_id: Text, home_currency: Optional[Text] = None
+    ):
+        """List valid currency accounts as (card name, currency, balance, balance in
+        `home_currency`) rows. Uses the account's own currency by default."""
+        rows = (
+            self.session.query(
+                CreditCard.credit_card_name,
+                CurrencyAccount.currency,
+                CurrencyAccount.balance,
+                Account.currency,
+            )
+            .join(CurrencyAccount, CurrencyAccount.card_id == CreditCard.id)
+            .join(Account, Account.id == CreditCard.account_id)
+            .filter(CreditCard.account_id == self.get_account_ids(session_id)[0])
+            .order_by(CreditCard.id, CurrencyAccount.id)
+            .all()
+        )
+        if not rows:
+            return []
+        names, currencies, balances, account_currencies = zip(*rows)
+        converted = self.convert(
+            [balance or 0 for balance in balances],
+            currencies,
+            home_currency or account_currencies[0],
+        )
+        return list(zip(names, currencies, balances, converted.tolist()))
+
+    def transfer_between_currency_accounts(
+        self,
+        session_id: Text,
+        card_name: Text,
+        from_currency: Text,
+        to_currency: Text,
+        amount: float,
+    ) -> float:
+        """Move `amount` (in `from_currency`) between two currency accounts of a
+        credit card. Returns the amount credited in `to_currency`. The debit is a
+        single `UPDATE ... WHERE balance >= amount`, as in `record_transaction`, and
+        both legs are committed together. Raises `InsufficientFundsError` if the
+        balance does not cover `amount`, and `ValueError` if `amount` is not a
+        positive number."""
+        if not (math.isfinite(amount) and amount > 0):
+            raise ValueError(f"Cannot transfer an amount of {amount!r}")
+        account_ids = {
+            normalize_currency(currency): id
+            for id, currency in self.session.query(
+                CurrencyAccount.id, CurrencyAccount.currency
+            )
+            .join(CreditCard, CurrencyAccount.card_id == CreditCard.id)
+            .filter(CreditCard.account_id == self.get_account_ids(session_id)[0])
+            .filter(CreditCard.credit_card_name == card_name.lower())
+        }
+        from_account_id = account_ids.get(normalize_currency(from_currency))
+        to_account_id = account_ids.get(normalize_currency(to_currency))
+        if from_account_id is None or to_account_id is None:
+            raise ValueError(
+                f"'{card_name}' has no {from_currency} or no {to_currency} account"
+            )
+
+        credited = float(self.convert([amount], from_currency, to_currency)[0])
+        try:
+            debited = (
                 self.session.query(CurrencyAccount)
-                .filter(CurrencyAccount.card_id == idd.id)
-                .all()
+                .filter(CurrencyAccount.id == from_account_id)
+                .filter(CurrencyAccount.balance >= amount)
+                .update(
+                    {CurrencyAccount.balance: CurrencyAccount.balance - amount},
+                    synchronize_session=False,
+                )
+            )
+            if not debited:
+                raise InsufficientFundsError(
+                    f"Insufficient {from_currency} balance on '{card_name}'"
+                )
+            self.session.query(CurrencyAccount).filter(
+                CurrencyAccount.id == to_account_id
+            ).update(
+                {
+                    CurrencyAccount.balance: sa.func.coalesce(
+                        CurrencyAccount.balance, 0
+                    )
+                    + credited
+                },
+                synchronize_session=False,
             )
-            for i in range(len(acc)):
-                accounts.append([idd.credit_card_name, acc[i].currency, acc[i].balance])
-        return accounts
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return credited
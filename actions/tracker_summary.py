@@ -0,0 +1,18 @@
+"""Summaries of `tracker.events`: the last value of every slot.
+
+Rasa sends the whole event history with every action call. A summary reads what
+the actions need of it in one pass, instead of one pass per question.
+"""
+from typing import Any, Dict, List, Text
+
+
+class TrackerSummary:
+    """What the actions need to know of a list of events"""
+
+    def __init__(self, events: List[Dict[Text, Any]]):
+        # slot name -> the value it was last set to
+        self.slots: Dict[Text, Any] = {}
+        for event in events:
+            if event.get("event") == "slot":
+                self.slots[event.get("name")] = event.get("value")
+        self.event_count = len(events)
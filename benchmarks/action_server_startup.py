@@ -0,0 +1,81 @@
+"""Action server startup time, from import to the first answered webhook.
+
+Every run starts a fresh interpreter that registers the `actions` package the way
+`rasa run actions` does, then answers one `action_session_start` webhook. The
+database is migrated once up front, as it would be before a deployment.
+
+    python -m benchmarks.action_server_startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.resolve()
+
+STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from rasa_sdk.executor import ActionExecutor
+executor = ActionExecutor()
+executor.register_package("actions")
+imported = time.perf_counter()
+tracker = json.load(open("tests/data/empty_tracker.json"))
+action_call = {
+    "next_action": "action_session_start",
+    "sender_id": tracker["sender_id"],
+    "tracker": tracker,
+    "domain": {},
+}
+asyncio.run(executor.run(action_call))
+answered = time.perf_counter()
+print(json.dumps({"import": imported - started, "first_webhook": answered - started}))
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--runs", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = {
+            **os.environ,
+            "PROFILE_DB_NAME": "benchmark",
+            "PROFILE_DB_URL": f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}",
+        }
+        subprocess.run(
+            [sys.executable, "-m", "actions.database.migrate"],
+            cwd=ROOT,
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+        timings = [
+            json.loads(
+                subprocess.run(
+                    [sys.executable, "-c", STARTUP_SCRIPT],
+                    cwd=ROOT,
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout.splitlines()[-1]
+            )
+            for _ in range(args.runs)
+        ]
+
+    for key in ["import", "first_webhook"]:
+        values = [timing[key] * 1000 for timing in timings]
+        print(
+            f"{key:>13}: median {statistics.median(values):7.1f} ms, "
+            f"min {min(values):7.1f} ms, max {max(values):7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
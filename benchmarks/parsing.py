@@ -0,0 +1,150 @@
+"""Micro-benchmarks of the Duckling time parsing helpers in `actions.parsing`.
+
+The payloads are time entities as Duckling sends them: single values at several
+grains and open and closed intervals, with the UTC offset of the Duckling
+server. Every helper is called `--number` times per payload. Conversations repeat
+the same few times ("today", "last month"), so the payloads are cycled through
+rather than made unique. The `cold` runs clear the parsing caches before every
+call. `entity lookups` are what the validators of a form ask of one message:
+an amount (or number), then a time.
+
+    python -m benchmarks.parsing --number 20000
+"""
+import argparse
+import timeit
+from typing import Any, Callable, Dict, List, Text
+
+from rasa_sdk import Tracker
+
+from actions import parsing
+
+VALUE_PAYLOADS = [
+    {
+        "entity": "time",
+        "value": value,
+        "additional_info": {"type": "value", "value": value, "grain": grain},
+    }
+    for value, grain in [
+        ("2021-03-04T00:00:00.000-08:00", "day"),
+        ("2021-03-01T00:00:00.000-08:00", "week"),
+        ("2021-02-01T00:00:00.000-08:00", "month"),
+        ("2020-01-01T00:00:00.000-08:00", "year"),
+        ("2021-03-04T07:00:00.000-08:00", "hour"),
+        ("2021-03-04T07:30:00.000-08:00", "minute"),
+    ]
+]
+
+INTERVAL_PAYLOADS = [
+    {
+        "entity": "time",
+        "additional_info": {
+            "type": "interval",
+            **({"from": {"value": start, "grain": grain}} if start else {}),
+            **({"to": {"value": end, "grain": grain}} if end else {}),
+        },
+    }
+    for start, end, grain in [
+        ("2021-02-01T00:00:00.000-08:00", "2021-03-01T00:00:00.000-08:00", "month"),
+        ("2020-01-01T00:00:00.000-08:00", "2021-01-01T00:00:00.000-08:00", "year"),
+        ("2021-02-22T00:00:00.000-08:00", None, "day"),
+        (None, "2021-03-04T00:00:00.000-08:00", "day"),
+    ]
+]
+
+MESSAGE_PAYLOADS = [
+    {
+        "entities": [
+            {"entity": "vendor", "value": "amazon"},
+            {"entity": "number", "value": 12},
+            {
+                "entity": "amount-of-money",
+                "additional_info": {"value": 12.0, "unit": "$"},
+            },
+            *VALUE_PAYLOADS[:2],
+        ]
+    }
+]
+
+
+def entity_lookups(message: Dict[Text, Any]):
+    # one tracker per action call, as the SDK makes them
+    tracker = Tracker("bench", {}, message, [], False, None, {}, "")
+    index = parsing.entity_index(tracker)
+    index.amount_of_money()
+    index.time()
+    index.time_interval()
+
+
+def clear_caches():
+    parsing.parse_isotime.cache_clear()
+    parsing.format_isotime_by_grain.cache_clear()
+    parsing.shift_isotime.cache_clear()
+
+
+def bench(
+    name: Text,
+    fn: Callable[[Dict[Text, Any]], Any],
+    payloads: List,
+    number: int,
+    cold: bool = False,
+):
+    def calls():
+        for payload in payloads:
+            if cold:
+                clear_caches()
+            fn(payload)
+
+    seconds = timeit.timeit(calls, number=number)
+    calls = number * len(payloads)
+    print(f"{name:>48}: {seconds / calls * 1e6:7.2f} us/call")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--number", type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    bench(
+        "format_isotime_by_grain",
+        lambda payload: parsing.format_isotime_by_grain(
+            payload["additional_info"]["value"],
+            payload["additional_info"]["grain"],
+        ),
+        VALUE_PAYLOADS,
+        args.number,
+    )
+    bench(
+        "parse_duckling_time", parsing.parse_duckling_time, VALUE_PAYLOADS, args.number
+    )
+    bench(
+        "parse_duckling_time_as_interval (value)",
+        parsing.parse_duckling_time_as_interval,
+        VALUE_PAYLOADS,
+        args.number,
+    )
+    bench(
+        "parse_duckling_time_as_interval (interval)",
+        parsing.parse_duckling_time_as_interval,
+        INTERVAL_PAYLOADS,
+        args.number,
+    )
+    # every timestamp new to the caches, e.g. right after a restart
+    bench(
+        "parse_duckling_time_as_interval (value, cold)",
+        parsing.parse_duckling_time_as_interval,
+        VALUE_PAYLOADS,
+        args.number,
+        cold=True,
+    )
+    bench(
+        "parse_duckling_time_as_interval (interval, cold)",
+        parsing.parse_duckling_time_as_interval,
+        INTERVAL_PAYLOADS,
+        args.number,
+        cold=True,
+    )
+    bench("entity lookups", entity_lookups, MESSAGE_PAYLOADS, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Rows per second when seeding the sample transactions of new sessions.
+
+`orm` is the generator `ProfileDB.add_transactions` used before: it re-samples the
+amounts from Python lists of every cent value and adds one ORM `Transaction` per
+row. `vectorized` draws amounts and dates with NumPy and inserts them with Core
+`executemany` batches (`actions.database.synthetic`).
+
+    python -m benchmarks.populate_transactions --sessions 20
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from random import randrange, sample
+from typing import Callable, Text
+
+import numpy as np
+import sqlalchemy as sa
+from numpy import arange
+
+from actions.database.synthetic import (
+    HISTORY_START,
+    generate_transactions,
+    insert_transactions,
+)
+from actions.database.tables.account import Account
+from actions.database.tables.transaction.online import Transaction
+from actions.profile_db import GENERAL_ACCOUNTS, ProfileDB
+
+
+def orm_transactions(profile_db: ProfileDB, session_id: Text, rng: np.random.Generator):
+    _, account_number = profile_db.get_account_ids(session_id)
+    number_of_days = (datetime.now() - HISTORY_START).days
+    for counterparty in profile_db.session.query(Account).filter(
+        Account.session_id.startswith("vendor_")
+        | Account.session_id.startswith("depositor_")
+    ):
+        if counterparty.account_holder_name == "interest":
+            low, high, days_per_transaction = 5, 20, 30
+        elif counterparty.session_id.startswith("depositor_"):
+            low, high, days_per_transaction = 1000, 2000, 14
+        else:
+            low, high, days_per_transaction = 5, 50, 2
+        amounts = sample(
+            [round(amount, 2) for amount in list(arange(low, high, 0.01))],
+            number_of_days // days_per_transaction,
+        )
+        profile_db.session.add_all(
+            [
+                Transaction(
+                    from_account_number=account_number,
+                    to_account_number=profile_db.get_account_number(counterparty),
+                    amount=amount,
+                    timestamp=HISTORY_START + timedelta(days=randrange(number_of_days)),
+                )
+                for amount in amounts
+            ]
+        )
+    profile_db.session.flush()
+
+
+def vectorized_transactions(
+    profile_db: ProfileDB, session_id: Text, rng: np.random.Generator
+):
+    _, account_number = profile_db.get_account_ids(session_id)
+    counterparties = profile_db.session.query(Account).filter(
+        Account.session_id.startswith("vendor_")
+        | Account.session_id.startswith("depositor_")
+    )
+    rows, _ = generate_transactions(
+        rng,
+        account_number,
+        [
+            profile_db.get_account_number(account)
+            for account in counterparties
+            if account.session_id.startswith("vendor_")
+        ],
+        {
+            profile_db.get_account_number(account): account.account_holder_name
+            for account in counterparties
+            if account.session_id.startswith("depositor_")
+        },
+    )
+    insert_transactions(profile_db.session, rows)
+    profile_db.session.flush()
+
+
+def measure(
+    name: Text,
+    add_transactions: Callable[[ProfileDB, Text, np.random.Generator], None],
+    sessions: int,
+):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = sa.create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        profile_db = ProfileDB(engine)
+        profile_db.add_general_accounts(GENERAL_ACCOUNTS)
+        session_ids = [f"{name}_{i}" for i in range(sessions)]
+        for session_id in session_ids:
+            profile_db.add_session_account(session_id)
+        profile_db.session.commit()
+        rng = np.random.default_rng(0)
+
+        started = time.perf_counter()
+        for session_id in session_ids:
+            add_transactions(profile_db, session_id, rng)
+        profile_db.session.commit()
+        elapsed = time.perf_counter() - started
+
+        rows = profile_db.session.query(Transaction).count()
+        engine.dispose()
+    print(
+        f"{name:>10}: {rows} rows in {elapsed:6.2f} s, "
+        f"{rows / elapsed:9.0f} rows/sec, {elapsed / sessions * 1000:7.1f} ms/session"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sessions", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    measure("orm", orm_transactions, args.sessions)
+    measure("vectorized", vectorized_transactions, args.sessions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Concurrent-conversation throughput of the profile database.
+
+Simulates many conversations talking to the action server at once. Every
+conversation turn does what a form validation turn does: it reads the account
+balance, lists the credit cards and searches the transactions at a vendor.
+
+`sync` runs the turns against `ProfileDB` from inside coroutines, which blocks the
+event loop for every query (the behaviour before `AsyncProfileDB`). `async` awaits
+`AsyncProfileDB`, so other conversations make progress while a query runs.
+
+Besides throughput, a heartbeat task measures how long the event loop was stalled,
+which is the delay any other request (e.g. `/health`) sees while turns are running.
+
+    python -m benchmarks.profile_db_concurrency --conversations 16 --turns 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, List, Text
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from actions.async_profile_db import AsyncProfileDB, get_async_database_url
+from actions.database.pool import pool_options
+from actions.profile_db import ProfileDB
+
+HEARTBEAT_INTERVAL = 0.001
+
+
+def seed(profile_db: ProfileDB, session_ids: List[Text]):
+    for session_id in session_ids:
+        profile_db.populate_profile_db(session_id)
+
+
+async def sync_turn(profile_db: ProfileDB, session_id: Text):
+    profile_db.get_account_balance(session_id)
+    profile_db.list_credit_cards(session_id)
+    profile_db.search_transactions(session_id, vendor="amazon").all()
+
+
+async def async_turn(profile_db: AsyncProfileDB, session_id: Text):
+    await profile_db.get_account_balance(session_id)
+    await profile_db.list_credit_cards(session_id)
+    await profile_db.search_transactions(session_id, vendor="amazon")
+
+
+async def run_conversations(
+    turn: Callable[[Any, Text], Awaitable[None]],
+    profile_db: Any,
+    session_ids: List[Text],
+    turns: int,
+):
+    latencies: List[float] = []
+    stalls: List[float] = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            stalls.append(time.perf_counter() - started - HEARTBEAT_INTERVAL)
+
+    async def conversation(session_id: Text):
+        for _ in range(turns):
+            started = time.perf_counter()
+            await turn(profile_db, session_id)
+            latencies.append(time.perf_counter() - started)
+
+    heartbeat_task = asyncio.ensure_future(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*[conversation(session_id) for session_id in session_ids])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await heartbeat_task
+    return elapsed, latencies, stalls
+
+
+def report(mode: Text, elapsed: float, latencies: List[float], stalls: List[float]):
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(
+        f"{mode:>5}: {len(latencies) / elapsed:8.1f} turns/sec, "
+        f"turn p50 {statistics.median(latencies) * 1000:7.1f} ms, "
+        f"turn p95 {p95 * 1000:7.1f} ms, "
+        f"max loop stall {max(stalls) * 1000:7.1f} ms"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--conversations", type=int, default=16)
+    arg_parser.add_argument("--turns", type=int, default=10)
+    arg_parser.add_argument(
+        "--database-url",
+        help="database to benchmark against, defaults to a temporary sqlite file",
+    )
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = args.database_url or (
+            f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+        )
+        session_ids = [f"benchmark_{i}" for i in range(args.conversations)]
+
+        profile_db = ProfileDB(sa.create_engine(database_url))
+        seed(profile_db, session_ids)
+        async_profile_db = AsyncProfileDB(
+            create_async_engine(
+                get_async_database_url(database_url),
+                **pool_options(database_url),
+            )
+        )
+
+        report(
+            "sync",
+            *asyncio.run(
+                run_conversations(sync_turn, profile_db, session_ids, args.turns)
+            ),
+        )
+        report(
+            "async",
+            *asyncio.run(
+                run_conversations(async_turn, async_profile_db, session_ids, args.turns)
+            ),
+        )
+        print(f"async pool: {async_profile_db.pool_metrics.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
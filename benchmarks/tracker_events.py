@@ -0,0 +1,75 @@
+"""Carrying slots over at session start, on trackers with long histories.
+
+Builds synthetic trackers with `--events` events: turns of user messages, action
+executions and slot sets, with the `currency` slot changed every few turns.
+`scan` is the walk over every event that `ActionSessionStart` used to do and
+`summary` summarizes the whole history, as `ActionSessionStart` does now.
+
+    python -m benchmarks.tracker_events --events 10000
+"""
+import argparse
+import timeit
+from typing import Any, Dict, List, Text
+
+from rasa_sdk import Tracker
+from rasa_sdk.events import ActionExecuted, SlotSet, UserUttered
+
+from actions.tracker_summary import TrackerSummary
+
+CURRENCIES = ["$", "EUR", "GBP", "CNY"]
+
+
+def turn(i: int) -> List[Dict[Text, Any]]:
+    events = [
+        UserUttered(f"message {i}", {"name": "inform"}, timestamp=i),
+        ActionExecuted("action_listen", timestamp=i),
+        SlotSet("amount-of-money", i, timestamp=i),
+    ]
+    if i % 5 == 0:
+        events.append(SlotSet("currency", CURRENCIES[i % 4], timestamp=i))
+    else:
+        events.append(ActionExecuted("utter_ok", timestamp=i))
+    return events
+
+
+def synthetic_events(count: int) -> List[Dict[Text, Any]]:
+    events = []
+    i = 0
+    while len(events) < count:
+        events.extend(turn(i))
+        i += 1
+    return events
+
+
+def tracker_with_events(events: List[Dict[Text, Any]]) -> Tracker:
+    return Tracker("bench", {}, {}, events, False, None, {}, "")
+
+
+def scan(tracker: Tracker) -> List[Dict[Text, Any]]:
+    return [
+        SlotSet(key=event.get("name"), value=event.get("value"))
+        for event in tracker.events
+        if event.get("event") == "slot" and event.get("name") in ["currency"]
+    ]
+
+
+def bench(name: Text, fn, number: int):
+    seconds = timeit.timeit(fn, number=number)
+    print(f"{name:>22}: {seconds / number * 1e6:10.1f} us/call")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--events", type=int, default=10000)
+    arg_parser.add_argument("--number", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    events = synthetic_events(args.events)
+    tracker = tracker_with_events(events)
+    print(f"{len(events)} events")
+    bench("scan", lambda: scan(tracker), args.number)
+    bench("summary", lambda: TrackerSummary(tracker.events), args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Time-range summaries from daily rollups vs. from the raw transactions.
+
+Seeds sessions with the sample history, plus `--transactions-per-day` extra
+purchases at amazon every day for busier accounts, then answers "how much did I
+spend (at a vendor) in <year>" for every year of the history. `raw` aggregates the
+transactions in the range, `rollups` is `summarize_transactions`, which reads the
+whole days from `transaction_rollups` and only the partial edge days from the
+transactions.
+
+    python -m benchmarks.transaction_rollups --sessions 5 --transactions-per-day 20
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Text
+
+import numpy as np
+import sqlalchemy as sa
+
+from actions.database.synthetic import HISTORY_START, insert_transactions
+from actions.profile_db import ProfileDB
+
+# duckling's "last year" style interval, with a partial day at the end
+YEARS = [2019, 2020, 2021]
+
+
+def add_daily_purchases(profile_db: ProfileDB, session_id: Text, per_day: int):
+    """`per_day` purchases at amazon on every day of the history"""
+    rng = np.random.default_rng()
+    _, account_number = profile_db.get_account_ids(session_id)
+    _, amazon = profile_db.find_vendor("amazon")
+    days = (datetime.now() - HISTORY_START).days
+    seconds = rng.integers(days * 86400, size=days * per_day)
+    rows = [
+        {
+            "from_account_number": account_number,
+            "to_account_number": amazon,
+            "amount": amount,
+            "timestamp": HISTORY_START + timedelta(seconds=second),
+        }
+        for amount, second in zip(
+            np.round(rng.uniform(1, 50, size=len(seconds)), 2).tolist(),
+            seconds.tolist(),
+        )
+    ]
+    insert_transactions(profile_db.session, rows)
+    profile_db.update_balances({account_number: -sum(row["amount"] for row in rows)})
+    profile_db.update_rollups(rows)
+    profile_db.session.commit()
+
+
+def run(name: Text, summarize: Callable, session_ids: List[Text], repeat: int):
+    started = time.perf_counter()
+    searches = 0
+    for _ in range(repeat):
+        for session_id in session_ids:
+            for year in YEARS:
+                for vendor in [None, "amazon"]:
+                    summarize(
+                        session_id,
+                        datetime(year, 1, 1),
+                        datetime(year + 1, 1, 1),
+                        vendor=vendor,
+                    )
+                    searches += 1
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:>8}: {searches / elapsed:8.1f} searches/sec, "
+        f"{elapsed / searches * 1000:6.2f} ms/search"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sessions", type=int, default=5)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--transactions-per-day", type=int, default=0)
+    arg_parser.add_argument(
+        "--database-url",
+        help="database to run against, a temporary sqlite database by default",
+    )
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = (
+            args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        )
+        profile_db = ProfileDB(sa.create_engine(database_url))
+        session_ids = [f"rollups_{i}_{time.time()}" for i in range(args.sessions)]
+        started = time.perf_counter()
+        for session_id in session_ids:
+            profile_db.populate_profile_db(session_id)
+            if args.transactions_per_day:
+                add_daily_purchases(profile_db, session_id, args.transactions_per_day)
+        print(
+            f"seeded {args.sessions} session(s) in "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+
+        def raw(session_id, start_time, end_time, vendor):
+            return profile_db.session.execute(
+                profile_db.select_transactions_summary(
+                    session_id, start_time, end_time, vendor=vendor
+                )
+            ).all()
+
+        run("raw", raw, session_ids, args.repeat)
+        run("rollups", profile_db.summarize_transactions, session_ids, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Many parallel transfers out of one account.
+
+The account is funded with enough money for a fraction of the transfers, then all
+transfers are started at once.
+
+`check-then-write` is the flow before transfers were atomic: read the balance (as
+the form validation does), then write the transfer without a check. Transfers
+that read the balance before the others wrote it overdraw the account.
+`atomic` uses `transact(..., check_balance=True)`, which checks and debits the
+balance in one statement, so exactly the funded transfers succeed.
+
+    python -m benchmarks.transfer_contention --transfers 100 --funded 30
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Text
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from actions.async_profile_db import AsyncProfileDB, get_async_database_url
+from actions.database.pool import pool_options
+from actions.profile_db import InsufficientFundsError, ProfileDB
+
+AMOUNT = 10.0
+
+
+async def check_then_write(
+    profile_db: AsyncProfileDB, session_id: Text, from_number: Text, to_number: Text
+) -> bool:
+    if await profile_db.get_account_balance(session_id) < AMOUNT:
+        return False
+    await profile_db.transact(from_number, to_number, AMOUNT)
+    return True
+
+
+async def atomic(
+    profile_db: AsyncProfileDB, session_id: Text, from_number: Text, to_number: Text
+) -> bool:
+    try:
+        await profile_db.transact(from_number, to_number, AMOUNT, check_balance=True)
+        return True
+    except InsufficientFundsError:
+        return False
+
+
+async def run(name: Text, transfer, database_url: Text, transfers: int, funded: int):
+    profile_db = AsyncProfileDB(
+        create_async_engine(
+            get_async_database_url(database_url), **pool_options(database_url)
+        )
+    )
+    session_id = f"contention_{name}_{time.time()}"
+    _, from_number = await profile_db.get_account_ids(session_id)
+    _, to_number = await profile_db.get_account_ids(f"{session_id}_recipient")
+    await profile_db.transact(to_number, from_number, funded * AMOUNT)
+
+    async def one_transfer():
+        try:
+            return await transfer(profile_db, session_id, from_number, to_number)
+        except sa.exc.OperationalError:
+            # e.g. sqlite's "database is locked" after the busy timeout
+            return None
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[one_transfer() for _ in range(transfers)])
+    elapsed = time.perf_counter() - started
+    balance = await profile_db.get_account_balance(session_id)
+    await profile_db.engine.dispose()
+
+    print(
+        f"{name:>16}: {transfers / elapsed:7.1f} transfers/sec, "
+        f"{results.count(True):4d} succeeded, {results.count(False):4d} rejected, "
+        f"{results.count(None):4d} errors, final balance {balance:9.2f}"
+        + ("  OVERDRAWN" if balance < 0 else "")
+    )
+
+
+async def main_async(database_url: Text, transfers: int, funded: int):
+    await run("check-then-write", check_then_write, database_url, transfers, funded)
+    await run("atomic", atomic, database_url, transfers, funded)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--transfers", type=int, default=100)
+    arg_parser.add_argument("--funded", type=int, default=30)
+    arg_parser.add_argument(
+        "--database-url",
+        help="database to run against, a temporary sqlite database by default",
+    )
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = (
+            args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        )
+        ProfileDB(sa.create_engine(database_url))
+        asyncio.run(main_async(database_url, args.transfers, args.funded))
+
+
+if __name__ == "__main__":
+    main()
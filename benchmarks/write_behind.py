@@ -0,0 +1,90 @@
+"""Throughput of bursts of transfers, with and without write-behind.
+
+`commit-per-write` awaits `AsyncProfileDB.transact`, which commits every
+transfer on its own. `write-behind` queues the transfers and commits them in
+group commits, then waits for the queue to be flushed, so both modes are timed
+until every transfer is committed. Transfers that fail (e.g. sqlite's "database is
+locked") are counted as errors.
+
+    python -m benchmarks.write_behind --transfers 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Text
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from actions.async_profile_db import AsyncProfileDB, get_async_database_url
+from actions.database.pool import pool_options
+from actions.profile_db import ProfileDB
+
+
+async def run(name: Text, database_url: Text, transfers: int, concurrency: int):
+    profile_db = AsyncProfileDB(
+        create_async_engine(
+            get_async_database_url(database_url), **pool_options(database_url)
+        ),
+        write_behind=name == "write-behind",
+    )
+    session_id = f"write_behind_{name}_{time.time()}"
+    _, from_number = await profile_db.get_account_ids(session_id)
+    _, to_number = await profile_db.get_account_ids(f"{session_id}_recipient")
+
+    errors = 0
+
+    async def sender(count: int):
+        nonlocal errors
+        for _ in range(count):
+            try:
+                await profile_db.transact(from_number, to_number, 1.0)
+            except sa.exc.OperationalError:
+                # e.g. sqlite's "database is locked" after the busy timeout
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[sender(transfers // concurrency) for _ in range(concurrency)]
+    )
+    if profile_db.write_behind:
+        await profile_db.write_behind.flush()
+    elapsed = time.perf_counter() - started
+    balance = await profile_db.get_account_balance(session_id)
+    await profile_db.engine.dispose()
+
+    print(
+        f"{name:>16}: {transfers / elapsed:8.1f} transfers/sec, "
+        f"{errors:4d} errors, final balance {balance:9.2f}"
+    )
+    if profile_db.write_behind:
+        print(f"{'':>16}  {profile_db.write_behind.snapshot()}")
+
+
+async def main_async(database_url: Text, transfers: int, concurrency: int):
+    await run("commit-per-write", database_url, transfers, concurrency)
+    await run("write-behind", database_url, transfers, concurrency)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--transfers", type=int, default=2000)
+    arg_parser.add_argument("--concurrency", type=int, default=50)
+    arg_parser.add_argument(
+        "--database-url",
+        help="database to run against, a temporary sqlite database by default",
+    )
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = (
+            args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        )
+        ProfileDB(sa.create_engine(database_url))
+        asyncio.run(main_async(database_url, args.transfers, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
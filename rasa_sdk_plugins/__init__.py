@@ -0,0 +1,99 @@
+"""Extensions of the action server, found by `rasa_sdk.plugin` when this package is
+importable (it is when the action server runs from the project root, and in the
+action server image).
+
+Every call of `/webhook` is timed as the `run` of the action it names, the form
+validation actions of the `actions` package are instrumented for the slots of the
+domain that comes with the calls, and the metrics of
+`actions.instrumentation` are served at `/metrics`, next to `/health`. The health
+checks of the handoff hosts start and stop with the server.
+"""
+import asyncio
+import json
+import zlib
+from typing import Any, Dict, Optional, Set, Text
+
+import pluggy
+from sanic import Sanic, response
+from sanic.request import Request
+
+from actions import instrumentation
+from actions.database.provider import get_profile_db
+from actions.handoff_health import handoff_health
+
+hookimpl = pluggy.HookimplMarker("rasa_sdk")
+
+
+# slots of the domain whose form validation methods are instrumented
+instrumented_slots: Set[Text] = set()
+
+
+def action_call(request: Request) -> Optional[Dict[Text, Any]]:
+    try:
+        if request.headers.get("Content-Encoding") == "deflate":
+            return json.loads(zlib.decompress(request.body))
+        # parsed once, `request.json` is kept for the webhook
+        return request.json
+    except Exception:
+        # the webhook answers invalid requests
+        return None
+
+
+def instrument_slots(domain: Optional[Dict[Text, Any]]):
+    """Instrument the form validation methods of the slots of `domain` that are not
+    instrumented yet. Rasa sends the domain with the action calls."""
+    slot_names = set((domain or {}).get("slots") or {}) - instrumented_slots
+    if slot_names:
+        instrumentation.instrument_actions(slot_names)
+        instrumented_slots.update(slot_names)
+
+
+async def begin_action_call(request: Request):
+    if request.path == "/webhook" and request.method == "POST":
+        call = action_call(request)
+        name = call and call.get("next_action")
+        if name:
+            instrument_slots(call.get("domain"))
+            request.ctx.action_call = instrumentation.action_metrics.begin(name, "run")
+
+
+async def end_action_call(request: Request, response: response.HTTPResponse):
+    call = getattr(request.ctx, "action_call", None)
+    if call is not None:
+        request.ctx.action_call = None
+        instrumentation.action_metrics.end(
+            call,
+            failed=response.status >= 500,
+            # no such action
+            discard=response.status == 404,
+        )
+
+
+async def metrics(request: Request) -> response.HTTPResponse:
+    return response.text(
+        instrumentation.render_metrics(get_profile_db(), handoff_health),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+async def start_handoff_health(app: Sanic, loop: asyncio.AbstractEventLoop):
+    handoff_health.start()
+
+
+async def stop_handoff_health(app: Sanic, loop: asyncio.AbstractEventLoop):
+    await handoff_health.close()
+
+
+class ActionServerMetrics:
+    @hookimpl
+    def attach_sanic_app_extensions(self, app: Sanic):
+        instrumentation.action_metrics.listen()
+        app.register_middleware(begin_action_call, "request")
+        app.register_middleware(end_action_call, "response")
+        app.add_route(metrics, "/metrics", methods=["GET"])
+        app.register_listener(start_handoff_health, "after_server_start")
+        app.register_listener(stop_handoff_health, "before_server_stop")
+
+
+def init_hooks(manager: pluggy.PluginManager):
+    manager.register(ActionServerMetrics())
@@ -25,6 +25,8 @@ sys.argv.append('5056')
 sys.argv.append('--debug')
 
 if __name__ == '__main__':
+    from actions.database.provider import migrate
     from rasa.__main__ import main
 
+    migrate()
     main()
@@ -2,11 +2,18 @@ import os
 from pathlib import Path
 import pytest
 import json
+import tempfile
 import sqlalchemy as sa
 
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk import Tracker
 
+# the tests work on a database of their own, not on the profile.db of the project
+TEST_DB_DIR = tempfile.TemporaryDirectory(prefix="profile_db_")
+os.environ.setdefault("PROFILE_DB_URL", f"sqlite:///{TEST_DB_DIR.name}/profile.db")
+
+from actions.database.provider import migrate  # noqa: E402
+
 here = Path(__file__).parent.resolve()
 
 EMPTY_TRACKER = Tracker.from_dict(json.load(open(here / "./data/empty_tracker.json")))
@@ -19,6 +26,13 @@ PAY_CC_CONFIRMED = Tracker.from_dict(
 DATABASE_URL = os.environ.setdefault("DATABASE_URL", "postgresql:///postgres")
 
 
+@pytest.fixture(scope="session", autouse=True)
+def profile_db_tables():
+    migrate()
+    yield
+    TEST_DB_DIR.cleanup()
+
+
 @pytest.fixture
 def dispatcher():
     return CollectingDispatcher()
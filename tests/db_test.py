@@ -1,12 +1,35 @@
+import asyncio
+import csv
+from datetime import datetime, timedelta
+import json
 import os
 import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+import numpy as np
 import pytest
+import pytest_asyncio
+
+from actions.async_profile_db import AsyncProfileDB, get_async_database_url
+from actions.database.offline_import import (
+    AccountResolver,
+    import_offline_transactions,
+    read_rows,
+)
+from actions.database.recipients import RecipientIndex
+from actions.database.synthetic import generate_transactions
+from actions.database.vendors import VendorRegistry
 
 from actions.profile_db import (
     GENERAL_ACCOUNTS,
     create_database,
     ProfileDB,
     Account,
+    AccountBalance,
+    CreditCard,
+    CurrencyAccount,
+    InsufficientFundsError,
+    OfflineTransaction,
+    TransactionRollup,
 )
 
 PROFILE_DB_NAME = os.environ.get("PROFILE_DB_NAME", "profile")
@@ -37,6 +60,35 @@ account_balance_now = profile_db.get_account_balance(session_id)
 credit_cards = profile_db.list_credit_cards(session_id)
 balance_types = profile_db.list_balance_types()
 
+async_profile_db = AsyncProfileDB(
+    create_async_engine(get_async_database_url(PROFILE_DB_URL))
+)
+
+
+@pytest.fixture
+def tmp_profile_db(tmp_path):
+    """A `ProfileDB` of its own with only the general accounts, for tests that add
+    sessions, vendors or transactions"""
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/profile.db")
+    tmp_db = ProfileDB(engine)
+    tmp_db.add_general_accounts(GENERAL_ACCOUNTS)
+    yield tmp_db
+    tmp_db.session.close()
+    engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def tmp_async_profile_db(tmp_profile_db):
+    """An `AsyncProfileDB` on the database of `tmp_profile_db`"""
+    tmp_db = AsyncProfileDB(
+        create_async_engine(get_async_database_url(str(tmp_profile_db.engine.url)))
+    )
+    yield tmp_db
+    await tmp_db.engine.dispose()
+    if tmp_db.executor is not None:
+        tmp_db.executor.shutdown()
+        tmp_db.sync_engine.dispose()
+
 
 def test_profile_initialization():
     assert profile_db.check_session_id_exists(session_id)
@@ -78,3 +130,563 @@ def test_cc_payment_2():
         session_id, credit_card_name, balance_type
     )
     assert credit_card_balance_now == 0
+
+
+def test_balance_ledger_matches_transactions():
+    assert profile_db.reconcile_balances(fix=False) == {}
+    assert profile_db.get_account_balance(session_id) == pytest.approx(
+        profile_db.compute_balances()[account_number]
+    )
+
+
+def test_populate_profile_db_is_reproducible(tmp_path):
+    histories = []
+    for name in ["first", "second"]:
+        seeded_db = ProfileDB(sa.create_engine(f"sqlite:///{tmp_path}/{name}.db"))
+        seeded_db.populate_profile_db("seeded", np.random.default_rng(7))
+        histories.append(
+            (
+                seeded_db.list_known_recipients("seeded"),
+                [
+                    (card.credit_card_name, card.current_balance)
+                    for card in seeded_db.session.query(CreditCard).order_by(
+                        CreditCard.id
+                    )
+                ],
+            )
+        )
+        seeded_db.session.close()
+        seeded_db.engine.dispose()
+    assert histories[0] == histories[1]
+
+
+def test_create_tables_rebuilds_an_empty_ledger(tmp_path):
+    empty_ledger_db = ProfileDB(sa.create_engine(f"sqlite:///{tmp_path}/ledger.db"))
+    empty_ledger_db.create_tables()
+    empty_ledger_db.populate_profile_db("ledger")
+    empty_ledger_db.session.query(AccountBalance).delete()
+    empty_ledger_db.session.commit()
+
+    # the ledger exists, but is empty while there are transactions
+    empty_ledger_db.create_tables()
+    assert empty_ledger_db.session.query(AccountBalance).count()
+    assert empty_ledger_db.reconcile_balances(fix=False) == {}
+    empty_ledger_db.session.close()
+    empty_ledger_db.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_async_profile_db_matches_sync():
+    async_account_balance = await async_profile_db.get_account_balance(session_id)
+    assert async_account_balance == pytest.approx(
+        profile_db.get_account_balance(session_id)
+    )
+    assert await async_profile_db.list_credit_cards(session_id) == credit_cards
+    assert await async_profile_db.list_known_recipients(session_id) == recipient_names
+
+
+@pytest.mark.asyncio
+async def test_async_profile_db_session_per_invocation():
+    async def invocation():
+        await async_profile_db.list_credit_cards(session_id)
+        return async_profile_db.get_session()
+
+    first, second = await asyncio.gather(invocation(), invocation())
+    assert first is not second
+    assert async_profile_db.pool_metrics.snapshot()["checked_out"] == 0
+
+
+def test_account_ids_cached():
+    stats = profile_db.account_cache.stats()
+    assert profile_db.get_account_ids(session_id) == (account.id, account_number)
+    assert profile_db.account_cache.stats()["invocation_hits"] == (
+        stats["invocation_hits"] + 1
+    )
+    assert profile_db.account_cache.stats()["misses"] == stats["misses"]
+
+    # the cache of the session is bounded, the sync session is never removed
+    invocation_cache = profile_db.invocation_account_cache()
+    for i in range(invocation_cache.max_size + 1):
+        invocation_cache.put(f"sender_{i}", (i, str(i)))
+    assert len(invocation_cache.entries) == invocation_cache.max_size
+
+
+def query_plan(query) -> str:
+    """The database's plan for an ORM `query`, as one string"""
+    compiled = query.statement.compile(ENGINE)
+    params = (
+        tuple(compiled.params[name] for name in compiled.positiontup)
+        if compiled.positional
+        else compiled.params
+    )
+    with ENGINE.connect() as connection:
+        if ENGINE.dialect.name == "sqlite":
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+            return "\n".join(row[-1] for row in rows)
+        # the test tables are small enough for postgres to prefer a sequential scan
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params)
+        return "\n".join(row[0] for row in rows)
+
+
+def test_transaction_search_uses_indexes():
+    end_time = datetime.now()
+    start_time = end_time - timedelta(days=30)
+    spend = profile_db.search_transactions(session_id, start_time, end_time)
+    deposit = profile_db.search_transactions(
+        session_id, start_time, end_time, deposit=True
+    )
+    assert "ix_transactions_from_account_timestamp" in query_plan(spend)
+    assert "ix_offline_transactions_from_account_timestamp" in query_plan(spend)
+    assert "ix_transactions_to_account_timestamp" in query_plan(deposit)
+    assert "ix_offline_transactions_to_account_timestamp" in query_plan(deposit)
+
+
+def test_account_lookups_use_indexes():
+    by_session_id = profile_db.session.query(Account.id).filter(
+        Account.session_id == session_id
+    )
+    by_name = profile_db.session.query(Account.id).filter(
+        Account.account_holder_name == recipient_name
+    )
+    assert "ix_account_session_id" in query_plan(by_session_id)
+    assert "ix_account_account_holder_name" in query_plan(by_name)
+
+
+@pytest.mark.parametrize("deposit", [False, True])
+def test_summarize_transactions(deposit):
+    amounts = [
+        transaction.amount
+        for transaction in profile_db.search_transactions(session_id, deposit=deposit)
+    ]
+    summary = profile_db.summarize_transactions(session_id, deposit=deposit)
+    assert summary["total"] == pytest.approx(sum(amounts))
+    assert summary["count"] == len(amounts)
+    assert summary["min"] == min(amounts, default=None)
+    assert summary["max"] == max(amounts, default=None)
+
+    for grain in ["day", "week", "month", "quarter"]:
+        by_grain = profile_db.summarize_transactions(
+            session_id, deposit=deposit, grain=grain
+        )
+        assert by_grain["total"] == pytest.approx(summary["total"])
+        assert by_grain["count"] == summary["count"]
+        assert sum(row["count"] for row in by_grain["breakdown"]) == len(amounts)
+
+
+def test_generate_transactions_reproducible():
+    # not the number of any account, e.g. `account_number`
+    vendors = ["900000000001", "900000000002"]
+    depositors = {"900000000003": "interest", "900000000004": "employer"}
+    end_date = datetime(2020, 1, 1)
+
+    rows, balance_deltas = generate_transactions(
+        np.random.default_rng(42), account_number, vendors, depositors, end_date
+    )
+    assert (rows, balance_deltas) == generate_transactions(
+        np.random.default_rng(42), account_number, vendors, depositors, end_date
+    )
+    assert len(rows) == 2 * (365 // 2) + 365 // 30 + 365 // 14
+    assert balance_deltas[account_number] == pytest.approx(
+        sum(
+            row["amount"]
+            if row["to_account_number"] == account_number
+            else -row["amount"]
+            for row in rows
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_session_provisioned_in_background(tmp_async_profile_db):
+    new_session_id = "provisioning"
+    account_ids = await tmp_async_profile_db.provisioning.start(new_session_id)
+    assert account_ids == await tmp_async_profile_db.get_account_ids(new_session_id)
+
+    # reads of the history wait for the background worker
+    assert len(await tmp_async_profile_db.list_credit_cards(new_session_id)) == 4
+    assert await tmp_async_profile_db.check_session_history_exists(new_session_id)
+    assert await tmp_async_profile_db.get_account_balance(new_session_id) != 0
+
+    snapshot = tmp_async_profile_db.provisioning.snapshot()
+    assert snapshot["pending"] == 0
+    assert snapshot["provisioned"] == 1
+    assert snapshot["failed"] == 0
+
+
+def test_credit_card_overview():
+    overview = profile_db.get_credit_card_overview(session_id)
+    assert list(overview) == credit_cards
+    for credit_card_name, balances in overview.items():
+        for balance_type in balance_types:
+            assert balances["_".join(balance_type.split())] == (
+                profile_db.get_credit_card_balance(
+                    session_id, credit_card_name, balance_type
+                )
+            )
+
+
+def test_currency_accounts():
+    credit_card_name = credit_cards[0]
+    if not profile_db.check_curr_account_exists(session_id, credit_card_name, "EUR"):
+        profile_db.creat_curr_acc(session_id, credit_card_name.title(), "EUR")
+
+    assert (credit_card_name, "EUR", 0) in profile_db.list_curr_accounts_balances(
+        session_id
+    )
+    assert profile_db.check_curr_account_exists(
+        session_id, credit_card_name.title(), "EUR"
+    )
+    assert not profile_db.check_curr_account_exists(session_id, credit_card_name, "CNY")
+
+
+def test_fx_convert():
+    rates = profile_db.get_fx_rates(["USD", "eur", "£"])
+    assert rates["USD"] == 1.0
+    converted = profile_db.convert([100, 100, 100], ["USD", "EUR", "GBP"], "$")
+    assert converted.tolist() == [100.0, round(100 * rates["EUR"], 2), 127.0]
+    assert profile_db.convert([100], "USD", "USD").tolist() == [100.0]
+
+    stats = profile_db.fx_rate_cache.stats()
+    profile_db.get_fx_rates(["EUR", "GBP"])
+    assert profile_db.fx_rate_cache.stats()["hits"] == stats["hits"] + 2
+
+    with pytest.raises(ValueError):
+        profile_db.get_fx_rates(["XXX"])
+
+
+def test_transfer_between_currency_accounts():
+    credit_card_name = credit_cards[1]
+    for currency in ["USD", "EUR"]:
+        if not profile_db.check_curr_account_exists(
+            session_id, credit_card_name, currency
+        ):
+            profile_db.creat_curr_acc(session_id, credit_card_name, currency)
+    usd_account = (
+        profile_db.session.query(CurrencyAccount)
+        .filter(CurrencyAccount.currency == "USD")
+        .join(CreditCard, CurrencyAccount.card_id == CreditCard.id)
+        .filter(CreditCard.account_id == account.id)
+        .filter(CreditCard.credit_card_name == credit_card_name)
+        .one()
+    )
+    usd_account.balance = 108
+    profile_db.session.commit()
+
+    credited = profile_db.transfer_between_currency_accounts(
+        session_id, credit_card_name, "USD", "EUR", 108
+    )
+    assert credited == 100.0
+    balances = {
+        (name, currency): (balance, converted)
+        for name, currency, balance, converted in profile_db.list_curr_accounts_in_currency(
+            session_id
+        )
+    }
+    assert balances[(credit_card_name, "USD")] == (0, 0)
+    eur_balance, eur_in_usd = balances[(credit_card_name, "EUR")]
+    assert eur_in_usd == pytest.approx(
+        eur_balance * profile_db.get_fx_rates(["EUR"])["EUR"], abs=0.01
+    )
+    with pytest.raises(InsufficientFundsError):
+        profile_db.transfer_between_currency_accounts(
+            session_id, credit_card_name, "USD", "EUR", 1
+        )
+    for amount in [-100, 0]:
+        with pytest.raises(ValueError):
+            profile_db.transfer_between_currency_accounts(
+                session_id, credit_card_name, "USD", "EUR", amount
+            )
+    assert (credit_card_name, "USD", 0) in profile_db.list_curr_accounts_balances(
+        session_id
+    )
+
+
+def test_vendor_registry():
+    assert set(GENERAL_ACCOUNTS["vendor"]) <= set(profile_db.list_vendors())
+    name, vendor_account_number = profile_db.find_vendor("Amazon")
+    assert name == "amazon"
+    assert profile_db.find_vendor("starb") == profile_db.find_vendor("starbucks")
+    assert profile_db.find_vendor("targte")[0] == "target"
+    assert profile_db.find_vendor("unknown vendor") is None
+
+    amazon_transactions = profile_db.search_transactions(session_id, vendor="AMAZON")
+    assert {t.to_account_number for t in amazon_transactions} == {vendor_account_number}
+    assert "ix_account_is_vendor_account_holder_name" in query_plan(
+        profile_db.get_vendors().filter(Account.account_holder_name == "amazon")
+    )
+
+
+def test_vendor_registry_version(tmp_profile_db):
+    # a second action server worker, with its own registry
+    other_worker = ProfileDB.from_session(
+        tmp_profile_db.get_session(), vendor_registry=VendorRegistry(check_interval=0)
+    )
+    loads = other_worker.list_vendors() and other_worker.vendor_registry.loads
+
+    vendor_name = "vendor registry test"
+    tmp_profile_db.add_vendor(vendor_name)
+    assert vendor_name in tmp_profile_db.list_vendors()
+    assert vendor_name in other_worker.list_vendors()
+    assert other_worker.vendor_registry.loads == loads + 1
+
+
+def test_recipient_index():
+    full_name = recipient_names[0]
+    first_name = full_name.split()[0]
+    expected = (full_name, recipient_account_number)
+    assert profile_db.find_recipient(session_id, full_name.title()) == expected
+    assert profile_db.find_recipient(session_id, first_name) == expected
+    assert profile_db.find_recipient(session_id, full_name[:-1]) == expected
+    assert profile_db.find_recipient(session_id, "nobody at all") is None
+
+    stats = profile_db.recipient_cache.stats()
+    profile_db.find_recipient(session_id, first_name)
+    assert profile_db.recipient_cache.stats()["hits"] == stats["hits"] + 1
+
+
+def test_recipient_index_fuzzy():
+    index = RecipientIndex(
+        [("katy parrow", "000000000001"), ("karen lancaster", "000000000002")]
+    )
+    assert index.find("Katy Parow") == ("katy parrow", "000000000001")
+    assert index.find("karne") == ("karen lancaster", "000000000002")
+    assert index.find("kyle") is None
+
+
+def test_transact_insufficient_funds():
+    balance = profile_db.get_account_balance(session_id)
+    with pytest.raises(InsufficientFundsError):
+        profile_db.transact(
+            account_number, recipient_account_number, balance + 1, check_balance=True
+        )
+    assert profile_db.get_account_balance(session_id) == pytest.approx(balance)
+    assert profile_db.reconcile_balances(fix=False) == {}
+
+
+def test_transact_updates_balances_in_account_number_order(tmp_profile_db):
+    _, low = tmp_profile_db.get_account_ids("low")
+    _, high = tmp_profile_db.get_account_ids("high")
+    _, bank = tmp_profile_db.get_account_ids("bank")
+    tmp_profile_db.transact(bank, low, 50)
+    tmp_profile_db.transact(bank, high, 50)
+    updated = []
+
+    def on_update(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE account_balances"):
+            updated.append(next(p for p in parameters if p in [low, high]))
+
+    sa.event.listen(tmp_profile_db.engine, "before_cursor_execute", on_update)
+    for from_number, to_number in [(high, low), (low, high)]:
+        updated.clear()
+        tmp_profile_db.transact(from_number, to_number, 10, check_balance=True)
+        assert updated == sorted([low, high])
+    # a debit that fails after the credit leaves no trace
+    with pytest.raises(InsufficientFundsError):
+        tmp_profile_db.transact(high, low, 1000, check_balance=True)
+    assert tmp_profile_db.reconcile_balances(fix=False) == {}
+    sa.event.remove(tmp_profile_db.engine, "before_cursor_execute", on_update)
+
+
+@pytest.mark.parametrize("amount", [-500, 0, float("nan")])
+def test_transact_rejects_non_positive_amounts(amount):
+    balance = profile_db.get_account_balance(session_id)
+    with pytest.raises(ValueError):
+        profile_db.transact(
+            account_number, recipient_account_number, amount, check_balance=True
+        )
+    assert profile_db.get_account_balance(session_id) == pytest.approx(balance)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_transfers_do_not_overdraw(tmp_async_profile_db):
+    _, sender_account_number = await tmp_async_profile_db.get_account_ids("sender")
+    _, recipient_number = await tmp_async_profile_db.get_account_ids("recipient")
+    await tmp_async_profile_db.transact(recipient_number, sender_account_number, 100)
+
+    async def transfer():
+        try:
+            await tmp_async_profile_db.transact(
+                sender_account_number, recipient_number, 30, check_balance=True
+            )
+            return True
+        except InsufficientFundsError:
+            return False
+
+    results = await asyncio.gather(*[transfer() for _ in range(10)])
+    assert results.count(True) == 3
+    assert await tmp_async_profile_db.get_account_balance("sender") == pytest.approx(10)
+
+
+@pytest.mark.asyncio
+async def test_write_behind_batches_transfers(tmp_profile_db):
+    write_behind_db = AsyncProfileDB(
+        create_async_engine(get_async_database_url(str(tmp_profile_db.engine.url))),
+        write_behind=True,
+    )
+    sender = "sender"
+    _, sender_account_number = await write_behind_db.get_account_ids(sender)
+    _, recipient_account_number = await write_behind_db.get_account_ids("recipient")
+    await write_behind_db.transact(
+        recipient_account_number, sender_account_number, 100, durable=True
+    )
+
+    for _ in range(20):
+        await write_behind_db.transact(
+            sender_account_number, recipient_account_number, 1
+        )
+    await write_behind_db.write_behind.flush()
+    assert await write_behind_db.get_account_balance(sender) == pytest.approx(80)
+
+    # a failing write fails on its own, and is raised to durable callers
+    with pytest.raises(InsufficientFundsError):
+        await asyncio.gather(
+            write_behind_db.transact(
+                sender_account_number,
+                recipient_account_number,
+                1000,
+                check_balance=True,
+                durable=True,
+            ),
+            write_behind_db.transact(
+                sender_account_number, recipient_account_number, 10, durable=True
+            ),
+        )
+    await write_behind_db.write_behind.flush()
+    assert await write_behind_db.get_account_balance(sender) == pytest.approx(70)
+    assert await write_behind_db.reconcile_balances(fix=False) == {}
+
+    snapshot = write_behind_db.write_behind.snapshot()
+    assert snapshot["writes"] == 23
+    assert snapshot["batches"] < snapshot["writes"]
+    assert snapshot["failed"] == 1
+    await write_behind_db.engine.dispose()
+
+
+@pytest.mark.parametrize("file_format", ["csv", "jsonl"])
+def test_import_offline_transactions(tmp_path, file_format):
+    rows = [
+        {"session_id": session_id, "vendor": "Starbucks", "amount": "4.5"},
+        {"session_id": session_id, "vendor": "starbucks", "amount": "2"},
+        {"vendor": "amazon", "amount": "10", "timestamp": "2021-03-01T08:30:00"},
+        {"session_id": session_id, "vendor": "nowhere", "amount": "1"},
+        {"session_id": session_id, "vendor": "amazon", "amount": "lots"},
+        {"session_id": session_id, "vendor": "amazon", "amount": "nan"},
+        {"session_id": session_id, "vendor": "amazon", "amount": "inf"},
+        {"session_id": session_id, "vendor": "amazon", "amount": "0"},
+        {"session_id": session_id, "vendor": "amazon", "amount": "-3"},
+    ]
+    path = tmp_path / f"statement.{file_format}"
+    with open(path, "w", newline="") as f:
+        if file_format == "csv":
+            writer = csv.DictWriter(f, ["session_id", "vendor", "amount", "timestamp"])
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+            f.write("{not json\n")
+
+    before = profile_db.session.query(OfflineTransaction).count()
+    report = import_offline_transactions(
+        profile_db, read_rows(str(path)), session_id=session_id, batch_size=2
+    )
+    assert report.imported == 3
+    assert report.skipped == (6 if file_format == "csv" else 7)
+    assert profile_db.session.query(OfflineTransaction).count() == before + 3
+    imported = (
+        profile_db.session.query(OfflineTransaction)
+        .order_by(OfflineTransaction.id.desc())
+        .first()
+    )
+    assert imported.from_account == account.id
+    assert imported.timestamp == datetime(2021, 3, 1, 8, 30)
+
+
+def test_account_resolver_keeps_the_recent_names():
+    resolver = AccountResolver(profile_db, cache_size=2)
+    assert resolver.account_id("nowhere") is None
+    assert "nowhere" in resolver.account_ids
+    # vendors are resolved through the registry, other names through the cache
+    for name in ["amazon", "no one", "nobody", "nowhere"]:
+        resolver.account_id(name)
+    assert list(resolver.account_ids.entries) == ["nobody", "nowhere"]
+
+
+def test_offline_transaction_amounts(tmp_profile_db):
+    _, account_number = tmp_profile_db.get_account_ids("offline")
+    tmp_profile_db.add_offline_transaction("offline", "amazon", datetime.now(), "12.5")
+    assert tmp_profile_db.compute_balances()[account_number] == pytest.approx(-12.5)
+    for amount in ["lots", None, "-5", 0, float("inf")]:
+        with pytest.raises(ValueError):
+            tmp_profile_db.add_offline_transaction(
+                "offline", "amazon", datetime.now(), amount
+            )
+        tmp_profile_db.session.rollback()
+    assert tmp_profile_db.reconcile_balances(fix=False) == {}
+
+
+def test_search_and_balance_include_offline_transactions():
+    summary = profile_db.summarize_transactions(session_id, vendor="target")
+    balance = profile_db.get_account_balance(session_id)
+
+    profile_db.add_offline_transaction(session_id, "target", datetime.now(), 12.5)
+    transactions = profile_db.search_transactions(session_id, vendor="target").all()
+    offline = [t for t in transactions if t.source == "offline"]
+    assert offline and offline[-1].from_account_number == account_number
+    assert profile_db.summarize_transactions(session_id, vendor="target") == {
+        **summary,
+        "total": pytest.approx(summary["total"] + 12.5),
+        "count": summary["count"] + 1,
+        "min": min(summary["min"], 12.5),
+        "max": max(summary["max"], 12.5),
+    }
+    assert profile_db.get_account_balance(session_id) == pytest.approx(balance - 12.5)
+    assert profile_db.reconcile_balances(fix=False) == {}
+
+
+@pytest.mark.parametrize("deposit", [False, True])
+def test_summarize_transactions_from_rollups(deposit):
+    # partial days at both edges, read from the transactions
+    start_time = datetime(2020, 3, 15, 13, 0)
+    end_time = datetime(2020, 9, 2, 10, 30)
+    amounts = [
+        transaction.amount
+        for transaction in profile_db.search_transactions(
+            session_id, start_time, end_time, deposit=deposit
+        )
+    ]
+    for grain in [None, "month"]:
+        summary = profile_db.summarize_transactions(
+            session_id, start_time, end_time, deposit=deposit, grain=grain
+        )
+        assert summary["total"] == pytest.approx(sum(amounts))
+        assert summary["count"] == len(amounts)
+        assert summary["min"] == min(amounts, default=None)
+        assert summary["max"] == max(amounts, default=None)
+    periods = [str(row["period"])[:7] for row in summary["breakdown"]]
+    assert periods == sorted(periods)
+    assert set(periods) <= {f"2020-{month:02d}" for month in range(3, 10)}
+
+
+def test_rollups_use_indexes():
+    rollups = profile_db.session.query(sa.func.sum(TransactionRollup.total)).filter(
+        TransactionRollup.from_account_number == account_number,
+        TransactionRollup.day >= datetime(2020, 1, 1).date(),
+    )
+    assert "ix_transaction_rollups_from_account_day" in query_plan(rollups)
+
+
+def test_rollups_maintained_incrementally():
+    profile_db.transact(account_number, recipient_account_number, 7.25)
+    profile_db.add_offline_transaction(session_id, "amazon", datetime.now(), 3)
+
+    def rollups():
+        return sorted(
+            (row.from_account_number, row.to_account_number, row.day, row.count)
+            + (round(row.total, 2), row.smallest, row.largest)
+            for row in profile_db.session.query(TransactionRollup)
+        )
+
+    maintained = rollups()
+    profile_db.rebuild_rollups()
+    assert maintained == rollups()
@@ -6,6 +6,7 @@ from rasa_sdk.events import SlotSet, ActionExecuted, SessionStarted
 
 from tests.conftest import EMPTY_TRACKER, PAY_CC_CONFIRMED, PAY_CC_NOT_CONFIRMED
 from actions import actions
+from actions.custom.transactions.add_offline import ActionAddOfflineTransaction
 
 
 @pytest.mark.asyncio
@@ -71,3 +72,43 @@ async def test_action_pay_cc_confirmed(dispatcher, domain):
     expected_response = "utter_cc_pay_scheduled"
     assert events == expected_events
     assert dispatcher.messages[0]["response"] == expected_response
+
+
+@pytest.mark.asyncio
+async def test_repeated_validation_failures_any_slot_event(dispatcher, domain):
+    tracker = Tracker(
+        "default",
+        {"requested_slot": "amount-of-money", "repeated_validation_failures": 1},
+        {},
+        [],
+        False,
+        None,
+        {},
+        "",
+    )
+    action = actions.ValidatePayCCForm()
+    # the requested slot validated once is not a failure, even if set again after
+    events = await action.repeated_validation_failures(
+        dispatcher,
+        tracker,
+        domain,
+        [SlotSet("amount-of-money", 50), SlotSet("amount-of-money", None)],
+    )
+    assert events == [SlotSet("repeated_validation_failures", 0)]
+
+
+@pytest.mark.asyncio
+async def test_add_offline_transaction_rejects_invalid_amounts(dispatcher, domain):
+    tracker = Tracker(
+        "default",
+        {"amount-of-money": "lots", "vendor": "amazon"},
+        {},
+        [],
+        False,
+        None,
+        {},
+        "",
+    )
+    events = await ActionAddOfflineTransaction().run(dispatcher, tracker, domain)
+    assert dispatcher.messages[0]["response"] == "utter_no_payment_amount"
+    assert SlotSet("amount-of-money", None) in events
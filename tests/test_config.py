@@ -0,0 +1,47 @@
+import os
+
+from actions.config import ConfigFile, CustomFormsConfig, HandoffConfig
+
+HANDOFF_CONFIG = """
+handoff_hosts:
+    helpdesk_assistant:
+      title: "Helpdesk Assistant"
+      url: "http://localhost:5005"
+"""
+
+
+def test_handoff_config(tmp_path):
+    path = tmp_path / "handoff_config.yml"
+    path.write_text(HANDOFF_CONFIG)
+    config = ConfigFile(str(path), HandoffConfig).get()
+    assert config.enabled
+    assert config.buttons == [
+        {
+            "title": "Helpdesk Assistant",
+            "payload": '/trigger_handoff{"handoff_to":"helpdesk_assistant"}',
+        }
+    ]
+
+    path.write_text("handoff_hosts:\n")
+    assert not ConfigFile(str(path), HandoffConfig).get().enabled
+
+
+def test_config_is_reloaded_when_the_file_changes(tmp_path):
+    path = tmp_path / "custom_forms_config.yml"
+    path.write_text("custom_forms:\n  max_validation_failures: 2\n")
+    config_file = ConfigFile(str(path), CustomFormsConfig, reload_interval=0.001)
+    config = config_file.get()
+    assert config.max_validation_failures == 2
+    assert config_file.get() is config
+
+    path.write_text("custom_forms:\n  max_validation_failures: 3\n")
+    os.utime(path, (0, config_file.mtime + 1))
+    config_file.next_check = 0
+    assert config_file.get().max_validation_failures == 3
+    assert config_file.reloads == 1
+
+    # an invalid file keeps the previous configuration
+    path.write_text("custom_forms: [\n")
+    os.utime(path, (0, config_file.mtime + 1))
+    config_file.next_check = 0
+    assert config_file.get().max_validation_failures == 3
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions import handoff
+from actions.config import ConfigFile, HandoffConfig
+from actions.handoff_health import HandoffHealthChecker
+
+
+async def hello(request):
+    return web.Response(text="Hello from Rasa")
+
+
+async def broken(request):
+    return web.Response(status=503)
+
+
+async def slow(request):
+    await asyncio.sleep(1)
+    return web.Response(text="too late")
+
+
+@pytest_asyncio.fixture
+async def stub_server():
+    """A handoff host that is up at `/`, broken at `/broken` and slow at `/slow`"""
+    app = web.Application()
+    app.router.add_get("/", hello)
+    app.router.add_get("/broken", broken)
+    app.router.add_get("/slow", slow)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    yield f"http://127.0.0.1:{port}"
+    await runner.cleanup()
+
+
+def handoff_config_file(tmp_path, **urls):
+    path = tmp_path / "handoff_config.yml"
+    path.write_text(
+        "handoff_hosts:\n"
+        + "".join(
+            f"  {bot}:\n    title: {bot}\n    url: {url}\n" for bot, url in urls.items()
+        )
+    )
+    return ConfigFile(str(path), HandoffConfig, reload_interval=0)
+
+
+@pytest.mark.asyncio
+async def test_health_checks(stub_server, tmp_path):
+    checker = HandoffHealthChecker(
+        handoff_config_file(
+            tmp_path,
+            up=stub_server,
+            broken=f"{stub_server}/broken",
+            slow=f"{stub_server}/slow",
+            gone="http://127.0.0.1:9",
+        ),
+        timeout=0.2,
+        concurrency=2,
+    )
+    # not checked yet
+    assert not checker.is_up("up") and not checker.is_up("gone")
+    try:
+        await checker.check_all()
+        await checker.check_all()
+    finally:
+        await checker.close()
+
+    assert checker.is_up("up")
+    assert not checker.is_up("broken")
+    assert not checker.is_up("slow")
+    assert not checker.is_up("gone")
+    snapshot = checker.snapshot()
+    assert snapshot["checks"] == 8
+    assert snapshot["failures"] == 6
+    assert snapshot["hosts"]["broken"]["error"] == "HTTP 503"
+
+    # with the checks disabled, every host is offered
+    assert HandoffHealthChecker(checker.config_file, interval=0).is_up("gone")
+
+
+@pytest.mark.asyncio
+async def test_handoff_options_offer_the_hosts_that_are_up(
+    stub_server, tmp_path, monkeypatch
+):
+    config_file = handoff_config_file(
+        tmp_path, up=stub_server, broken=f"{stub_server}/broken"
+    )
+    checker = HandoffHealthChecker(config_file, interval=0)
+    monkeypatch.setattr(handoff, "handoff_config", config_file)
+    monkeypatch.setattr(handoff, "handoff_health", checker)
+    try:
+        await checker.check_all()
+    finally:
+        await checker.close()
+
+    dispatcher = CollectingDispatcher()
+    tracker = Tracker("default", {}, {}, [], False, None, {}, "")
+    await handoff.ActionHandoffOptions().run(dispatcher, tracker, {})
+    assert [button["title"] for button in dispatcher.messages[0]["buttons"]] == ["up"]
@@ -0,0 +1,77 @@
+import pytest
+import sqlalchemy as sa
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions.custom_forms import CustomFormValidationAction
+from actions.instrumentation import (
+    ActionMetrics,
+    Histogram,
+    current_calls,
+    render_metrics,
+)
+
+engine = sa.create_engine("sqlite://")
+
+
+class ValidateTestForm(CustomFormValidationAction):
+    def name(self):
+        return "validate_test_form"
+
+    async def validate_amount(self, value, dispatcher, tracker, domain):
+        with engine.connect() as connection:
+            connection.execute(sa.text("select 1"))
+            connection.execute(sa.text("select 2"))
+        return {"amount": value}
+
+    def explain_amount(self, value, dispatcher, tracker, domain):
+        raise ValueError("no explanation")
+
+    def validate_helper(self, value):
+        return value
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for seconds in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(seconds)
+    assert list(histogram.cumulative_counts()) == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+
+
+@pytest.mark.asyncio
+async def test_validate_and_explain_methods_are_instrumented():
+    metrics = ActionMetrics()
+    metrics.instrument(ValidateTestForm, ["amount", "AA_CONTINUE_FORM", "currency"])
+    metrics.listen()
+    action = ValidateTestForm()
+    dispatcher = CollectingDispatcher()
+
+    run = metrics.begin("validate_test_form", "run")
+    assert await action.validate_amount(5, dispatcher, None, {}) == {"amount": 5}
+    with pytest.raises(ValueError):
+        await action.explain_amount(5, dispatcher, None, {})
+    metrics.end(run)
+    assert current_calls.get() == ()
+
+    validate = metrics.calls[("validate_test_form", "validate_amount")]
+    assert validate.latency.count == 1
+    assert validate.queries == 2
+    assert validate.errors == 0
+    assert metrics.calls[("validate_test_form", "explain_amount")].errors == 1
+    # the queries count for the run of the action as well
+    assert metrics.calls[("validate_test_form", "run")].queries == 2
+    # the inherited validate_AA_CONTINUE_FORM is instrumented too
+    assert getattr(ValidateTestForm.validate_AA_CONTINUE_FORM, "instrumented", False)
+    # methods that are not the ones of a slot are not
+    for helper in ["validate_helper", "explain_requested_slot"]:
+        assert not getattr(getattr(ValidateTestForm, helper), "instrumented", False)
+
+    unknown = metrics.begin("no_such_action", "run")
+    metrics.end(unknown, discard=True)
+    assert ("no_such_action", "run") not in metrics.calls
+
+
+def test_render_metrics():
+    metrics = render_metrics()
+    assert "# TYPE action_duration_seconds histogram" in metrics
+    assert "# TYPE action_db_queries_total counter" in metrics
@@ -0,0 +1,96 @@
+import pytest
+from rasa_sdk import Tracker
+
+from actions.parsing import (
+    entity_index,
+    format_isotime_by_grain,
+    get_entity_details,
+    parse_duckling_time,
+    parse_duckling_time_as_interval,
+)
+
+
+def time_entity(**additional_info):
+    return {"entity": "time", "additional_info": additional_info}
+
+
+def test_parse_duckling_time():
+    value = "2021-03-04T07:30:00.000-08:00"
+    assert parse_duckling_time(
+        time_entity(type="value", value=value, grain="minute")
+    ) == {
+        "time": value,
+        "time_formatted": "07:30AM, Thursday Mar 04, 2021",
+        "grain": "minute",
+    }
+
+
+@pytest.mark.parametrize(
+    "grain, end",
+    [
+        ("day", "2021-02-02T00:00:00-08:00"),
+        ("month", "2021-03-01T00:00:00-08:00"),
+        ("quarter", "2021-05-01T00:00:00-08:00"),
+        ("year", "2022-02-01T00:00:00-08:00"),
+    ],
+)
+def test_interval_from_value(grain, end):
+    start = "2021-02-01T00:00:00.000-08:00"
+    interval = parse_duckling_time_as_interval(
+        time_entity(type="value", value=start, grain=grain)
+    )
+    assert interval["start_time"] == start
+    assert interval["end_time"] == end
+    assert interval["grain"] == grain
+
+
+def test_open_intervals_are_closed():
+    start = "2021-02-22T00:00:00.000-08:00"
+    end = "2021-03-04T00:00:00.000-08:00"
+    assert (
+        parse_duckling_time_as_interval(
+            time_entity(type="interval", **{"from": {"value": start, "grain": "day"}})
+        )["end_time"]
+        == "2021-02-23T00:00:00-08:00"
+    )
+    assert (
+        parse_duckling_time_as_interval(
+            time_entity(type="interval", to={"value": end, "grain": "day"})
+        )["start_time"]
+        == "2021-03-03T00:00:00-08:00"
+    )
+
+
+def test_format_isotime_by_grain():
+    assert format_isotime_by_grain("2021-03-04T00:00:00.000Z", "month") == "Mar 2021"
+    assert format_isotime_by_grain("2021-03-04T00:00:00.000Z") == (
+        "12:00AM, Thursday Mar 04, 2021"
+    )
+
+
+def tracker_with_entities(*entities):
+    return Tracker("default", {}, {"entities": list(entities)}, [], False, None, {}, "")
+
+
+def test_entity_index():
+    value = "2021-03-04T00:00:00.000-08:00"
+    number = {"entity": "number", "value": 12}
+    first_time = time_entity(type="value", value=value, grain="day")
+    last_time = time_entity(type="value", value=value, grain="month")
+    tracker = tracker_with_entities(number, first_time, last_time)
+
+    index = entity_index(tracker)
+    assert entity_index(tracker) is index
+    assert get_entity_details(tracker, "time") is first_time
+    assert index.last("time") is last_time
+    assert index.first("amount-of-money") is None
+    assert index.amount_of_money() == {"amount-of-money": "12.00", "currency": "$"}
+    assert index.currency() is None
+    assert index.time()["time_formatted"] == "Thursday Mar 04, 2021"
+    assert index.time_interval()["end_time"] == "2021-03-05T00:00:00-08:00"
+    assert index.time() is index.time()
+
+    # a new message gets a new index
+    tracker.latest_message = {"entities": []}
+    assert entity_index(tracker) is not index
+    assert entity_index(tracker).time() is None
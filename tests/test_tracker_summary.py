@@ -0,0 +1,31 @@
+from rasa_sdk import Tracker
+from rasa_sdk.events import ActionExecuted, SlotSet
+
+from actions.actions import ActionSessionStart
+from actions.tracker_summary import TrackerSummary
+
+
+def tracker_with_events(events, sender_id="default"):
+    return Tracker(sender_id, {}, {}, events, False, None, {}, "")
+
+
+def test_summary():
+    summary = TrackerSummary(
+        [
+            SlotSet("currency", "$"),
+            ActionExecuted("action_listen"),
+            SlotSet("currency", "EUR"),
+            SlotSet("credit_card", None),
+        ]
+    )
+    assert summary.slots == {"currency": "EUR", "credit_card": None}
+    assert summary.event_count == 4
+
+
+def test_session_start_carries_over_the_last_currency():
+    tracker = tracker_with_events(
+        [SlotSet("currency", "$"), SlotSet("currency", "EUR")], "carry_over_currency"
+    )
+    assert ActionSessionStart._slot_set_events_from_tracker(tracker) == [
+        SlotSet("currency", "EUR")
+    ]